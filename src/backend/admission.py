@@ -0,0 +1,213 @@
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from app_config import config
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted; the client should retry after retry_after seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Request not admitted ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("user_id", "future")
+
+    def __init__(self, user_id: str, future: "asyncio.Future[None]") -> None:
+        self.user_id = user_id
+        self.future = future
+
+
+class AdmissionController:
+    """Limits how many expensive requests run at once, in total and per user.
+
+    A request that cannot run yet waits in a bounded FIFO queue for at most
+    max_wait_seconds. A waiting request is admitted as soon as a slot is free
+    and its user is below the per-user limit, so a user at the limit does not
+    hold up the others. A request is rejected at once when the queue is full
+    or its user already has max_per_user requests waiting. A limit of 0
+    disables that limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 16,
+        max_per_user: int = 2,
+        max_queue: int = 64,
+        max_wait_seconds: float = 30.0,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._active_by_user: Dict[str, int] = defaultdict(int)
+        self._waiters: Deque[_Waiter] = deque()
+        self._waiting_by_user: Dict[str, int] = defaultdict(int)
+        # Moving average of how long an admitted request runs
+        self._hold_seconds = 1.0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self._admitted = 0
+        self._rejected: Dict[str, int] = defaultdict(int)
+        self._wait_count = 0
+        self._wait_seconds_sum = 0.0
+        self._wait_seconds_max = 0.0
+        self._queue_depth_max = 0
+
+    def _can_run(self, user_id: str) -> bool:
+        if self.max_concurrent and self._active >= self.max_concurrent:
+            return False
+        return (
+            not self.max_per_user
+            or self._active_by_user.get(user_id, 0) < self.max_per_user
+        )
+
+    def _start(self, user_id: str) -> None:
+        self._active += 1
+        self._active_by_user[user_id] += 1
+        self._admitted += 1
+
+    def release(self, user_id: str, seconds: float) -> None:
+        """Free the slot of an admitted request that ran for seconds."""
+        self._active -= 1
+        self._active_by_user[user_id] -= 1
+        if not self._active_by_user[user_id]:
+            del self._active_by_user[user_id]
+        self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * seconds
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit the first waiting requests that can run."""
+        for waiter in list(self._waiters):
+            if self.max_concurrent and self._active >= self.max_concurrent:
+                break
+            if waiter.future.done() or not self._can_run(waiter.user_id):
+                continue
+            self._remove(waiter)
+            self._start(waiter.user_id)
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        self._waiting_by_user[waiter.user_id] -= 1
+        if not self._waiting_by_user[waiter.user_id]:
+            del self._waiting_by_user[waiter.user_id]
+
+    def retry_after(self) -> int:
+        """Seconds after which a rejected request is likely to be admitted."""
+        slots = self.max_concurrent or max(self._active, 1)
+        rounds = (len(self._waiters) + 1) / slots
+        return max(1, math.ceil(rounds * self._hold_seconds))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._rejected[reason] += 1
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _record_wait(self, seconds: float) -> None:
+        self._wait_count += 1
+        self._wait_seconds_sum += seconds
+        self._wait_seconds_max = max(self._wait_seconds_max, seconds)
+
+    async def acquire(self, user_id: str) -> None:
+        """Wait until the user's request may run; raise AdmissionRejected if it may not."""
+        # Every waiting request was blocked at the last change, so one that
+        # can run now is not overtaking anyone who could
+        if self._can_run(user_id):
+            self._start(user_id)
+            self._record_wait(0.0)
+            return
+        if self.max_queue and len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        waiting = self._waiting_by_user.get(user_id, 0)
+        if self.max_per_user and waiting >= self.max_per_user:
+            raise self._reject("user_queue_full")
+
+        waiter = _Waiter(user_id, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._waiting_by_user[user_id] += 1
+        self._queue_depth_max = max(self._queue_depth_max, len(self._waiters))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Admitted just as the deadline passed
+                self._record_wait(time.monotonic() - started)
+                return
+            self._remove(waiter)
+            waiter.future.cancel()
+            raise self._reject("timeout")
+        except BaseException:
+            if waiter.future.done():
+                self.release(user_id, 0.0)
+            else:
+                self._remove(waiter)
+                waiter.future.cancel()
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        """Run the body once the user's request is admitted."""
+        await self.acquire(user_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "queue_depth_max": self._queue_depth_max,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "wait_seconds_sum": round(self._wait_seconds_sum, 6),
+            "wait_seconds_max": round(self._wait_seconds_max, 6),
+            "wait_count": self._wait_count,
+            "limits": {
+                "max_concurrent": self.max_concurrent,
+                "max_per_user": self.max_per_user,
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait_seconds,
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+        for name, metric_type, value in [
+            ("admission_active_requests", "gauge", stats["active"]),
+            ("admission_queue_depth", "gauge", stats["queue_depth"]),
+            ("admission_queue_depth_max", "gauge", stats["queue_depth_max"]),
+            ("admission_admitted_total", "counter", stats["admitted"]),
+            ("admission_wait_seconds_sum", "counter", stats["wait_seconds_sum"]),
+            ("admission_wait_seconds_count", "counter", stats["wait_count"]),
+            ("admission_wait_seconds_max", "gauge", stats["wait_seconds_max"]),
+        ]:
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {value}")
+        lines.append("# TYPE admission_rejected_total counter")
+        for reason, count in sorted(stats["rejected"].items()):
+            lines.append(f'admission_rejected_total{{reason="{reason}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+# Admission control of the endpoints that call the language model
+admission_controller = AdmissionController(
+    max_concurrent=config.ADMISSION_MAX_CONCURRENT,
+    max_per_user=config.ADMISSION_MAX_PER_USER,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    max_wait_seconds=config.ADMISSION_MAX_WAIT_SECONDS,
+)
@@ -1,10 +1,12 @@
 # app_config.py
+import asyncio
 import os
 import logging
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential, ClientSecretCredential
 from azure.cosmos.aio import CosmosClient
+from azure.cosmos.partition_key import PartitionKey
 from azure.ai.projects.aio import AIProjectClient
 from semantic_kernel.kernel import Kernel
 from semantic_kernel.contents import ChatHistory
@@ -25,10 +27,97 @@ class AppConfig:
         self.AZURE_CLIENT_ID = self._get_optional("AZURE_CLIENT_ID")
         self.AZURE_CLIENT_SECRET = self._get_optional("AZURE_CLIENT_SECRET")
 
+        # Memory store backend: "cosmos" or "sqlite" for a local database file
+        self.MEMORY_BACKEND = self._get_optional("MEMORY_BACKEND", "cosmos").lower()
+        self.SQLITE_DATABASE_PATH = self._get_optional("SQLITE_DATABASE_PATH", "macae.db")
+
         # CosmosDB settings
         self.COSMOSDB_ENDPOINT = self._get_optional("COSMOSDB_ENDPOINT")
         self.COSMOSDB_DATABASE = self._get_optional("COSMOSDB_DATABASE")
         self.COSMOSDB_CONTAINER = self._get_optional("COSMOSDB_CONTAINER")
+        self.COSMOSDB_WRITE_BEHIND = self._get_bool("COSMOSDB_WRITE_BEHIND")
+        self.COSMOSDB_WRITE_BEHIND_BATCH_SIZE = int(
+            self._get_optional("COSMOSDB_WRITE_BEHIND_BATCH_SIZE", "100")
+        )
+        self.COSMOSDB_WRITE_BEHIND_FLUSH_INTERVAL = float(
+            self._get_optional("COSMOSDB_WRITE_BEHIND_FLUSH_INTERVAL", "0.5")
+        )
+        self.COSMOSDB_CACHE_TTL_SECONDS = float(
+            self._get_optional("COSMOSDB_CACHE_TTL_SECONDS", "30")
+        )
+        self.COSMOSDB_CACHE_MAX_ENTRIES = int(
+            self._get_optional("COSMOSDB_CACHE_MAX_ENTRIES", "1024")
+        )
+        # Most recent sessions kept in each user's session index
+        self.COSMOSDB_USER_INDEX_MAX_SESSIONS = int(
+            self._get_optional("COSMOSDB_USER_INDEX_MAX_SESSIONS", "1000")
+        )
+        self.COSMOSDB_BATCH_CONCURRENCY = int(
+            self._get_optional("COSMOSDB_BATCH_CONCURRENCY", "8")
+        )
+        # Retries of throttled or unavailable requests, on top of the SDK's own
+        self.COSMOSDB_MAX_RETRIES = int(self._get_optional("COSMOSDB_MAX_RETRIES", "3"))
+        self.COSMOSDB_RETRY_MAX_WAIT_SECONDS = float(
+            self._get_optional("COSMOSDB_RETRY_MAX_WAIT_SECONDS", "10")
+        )
+        # Consecutive transient failures that open the circuit breaker (0 disables)
+        self.COSMOSDB_CIRCUIT_FAILURE_THRESHOLD = int(
+            self._get_optional("COSMOSDB_CIRCUIT_FAILURE_THRESHOLD", "5")
+        )
+        self.COSMOSDB_CIRCUIT_RESET_SECONDS = float(
+            self._get_optional("COSMOSDB_CIRCUIT_RESET_SECONDS", "30")
+        )
+        self.MEMORY_INDEX_TTL_SECONDS = float(
+            self._get_optional("MEMORY_INDEX_TTL_SECONDS", "300")
+        )
+        # Similarity indexes kept in memory, one per session and collection
+        self.MEMORY_INDEX_MAX_ENTRIES = int(
+            self._get_optional("MEMORY_INDEX_MAX_ENTRIES", "64")
+        )
+        # Collections with at least this many records use the approximate index (0 disables)
+        self.MEMORY_ANN_MIN_RECORDS = int(
+            self._get_optional("MEMORY_ANN_MIN_RECORDS", "20000")
+        )
+        self.MEMORY_ANN_N_PROBE = int(self._get_optional("MEMORY_ANN_N_PROBE", "8"))
+        self.MEMORY_ANN_INDEX_DIR = self._get_optional("MEMORY_ANN_INDEX_DIR", "")
+        # Follow the store's change feed and serve session reads from memory
+        self.CHANGE_FEED_ENABLED = self._get_bool("CHANGE_FEED_ENABLED")
+        self.CHANGE_FEED_POLL_SECONDS = float(
+            self._get_optional("CHANGE_FEED_POLL_SECONDS", "1")
+        )
+        # Sessions held by the materialized view, and how long before one is re-read
+        self.CHANGE_FEED_VIEW_MAX_SESSIONS = int(
+            self._get_optional("CHANGE_FEED_VIEW_MAX_SESSIONS", "1000")
+        )
+        self.CHANGE_FEED_VIEW_TTL_SECONDS = float(
+            self._get_optional("CHANGE_FEED_VIEW_TTL_SECONDS", "300")
+        )
+        # Keep each session's plan, steps and step counts in one document as well
+        self.PLAN_AGGREGATE_ENABLED = self._get_bool("PLAN_AGGREGATE_ENABLED")
+        # Stream agent replies and forward them to the session event streams
+        self.AGENT_STREAMING_ENABLED = self._get_bool("AGENT_STREAMING_ENABLED")
+        # Input tasks planned at the same time in job mode (0 for no limit)
+        self.INPUT_TASK_WORKERS = int(self._get_optional("INPUT_TASK_WORKERS", "4"))
+        # Input tasks waiting for a worker, and queued or running input tasks per user
+        self.INPUT_TASK_MAX_QUEUE = int(self._get_optional("INPUT_TASK_MAX_QUEUE", "64"))
+        self.INPUT_TASK_MAX_PER_USER = int(
+            self._get_optional("INPUT_TASK_MAX_PER_USER", "2")
+        )
+        # Steps of a plan executed at the same time when all steps are approved
+        self.STEP_CONCURRENCY = int(self._get_optional("STEP_CONCURRENCY", "3"))
+        # Admission control of the endpoints that call the language model (0 disables a limit)
+        self.ADMISSION_MAX_CONCURRENT = int(
+            self._get_optional("ADMISSION_MAX_CONCURRENT", "16")
+        )
+        self.ADMISSION_MAX_PER_USER = int(self._get_optional("ADMISSION_MAX_PER_USER", "2"))
+        self.ADMISSION_MAX_QUEUE = int(self._get_optional("ADMISSION_MAX_QUEUE", "64"))
+        self.ADMISSION_MAX_WAIT_SECONDS = float(
+            self._get_optional("ADMISSION_MAX_WAIT_SECONDS", "30")
+        )
+        # How new memory embeddings are stored: json, float32, float16 or int8
+        self.MEMORY_EMBEDDING_ENCODING = self._get_optional(
+            "MEMORY_EMBEDDING_ENCODING", "float32"
+        ).lower()
 
         # Azure OpenAI settings
         self.AZURE_OPENAI_DEPLOYMENT_NAME = self._get_required(
@@ -59,6 +148,8 @@ class AppConfig:
         self._azure_credentials = None
         self._cosmos_client = None
         self._cosmos_database = None
+        self._cosmos_container = None
+        self._cosmos_container_lock = asyncio.Lock()
         self._ai_project_client = None
 
     def _get_required(self, name: str, default: Optional[str] = None) -> str:
@@ -152,6 +243,48 @@ class AppConfig:
             )
             raise
 
+    async def get_cosmos_container(self):
+        """Get the process-wide Cosmos DB container proxy.
+
+        The container is created (if needed) on first use only, so every memory
+        context in the process shares one pooled client, one credential and one
+        container proxy instead of paying for a TLS handshake, a token acquisition
+        and a container metadata round trip per request.
+
+        Returns:
+            The shared Cosmos DB container proxy
+        """
+        if self._cosmos_container is not None:
+            return self._cosmos_container
+
+        async with self._cosmos_container_lock:
+            if self._cosmos_container is None:
+                database = self.get_cosmos_database_client()
+                self._cosmos_container = await database.create_container_if_not_exists(
+                    id=self.COSMOSDB_CONTAINER,
+                    partition_key=PartitionKey(path="/session_id"),
+                )
+                logging.info("Initialized shared CosmosDB container proxy")
+
+        return self._cosmos_container
+
+    async def close_cosmos_client(self):
+        """Close the shared Cosmos DB client and drop the cached proxies.
+
+        Called from the application lifespan on shutdown.
+        """
+        client = self._cosmos_client
+        self._cosmos_client = None
+        self._cosmos_database = None
+        self._cosmos_container = None
+
+        if client is not None:
+            try:
+                await client.close()
+                logging.info("Closed shared CosmosDB client")
+            except Exception as exc:
+                logging.warning("Error closing CosmosDB client: %s", exc)
+
     def create_kernel(self):
         """Creates a new Semantic Kernel instance.
 
@@ -189,6 +322,21 @@ class AppConfig:
             logging.error("Failed to create AIProjectClient: %s", exc)
             raise
 
+    async def close_ai_project_client(self):
+        """Close the cached AIProjectClient.
+
+        Called from the application lifespan on shutdown.
+        """
+        client = self._ai_project_client
+        self._ai_project_client = None
+
+        if client is not None:
+            try:
+                await client.close()
+                logging.info("Closed AIProjectClient")
+            except Exception as exc:
+                logging.warning("Error closing AIProjectClient: %s", exc)
+
     async def create_azure_ai_agent(
         self,
         agent_name: str,
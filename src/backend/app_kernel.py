@@ -5,22 +5,42 @@ import logging
 import os
 import re
 import uuid
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
 
 # Semantic Kernel imports
 import semantic_kernel as sk
 from app_config import config
-from auth.auth_utils import get_authenticated_user_details
 
 # Azure monitoring
 from azure.monitor.opentelemetry import configure_azure_monitor
 from config_kernel import Config
+from context.change_feed import create_change_feed_processor
 from context.cosmos_memory_kernel import CosmosMemoryContext
+from context.cosmos_resilience import cosmos_circuit_breaker, cosmos_metrics
+from context.event_bus import event_bus
+from context.materialized_view import materialized_view
+from context.session_events import session_events
+from context.memory_context_base import MemoryContextBase
+from context.sqlite_memory_context import SQLiteMemoryContext
+from admission import AdmissionRejected, admission_controller
+from dependencies import (
+    AppResources,
+    RequestScope,
+    admit_request,
+    get_request_scope,
+    get_user_id,
+    not_admitted,
+)
 from event_utils import track_event_if_configured
 
 # FastAPI imports
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from jobs import job_registry
+from kernel_tools.tool_catalog import tool_catalog
 from kernel_agents.agent_factory import AgentFactory
 
 # Local imports
@@ -33,14 +53,18 @@ from models.messages_kernel import (
     HumanClarification,
     HumanFeedback,
     InputTask,
+    Job,
     Plan,
+    PlanSummary,
     PlanWithSteps,
+    SessionSnapshot,
     Step,
+    StepSummary,
 )
 
 # Updated import for KernelArguments
 from semantic_kernel.functions.kernel_arguments import KernelArguments
-from utils_kernel import get_agents, initialize_runtime_and_context, rai_success
+from utils_kernel import get_agents, rai_success
 
 # # Check if the Application Insights Instrumentation Key is set in the environment variables
 # connection_string = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
@@ -70,8 +94,60 @@ logging.getLogger("azure.monitor.opentelemetry.exporter.export._base").setLevel(
     logging.WARNING
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own process-wide clients for the lifetime of the application."""
+    if config.MEMORY_BACKEND == "cosmos":
+        try:
+            # Warm the pooled Cosmos client so the first request does not pay for it
+            await config.get_cosmos_container()
+        except Exception as e:
+            logging.warning(f"CosmosDB container not available at startup: {e}")
+
+    change_feed = None
+    # Record plan, step and agent-message changes for the session event streams
+    unsubscribers = [event_bus.subscribe(session_events.apply)]
+    if config.CHANGE_FEED_ENABLED:
+        # Keep the caches and the materialized view current with writes made
+        # by any process, and serve session reads from the view
+        unsubscribers.append(event_bus.subscribe(materialized_view.apply))
+        if config.MEMORY_BACKEND == "cosmos":
+            unsubscribers.append(event_bus.subscribe(CosmosMemoryContext.apply_change))
+        change_feed = create_change_feed_processor()
+        materialized_view.follow(change_feed)
+        change_feed.start()
+
+    # Introspect the agents' tools once, before the first planner needs them
+    tool_catalog.build()
+    app.state.resources = AppResources()
+    job_registry.set_concurrency(
+        "input_task",
+        config.INPUT_TASK_WORKERS,
+        max_queue=config.INPUT_TASK_MAX_QUEUE,
+        max_per_user=config.INPUT_TASK_MAX_PER_USER,
+    )
+    # A user deletes their messages once at a time
+    job_registry.set_concurrency("delete_messages", 0, max_per_user=1)
+
+    yield
+
+    await app.state.resources.close()
+    if change_feed is not None:
+        await change_feed.stop()
+        materialized_view.follow(None)
+        materialized_view.clear()
+    for unsubscribe in unsubscribers:
+        unsubscribe()
+    session_events.clear()
+    await job_registry.shutdown()
+    await CosmosMemoryContext.flush_all()
+    await config.close_cosmos_client()
+    SQLiteMemoryContext.close_all()
+
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 frontend_url = Config.FRONTEND_SITE_NAME
 
@@ -89,117 +165,179 @@ app.add_middleware(HealthCheckMiddleware, password="", checks={})
 logging.info("Added health check middleware")
 
 
-@app.post("/api/input_task")
-async def input_task_endpoint(input_task: InputTask, request: Request):
-    """
-    Receive the initial input task from the user.
-    """
-    # Fix 1: Properly await the async rai_success function
-    if not await rai_success(input_task.description):
-        print("RAI failed")
+async def _create_plan(
+    input_task: InputTask,
+    user_id: str,
+    memory_store: MemoryContextBase,
+    client: Any,
+) -> Dict[str, str]:
+    """Have the planner create a plan for an input task that passed the RAI check."""
+    # Create all agents instead of just the planner agent
+    # This ensures other agents are created first and the planner has access to them
+    agents = await AgentFactory.create_all_agents(
+        session_id=input_task.session_id,
+        user_id=user_id,
+        memory_store=memory_store,
+        client=client,
+    )
 
+    group_chat_manager = agents[AgentType.GROUP_CHAT_MANAGER.value]
+
+    # Use the planner to handle the task
+    result = await group_chat_manager.handle_input_task(input_task)
+    # Agents are cached per session and may hold the memory context of an
+    # earlier request, so flush every pending write-behind buffer
+    await CosmosMemoryContext.flush_all()
+
+    print(f"Result: {result}")
+    # Get plan from memory store
+    plan = await memory_store.get_plan_by_session(input_task.session_id)
+
+    if not plan:  # If the plan is not found, raise an error
         track_event_if_configured(
-            "RAI failed",
+            "PlanNotFound",
             {
-                "status": "Plan not created",
-                "description": input_task.description,
+                "status": "Plan not found",
                 "session_id": input_task.session_id,
+                "description": input_task.description,
             },
         )
+        raise HTTPException(status_code=404, detail="Plan not found")
+    # Log custom event for successful input task processing
+    track_event_if_configured(
+        "InputTaskProcessed",
+        {
+            "status": f"Plan created with ID: {plan.id}",
+            "session_id": input_task.session_id,
+            "plan_id": plan.id,
+            "description": input_task.description,
+        },
+    )
+    return {
+        "status": f"Plan created with ID: {plan.id}",
+        "session_id": input_task.session_id,
+        "plan_id": plan.id,
+        "description": input_task.description,
+    }
 
-        return {
-            "status": "Plan not created",
-        }
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
 
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+async def _check_input_task(input_task: InputTask) -> bool:
+    """Run the RAI check on an input task and record a rejection."""
+    # Fix 1: Properly await the async rai_success function
+    if await rai_success(input_task.description):
+        return True
+    print("RAI failed")
 
-    # Generate session ID if not provided
-    if not input_task.session_id:
-        input_task.session_id = str(uuid.uuid4())
+    track_event_if_configured(
+        "RAI failed",
+        {
+            "status": "Plan not created",
+            "description": input_task.description,
+            "session_id": input_task.session_id,
+        },
+    )
+    return False
 
-    try:
-        # Create all agents instead of just the planner agent
-        # This ensures other agents are created first and the planner has access to them
-        kernel, memory_store = await initialize_runtime_and_context(
-            input_task.session_id, user_id
-        )
-        client = None
-        try:
-            client = config.get_ai_project_client()
-        except Exception as client_exc:
-            logging.error(f"Error creating AIProjectClient: {client_exc}")
-
-        agents = await AgentFactory.create_all_agents(
-            session_id=input_task.session_id,
-            user_id=user_id,
-            memory_store=memory_store,
-            client=client,
-        )
 
-        group_chat_manager = agents[AgentType.GROUP_CHAT_MANAGER.value]
+def _track_input_task_error(input_task: InputTask, error: Exception) -> None:
+    logging.exception(f"Error handling input task: {error}")
+    track_event_if_configured(
+        "InputTaskError",
+        {
+            "session_id": input_task.session_id,
+            "description": input_task.description,
+            "error": str(error),
+        },
+    )
+
 
-        # Convert input task to JSON for the kernel function, add user_id here
+@app.post(
+    "/api/input_task", response_model=None, dependencies=[Depends(admit_request)]
+)
+async def input_task_endpoint(
+    input_task: InputTask,
+    mode: Literal["sync", "job"] = Query("sync"),
+    scope: RequestScope = Depends(get_request_scope),
+) -> Union[Dict[str, str], JSONResponse]:
+    """
+    Receive the initial input task from the user.
 
-        # Use the planner to handle the task
-        result = await group_chat_manager.handle_input_task(input_task)
+    With mode=job the task is accepted with 202 and planned on the background
+    worker pool; poll /api/jobs/{job_id} for its status and result.
 
-        print(f"Result: {result}")
-        # Get plan from memory store
-        plan = await memory_store.get_plan_by_session(input_task.session_id)
+    Requests beyond the admission limits wait in a bounded queue, or get 429
+    with a Retry-After header. In job mode, a full planning queue or a user
+    with too many unfinished planning jobs also gets 429, and 503 when the job
+    registry is full. The planning job counts toward the admission limits
+    while it runs, and fails if it is not admitted in time.
+    """
+    user_id = scope.user_id
+
+    if mode == "job":
+        # Generate the session ID up front so the client can follow the session
+        if not input_task.session_id:
+            input_task.session_id = str(uuid.uuid4())
+        # The job outlives the request, so it gets a memory context of its own
+        memory_store = scope.resources.memory_store(input_task.session_id, user_id)
+        client = scope.ai_project_client
+
+        async def plan_task(job: Job) -> Dict[str, str]:
+            # The request's admission slot is released with the 202 response,
+            # so the planning holds a slot of its own while it calls the model
+            async with admission_controller.admit(user_id):
+                if not await _check_input_task(input_task):
+                    return {"status": "Plan not created"}
+                try:
+                    return await _create_plan(input_task, user_id, memory_store, client)
+                except Exception as e:
+                    _track_input_task_error(input_task, e)
+                    raise
 
-        if not plan:  # If the plan is not found, raise an error
-            track_event_if_configured(
-                "PlanNotFound",
-                {
-                    "status": "Plan not found",
-                    "session_id": input_task.session_id,
-                    "description": input_task.description,
-                },
-            )
-            raise HTTPException(status_code=404, detail="Plan not found")
-        # Log custom event for successful input task processing
+        try:
+            job = job_registry.submit("input_task", user_id, plan_task)
+        except AdmissionRejected as e:
+            raise not_admitted(user_id, e)
         track_event_if_configured(
-            "InputTaskProcessed",
+            "InputTaskJobStarted",
             {
-                "status": f"Plan created with ID: {plan.id}",
+                "job_id": job.id,
+                "session_id": input_task.session_id,
+                "user_id": user_id,
+            },
+        )
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "Planning started",
+                "job_id": job.id,
                 "session_id": input_task.session_id,
-                "plan_id": plan.id,
                 "description": input_task.description,
             },
+            headers={"Location": f"/api/jobs/{job.id}"},
         )
-        if client:
-            try:
-                client.close()
-            except Exception as e:
-                logging.error(f"Error sending to AIProjectClient: {e}")
+
+    if not await _check_input_task(input_task):
         return {
-            "status": f"Plan created with ID: {plan.id}",
-            "session_id": input_task.session_id,
-            "plan_id": plan.id,
-            "description": input_task.description,
+            "status": "Plan not created",
         }
 
+    # Generate session ID if not provided
+    if not input_task.session_id:
+        input_task.session_id = str(uuid.uuid4())
+
+    try:
+        memory_store = scope.memory_store(input_task.session_id)
+        client = scope.ai_project_client
+        return await _create_plan(input_task, user_id, memory_store, client)
     except Exception as e:
-        logging.exception(f"Error handling input task: {e}")
-        track_event_if_configured(
-            "InputTaskError",
-            {
-                "session_id": input_task.session_id,
-                "description": input_task.description,
-                "error": str(e),
-            },
-        )
+        _track_input_task_error(input_task, e)
         raise HTTPException(status_code=400, detail="Error creating plan")
 
 
 @app.post("/api/human_feedback")
-async def human_feedback_endpoint(human_feedback: HumanFeedback, request: Request):
+async def human_feedback_endpoint(
+    human_feedback: HumanFeedback, scope: RequestScope = Depends(get_request_scope)
+):
     """
     Receive human feedback on a step.
 
@@ -254,23 +392,11 @@ async def human_feedback_endpoint(human_feedback: HumanFeedback, request: Reques
       400:
         description: Missing or invalid user information
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
-    kernel, memory_store = await initialize_runtime_and_context(
-        human_feedback.session_id, user_id
-    )
+    memory_store = scope.memory_store(human_feedback.session_id)
 
-    client = None
-    try:
-        client = config.get_ai_project_client()
-    except Exception as client_exc:
-        logging.error(f"Error creating AIProjectClient: {client_exc}")
+    client = scope.ai_project_client
 
     human_agent = await AgentFactory.create_agent(
         agent_type=AgentType.HUMAN,
@@ -293,6 +419,7 @@ async def human_feedback_endpoint(human_feedback: HumanFeedback, request: Reques
 
     # Use the human agent to handle the feedback
     await human_agent.handle_human_feedback(human_feedback=human_feedback)
+    await CosmosMemoryContext.flush_all()
 
     track_event_if_configured(
         "Completed Feedback received",
@@ -302,11 +429,6 @@ async def human_feedback_endpoint(human_feedback: HumanFeedback, request: Reques
             "step_id": human_feedback.step_id,
         },
     )
-    if client:
-        try:
-            client.close()
-        except Exception as e:
-            logging.error(f"Error sending to AIProjectClient: {e}")
     return {
         "status": "Feedback received",
         "session_id": human_feedback.session_id,
@@ -316,7 +438,8 @@ async def human_feedback_endpoint(human_feedback: HumanFeedback, request: Reques
 
 @app.post("/api/human_clarification_on_plan")
 async def human_clarification_endpoint(
-    human_clarification: HumanClarification, request: Request
+    human_clarification: HumanClarification,
+    scope: RequestScope = Depends(get_request_scope),
 ):
     """
     Receive human clarification on a plan.
@@ -361,22 +484,10 @@ async def human_clarification_endpoint(
       400:
         description: Missing or invalid user information
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
-    kernel, memory_store = await initialize_runtime_and_context(
-        human_clarification.session_id, user_id
-    )
-    client = None
-    try:
-        client = config.get_ai_project_client()
-    except Exception as client_exc:
-        logging.error(f"Error creating AIProjectClient: {client_exc}")
+    memory_store = scope.memory_store(human_clarification.session_id)
+    client = scope.ai_project_client
 
     human_agent = await AgentFactory.create_agent(
         agent_type=AgentType.HUMAN,
@@ -401,6 +512,7 @@ async def human_clarification_endpoint(
     await human_agent.handle_human_clarification(
         human_clarification=human_clarification
     )
+    await CosmosMemoryContext.flush_all()
 
     track_event_if_configured(
         "Completed Human clarification on the plan",
@@ -409,20 +521,16 @@ async def human_clarification_endpoint(
             "session_id": human_clarification.session_id,
         },
     )
-    if client:
-        try:
-            client.close()
-        except Exception as e:
-            logging.error(f"Error sending to AIProjectClient: {e}")
     return {
         "status": "Clarification received",
         "session_id": human_clarification.session_id,
     }
 
 
-@app.post("/api/approve_step_or_steps")
+@app.post("/api/approve_step_or_steps", dependencies=[Depends(admit_request)])
 async def approve_step_endpoint(
-    human_feedback: HumanFeedback, request: Request
+    human_feedback: HumanFeedback,
+    scope: RequestScope = Depends(get_request_scope),
 ) -> Dict[str, str]:
     """
     Approve a step or multiple steps in a plan.
@@ -473,24 +581,14 @@ async def approve_step_endpoint(
               type: string
       400:
         description: Missing or invalid user information
+      429:
+        description: Too many requests in progress; retry after the Retry-After header's seconds
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
     # Get the agents for this session
-    kernel, memory_store = await initialize_runtime_and_context(
-        human_feedback.session_id, user_id
-    )
-    client = None
-    try:
-        client = config.get_ai_project_client()
-    except Exception as client_exc:
-        logging.error(f"Error creating AIProjectClient: {client_exc}")
+    memory_store = scope.memory_store(human_feedback.session_id)
+    client = scope.ai_project_client
     agents = await AgentFactory.create_all_agents(
         session_id=human_feedback.session_id,
         user_id=user_id,
@@ -502,12 +600,8 @@ async def approve_step_endpoint(
     group_chat_manager = agents[AgentType.GROUP_CHAT_MANAGER.value]
 
     await group_chat_manager.handle_human_feedback(human_feedback)
+    await CosmosMemoryContext.flush_all()
 
-    if client:
-        try:
-            client.close()
-        except Exception as e:
-            logging.error(f"Error sending to AIProjectClient: {e}")
     # Return a status message
     if human_feedback.step_id:
         track_event_if_configured(
@@ -529,13 +623,88 @@ async def approve_step_endpoint(
         return {"status": "All steps approved"}
 
 
-@app.get("/api/plans", response_model=List[PlanWithSteps])
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _validate_cursor(cursor: Optional[str]) -> None:
+    try:
+        MemoryContextBase._decode_continuation(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _ndjson_page(
+    documents: AsyncIterator[Tuple[Dict[str, Any], Optional[str]]], limit: int
+) -> AsyncIterator[str]:
+    """Write up to limit documents as NDJSON lines, then the next cursor."""
+    next_cursor = None
+    count = 0
+    async for document, next_cursor in documents:
+        yield json.dumps(document, default=str) + "\n"
+        count += 1
+        if count >= limit:
+            break
+    yield json.dumps({"next_cursor": next_cursor}) + "\n"
+
+
+async def _attach_steps(
+    memory_store: MemoryContextBase, plans: List[Tuple[Plan, Optional[str]]]
+) -> List[Tuple[Dict[str, Any], Optional[str]]]:
+    steps_for_plans = await asyncio.gather(
+        *[
+            memory_store.get_steps_by_plan(plan_id=plan.id, session_id=plan.session_id)
+            for plan, _ in plans
+        ]
+    )
+    documents = []
+    for (plan, token), steps in zip(plans, steps_for_plans):
+        plan_with_steps = PlanWithSteps(**plan.model_dump(), steps=steps)
+        plan_with_steps.update_step_counts()
+        documents.append((plan_with_steps.model_dump(mode="json"), token))
+    return documents
+
+
+async def _iter_plans_with_steps(
+    memory_store: MemoryContextBase, cursor: Optional[str], batch_size: int
+) -> AsyncIterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """Yield plans with their steps, fetching the steps of batch_size plans at a time."""
+    batch = []
+    async for plan, token in memory_store.iter_all_plans(cursor, page_size=batch_size):
+        batch.append((plan, token))
+        if len(batch) == batch_size:
+            for document in await _attach_steps(memory_store, batch):
+                yield document
+            batch = []
+    for document in await _attach_steps(memory_store, batch):
+        yield document
+
+
+@app.get(
+    "/api/plans", response_model=Union[List[PlanWithSteps], List[PlanSummary]]
+)
 async def get_plans(
-    request: Request, session_id: Optional[str] = Query(None)
-) -> List[PlanWithSteps]:
+    request: Request,
+    scope: RequestScope = Depends(get_request_scope),
+    session_id: Optional[str] = Query(None),
+    view: Literal["full", "summary"] = Query("full"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=1000),
+):
     """
     Retrieve plans for the current user.
 
+    With `view=summary` each plan is returned with its step counts only,
+    without the steps themselves.
+
+    With an `Accept: application/x-ndjson` header the plans are streamed one
+    per line, most recent first, as they are read. At most `limit` plans are
+    returned and the last line is `{"next_cursor": ...}`; pass it back as
+    `cursor` to continue, it is null once the listing is complete.
+
     ---
     tags:
       - Plans
@@ -545,6 +714,22 @@ async def get_plans(
         type: string
         required: false
         description: Optional session ID to retrieve plans for a specific session
+      - name: view
+        in: query
+        type: string
+        enum: [full, summary]
+        required: false
+        description: Return full plans with steps (default) or plan summaries with step counts
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Continuation token of a previous NDJSON page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Maximum number of plans in an NDJSON page (default 20)
     responses:
       200:
         description: List of plans with steps for the user
@@ -590,21 +775,31 @@ async def get_plans(
       404:
         description: Plan not found
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
     # Initialize memory context
-    kernel, memory_store = await initialize_runtime_and_context(
-        session_id or "", user_id
-    )
+    memory_store = scope.memory_store(session_id or "")
+
+    if (
+        session_id
+        and view == "full"
+        and await materialized_view.load_session(memory_store, session_id)
+    ):
+        plan = materialized_view.get_plan_by_session(session_id, user_id)
+        if plan:
+            plan_with_steps = PlanWithSteps(
+                **plan.model_dump(),
+                steps=materialized_view.get_steps_by_plan(plan.id, user_id) or [],
+            )
+            plan_with_steps.update_step_counts()
+            return [plan_with_steps]
 
     if session_id:
-        plan = await memory_store.get_plan_by_session(session_id=session_id)
+        if view == "summary":
+            plan = await memory_store.get_plan_by_session(session_id=session_id)
+        else:
+            # A single point read when PLAN_AGGREGATE_ENABLED is set
+            plan = await memory_store.get_plan_with_steps(session_id)
         if not plan:
             track_event_if_configured(
                 "GetPlanBySessionNotFound",
@@ -612,16 +807,29 @@ async def get_plans(
             )
             raise HTTPException(status_code=404, detail="Plan not found")
 
-        # Use get_steps_by_plan to match the original implementation
-        steps = await memory_store.get_steps_by_plan(plan_id=plan.id)
-        plan_with_steps = PlanWithSteps(**plan.model_dump(), steps=steps)
-        plan_with_steps.update_step_counts()
-        return [plan_with_steps]
+        if view == "summary":
+            return [await memory_store.get_plan_summary(plan)]
+        return [plan]
+
+    if view == "summary":
+        return await memory_store.get_all_plan_summaries()
+
+    if _wants_ndjson(request):
+        _validate_cursor(cursor)
+        return StreamingResponse(
+            _ndjson_page(
+                _iter_plans_with_steps(memory_store, cursor, min(limit, 20)), limit
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
 
     all_plans = await memory_store.get_all_plans()
     # Fetch steps for all plans concurrently
     steps_for_all_plans = await asyncio.gather(
-        *[memory_store.get_steps_by_plan(plan_id=plan.id) for plan in all_plans]
+        *[
+            memory_store.get_steps_by_plan(plan_id=plan.id, session_id=plan.session_id)
+            for plan in all_plans
+        ]
     )
     # Create list of PlanWithSteps and update step counts
     list_of_plans_with_steps = []
@@ -633,11 +841,18 @@ async def get_plans(
     return list_of_plans_with_steps
 
 
-@app.get("/api/steps/{plan_id}", response_model=List[Step])
-async def get_steps_by_plan(plan_id: str, request: Request) -> List[Step]:
+@app.get("/api/steps/{plan_id}", response_model=Union[List[Step], List[StepSummary]])
+async def get_steps_by_plan(
+    plan_id: str,
+    view: Literal["full", "summary"] = Query("full"),
+    scope: RequestScope = Depends(get_request_scope),
+) -> Union[List[Step], List[StepSummary]]:
     """
     Retrieve steps for a specific plan.
 
+    With `view=summary` only the step fields shown in lists are returned,
+    without the agent reply and human feedback.
+
     ---
     tags:
       - Steps
@@ -647,6 +862,12 @@ async def get_steps_by_plan(plan_id: str, request: Request) -> List[Step]:
         type: string
         required: true
         description: The ID of the plan to retrieve steps for
+      - name: view
+        in: query
+        type: string
+        enum: [full, summary]
+        required: false
+        description: Return full steps (default) or step summaries
     responses:
       200:
         description: List of steps associated with the specified plan
@@ -684,22 +905,177 @@ async def get_steps_by_plan(plan_id: str, request: Request) -> List[Step]:
       404:
         description: Plan or steps not found
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
+
+    if view == "full" and materialized_view.ready:
+        # Held only if the plan's session was loaded by an earlier read
+        steps = materialized_view.get_steps_by_plan(plan_id, user_id)
+        if steps is not None:
+            return steps
 
     # Initialize memory context
-    kernel, memory_store = await initialize_runtime_and_context("", user_id)
+    memory_store = scope.memory_store()
+    if view == "summary":
+        return await memory_store.get_step_summaries_by_plan(plan_id=plan_id)
     steps = await memory_store.get_steps_for_plan(plan_id=plan_id)
     return steps
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an entity tag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@app.get("/api/sessions/{session_id}/snapshot", response_model=None)
+async def get_session_snapshot(
+    session_id: str,
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    scope: RequestScope = Depends(get_request_scope),
+) -> Union[SessionSnapshot, Response]:
+    """
+    Retrieve a session's plan, steps and agent messages in one request.
+
+    They are read with a single query of the session's partition. The full
+    snapshot carries an ETag; send it back in If-None-Match to get 304 while
+    the session is unchanged. Pass the snapshot's `watermark` as `since` to
+    get only the documents changed since then, or 304 if there are none.
+
+    ---
+    tags:
+      - Sessions
+    parameters:
+      - name: session_id
+        in: path
+        type: string
+        required: true
+        description: The ID of the session to retrieve
+      - name: since
+        in: query
+        type: integer
+        required: false
+        description: >
+          Watermark of a previous snapshot; only the plan, steps and agent
+          messages changed since then are returned. Deletions are not reported.
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag of a previous full snapshot
+      - name: user_principal_id
+        in: header
+        type: string
+        required: true
+        description: User ID extracted from the authentication header
+    responses:
+      200:
+        description: The session's plan, steps and agent messages
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+            plan:
+              type: object
+              description: The session's plan, if it changed or is part of a full snapshot
+            steps:
+              type: array
+              items:
+                type: object
+            agent_messages:
+              type: array
+              items:
+                type: object
+            since:
+              type: integer
+              description: The watermark the changes were read from
+            watermark:
+              type: integer
+              description: Pass as since to read the next changes
+            etag:
+              type: string
+              description: ETag of a full snapshot
+      304:
+        description: The session has not changed
+      400:
+        description: Missing or invalid user information
+    """
+    memory_store = scope.memory_store(session_id)
+    snapshot = await memory_store.get_session_snapshot(session_id, since=since)
+
+    if since is not None:
+        if snapshot.plan is None and not snapshot.steps and not snapshot.agent_messages:
+            return Response(status_code=304)
+        return snapshot
+
+    etag = f'"{snapshot.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(snapshot), headers=headers)
+
+
+@app.get("/api/sessions/{session_id}/events", response_model=None)
+async def stream_session_events(
+    session_id: str,
+    user_id: str = Depends(get_user_id),
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """
+    Stream the changes to a session's plan, steps and agent messages.
+
+    ---
+    tags:
+      - Sessions
+    parameters:
+      - name: session_id
+        in: path
+        type: string
+        required: true
+        description: The ID of the session to follow
+      - name: user_principal_id
+        in: header
+        type: string
+        required: true
+        description: User ID extracted from the authentication header
+      - name: Last-Event-ID
+        in: header
+        type: string
+        required: false
+        description: >
+          ID of the last event received; the events after it are replayed.
+          Browsers send it when an EventSource reconnects.
+    responses:
+      200:
+        description: >
+          A text/event-stream of plan, step and agent_message events carrying
+          the changed document, and of agent_message_delta events with the
+          text of agent replies as it is generated. A reset event means the
+          missed events cannot be replayed and the session should be reloaded.
+      400:
+        description: Missing or invalid user information
+    """
+    track_event_if_configured(
+        "SessionEventStreamOpened",
+        {"session_id": session_id, "user_id": user_id, "resumed": bool(last_event_id)},
+    )
+    return StreamingResponse(
+        session_events.stream(session_id, user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/agent_messages/{session_id}", response_model=List[AgentMessage])
-async def get_agent_messages(session_id: str, request: Request) -> List[AgentMessage]:
+async def get_agent_messages(
+    session_id: str, scope: RequestScope = Depends(get_request_scope)
+) -> List[AgentMessage]:
     """
     Retrieve agent messages for a specific session.
 
@@ -750,73 +1126,176 @@ async def get_agent_messages(session_id: str, request: Request) -> List[AgentMes
       404:
         description: Agent messages not found
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        track_event_if_configured(
-            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
-        )
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
     # Initialize memory context
-    kernel, memory_store = await initialize_runtime_and_context(
-        session_id or "", user_id
-    )
+    memory_store = scope.memory_store(session_id or "")
+
+    if session_id and await materialized_view.load_session(memory_store, session_id):
+        return materialized_view.get_agent_messages_by_session(session_id, user_id) or []
+
     agent_messages = await memory_store.get_data_by_type("agent_message")
     return agent_messages
 
 
-@app.delete("/api/messages")
-async def delete_all_messages(request: Request) -> Dict[str, str]:
+@app.delete("/api/messages", status_code=202)
+async def delete_all_messages(
+    scope: RequestScope = Depends(get_request_scope),
+) -> Dict[str, str]:
     """
     Delete all messages across sessions.
 
+    The deletion runs in the background; poll /api/jobs/{job_id} for progress.
+
     ---
     tags:
       - Messages
     responses:
-      200:
-        description: Confirmation of deletion
+      202:
+        description: Deletion accepted
         schema:
           type: object
           properties:
             status:
               type: string
-              description: Status message indicating all messages were deleted
+              description: Status message indicating the deletion was started
+            job_id:
+              type: string
+              description: ID of the background deletion job
       400:
         description: Missing or invalid user information
+      429:
+        description: A deletion of the user is still running; retry after the Retry-After header's seconds
+      503:
+        description: Too many unfinished jobs; retry after the Retry-After header's seconds
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        raise HTTPException(status_code=400, detail="no user")
+    user_id = scope.user_id
 
-    # Initialize memory context
-    kernel, memory_store = await initialize_runtime_and_context("", user_id)
+    # The job outlives the request, so it gets a memory context of its own
+    # rather than one released with the request scope
+    memory_store = scope.resources.memory_store("", user_id)
 
-    logging.info("Deleting all plans")
-    await memory_store.delete_all_items("plan")
-    logging.info("Deleting all sessions")
-    await memory_store.delete_all_items("session")
-    logging.info("Deleting all steps")
-    await memory_store.delete_all_items("step")
-    logging.info("Deleting all agent_messages")
-    await memory_store.delete_all_items("agent_message")
+    async def delete_messages(job: Job) -> Dict[str, int]:
+        def report_progress(total: int, processed: int) -> None:
+            job.total = total
+            job.processed = processed
 
-    # Clear the agent factory cache
-    AgentFactory.clear_cache()
+        logging.info("Deleting all plans, sessions, steps, agent_messages")
+        counts = await memory_store.bulk_delete(
+            ["plan", "session", "step", "agent_message", "user_index", "plan_aggregate"],
+            on_progress=report_progress,
+        )
+        # Clear the agent factory cache; bulk_delete wrote a tombstone that
+        # drops the user's sessions from the materialized view of every process
+        AgentFactory.clear_cache()
+        return counts
+
+    try:
+        job = job_registry.submit("delete_messages", user_id, delete_messages)
+    except AdmissionRejected as e:
+        raise not_admitted(user_id, e)
+    track_event_if_configured(
+        "DeleteMessagesJobStarted", {"job_id": job.id, "user_id": user_id}
+    )
 
-    return {"status": "All messages deleted"}
+    return {"status": "Deletion started", "job_id": job.id}
+
+
+@app.get("/api/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, user_id: str = Depends(get_user_id)) -> Job:
+    """
+    Retrieve the status and progress of a background job.
+
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+        description: The ID of the job to retrieve
+      - name: user_principal_id
+        in: header
+        type: string
+        required: true
+        description: User ID extracted from the authentication header
+    responses:
+      200:
+        description: The job with its status and progress
+        schema:
+          type: object
+          properties:
+            id:
+              type: string
+            kind:
+              type: string
+            status:
+              type: string
+              enum: [queued, running, completed, failed]
+            total:
+              type: integer
+            processed:
+              type: integer
+            result:
+              type: object
+            error:
+              type: string
+            created_at:
+              type: string
+              format: date-time
+            started_at:
+              type: string
+              format: date-time
+            completed_at:
+              type: string
+              format: date-time
+            queue_seconds:
+              type: number
+              description: Time the job waited for a worker
+            run_seconds:
+              type: number
+              description: Time the job took to run
+      400:
+        description: Missing or invalid user information
+      404:
+        description: Job not found
+    """
+    job = job_registry.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @app.get("/api/messages")
-async def get_all_messages(request: Request):
+async def get_all_messages(
+    request: Request,
+    scope: RequestScope = Depends(get_request_scope),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+):
     """
     Retrieve all messages across sessions.
 
+    With an `Accept: application/x-ndjson` header the messages are streamed one
+    per line as the store returns them. At most `limit` messages are returned
+    and the last line is `{"next_cursor": ...}`; pass it back as `cursor` to
+    continue, it is null once the listing is complete.
+
     ---
     tags:
       - Messages
+    parameters:
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Continuation token of a previous NDJSON page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Maximum number of messages in an NDJSON page (default 100)
     responses:
       200:
         description: List of all messages across sessions
@@ -847,25 +1326,48 @@ async def get_all_messages(request: Request):
       400:
         description: Missing or invalid user information
     """
-    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
-    user_id = authenticated_user["user_principal_id"]
-    if not user_id:
-        raise HTTPException(status_code=400, detail="no user")
-
     # Initialize memory context
-    kernel, memory_store = await initialize_runtime_and_context("", user_id)
+    memory_store = scope.memory_store()
+    if _wants_ndjson(request):
+        _validate_cursor(cursor)
+        return StreamingResponse(
+            _ndjson_page(
+                memory_store.iter_all_messages(cursor, page_size=min(limit, 100)),
+                limit,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
     message_list = await memory_store.get_all_items()
     return message_list
 
 
-@app.get("/api/agent-tools")
-async def get_agent_tools():
+@app.get("/api/agent-tools", response_model=None)
+async def get_agent_tools(
+    version: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
     Retrieve all available agent tools.
 
+    The tools only change with a deployment. The response carries the
+    catalog's version as its ETag; with a matching If-None-Match it is 304.
+    Requests that name the current version may cache the response for good.
+
     ---
     tags:
       - Agent Tools
+    parameters:
+      - name: version
+        in: query
+        type: string
+        required: false
+        description: The catalog version (ETag) the client expects
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag of a previously fetched catalog
     responses:
       200:
         description: List of all available agent tools and their descriptions
@@ -886,8 +1388,75 @@ async def get_agent_tools():
               arguments:
                 type: string
                 description: Arguments required by the tool function
+              parameters:
+                type: object
+                description: JSON schema of the tool function's arguments
+      304:
+        description: The catalog has not changed
+    """
+    etag = f'"{tool_catalog.version}"'
+    if version == tool_catalog.version:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=300, must-revalidate"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=tool_catalog.tools, headers=headers)
+
+
+@app.get("/api/metrics", response_model=None)
+async def get_metrics(
+    format: Literal["json", "prometheus"] = Query("json"),
+) -> Union[Dict[str, Any], PlainTextResponse]:
+    """
+    Retrieve in-process counters for monitoring.
+
+    ---
+    tags:
+      - Monitoring
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, prometheus]
+        description: "prometheus" returns the Cosmos DB operation and admission counters in the text exposition format
+    responses:
+      200:
+        description: Counters of the plan and step cache, Cosmos DB operations and admission control
+        schema:
+          type: object
+          properties:
+            cache:
+              type: object
+              description: Hit, miss, eviction and expiration counters
+            cosmos:
+              type: object
+              properties:
+                operations:
+                  type: array
+                  description: Count, errors, retries, RU charge and latency per method and data_type
+                circuit_breaker:
+                  type: object
+                  description: State of the Cosmos DB circuit breaker
+            admission:
+              type: object
+              description: >
+                Active requests, queue depth, wait times and rejections of the
+                admission control of /api/input_task and /api/approve_step_or_steps
     """
-    return []
+    if format == "prometheus":
+        return PlainTextResponse(
+            cosmos_metrics.to_prometheus() + admission_controller.to_prometheus()
+        )
+    return {
+        "cache": CosmosMemoryContext.cache_stats(),
+        "cosmos": {
+            "operations": cosmos_metrics.snapshot(),
+            "circuit_breaker": cosmos_circuit_breaker.stats(),
+        },
+        "admission": admission_controller.stats(),
+    }
 
 
 # Run the app
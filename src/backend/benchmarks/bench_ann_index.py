@@ -0,0 +1,94 @@
+"""Benchmark recall and latency of the IVF memory index against the exact index.
+
+Builds both indexes over clustered random embeddings (similar to sentence
+embeddings, which are far from uniformly spread), runs the same queries against
+each and reports recall@k of the IVF results with respect to the exact top-k,
+the mean query latency, and the time to load the saved IVF index with and
+without memory mapping.
+
+Usage (from src/backend):
+    python -m benchmarks.bench_ann_index --records 50000 --dimension 256 --n-probe 8
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from context.ann_index import IVFIndex
+from context.vector_index import VectorIndex
+
+
+def make_embeddings(
+    rng: np.random.Generator, count: int, dimension: int, clusters: int
+) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    noise = rng.standard_normal((count, dimension)).astype(np.float32) * 0.6
+    return centers[labels] + noise
+
+
+def timed_queries(index, queries, k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([item_id for item_id, _, _ in index.search(query, k, -1.0, **kwargs)])
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = make_embeddings(rng, args.records, args.dimension, args.clusters)
+    queries = make_embeddings(rng, args.queries, args.dimension, args.clusters)
+
+    exact = VectorIndex(dimension=args.dimension, initial_capacity=args.records)
+    for i, embedding in enumerate(embeddings):
+        exact.upsert(str(i), embedding)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.from_index(exact, n_probe=args.n_probe)
+    ivf.train()
+    train_seconds = time.perf_counter() - start
+
+    exact_results, exact_latency = timed_queries(exact, queries, args.k)
+    ivf_results, ivf_latency = timed_queries(ivf, queries, args.k)
+    recall = np.mean(
+        [
+            len(set(expected) & set(found)) / args.k
+            for expected, found in zip(exact_results, ivf_results)
+        ]
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        ivf.save(directory)
+        start = time.perf_counter()
+        IVFIndex.load(directory, mmap=False)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        mapped = IVFIndex.load(directory, mmap=True)
+        mmap_seconds = time.perf_counter() - start
+        _, mapped_latency = timed_queries(mapped, queries, args.k)
+        del mapped
+
+    print(f"{args.records} records, dimension {args.dimension}, k={args.k}")
+    print(f"exact:       {exact_latency * 1000:8.3f} ms/query")
+    print(
+        f"ivf:         {ivf_latency * 1000:8.3f} ms/query  recall@{args.k}={recall:.3f}  "
+        f"({ivf._centroids.shape[0]} lists, n_probe={args.n_probe}, "
+        f"trained in {train_seconds:.2f} s)"
+    )
+    print(f"ivf (mmap):  {mapped_latency * 1000:8.3f} ms/query")
+    print(f"load:        {load_seconds * 1000:8.1f} ms  mmap load: {mmap_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark store round trips of Step, Plan and AgentMessage models.
+
+Compares the previous persistence path (model_dump followed by a manual
+datetime conversion on writes, a copy of _ts into the document and
+model_validate on reads) with models.serialization, and reports what
+model_construct would cost for the reads. Writes include json.dumps and reads
+json.loads, as the documents go through them on their way to the store.
+
+Usage (from src/backend):
+    python -m benchmarks.bench_serialization --iterations 20000
+"""
+import argparse
+import datetime
+import json
+import time
+
+from models.messages_kernel import (
+    AgentMessage,
+    AgentType,
+    Plan,
+    PlanStatus,
+    Step,
+    StepStatus,
+)
+from models.serialization import from_document, to_document
+
+
+def legacy_to_document(item):
+    document = item.model_dump()
+    for key, value in list(document.items()):
+        if isinstance(value, datetime.datetime):
+            document[key] = value.isoformat()
+    return document
+
+
+def legacy_from_document(model_class, document):
+    document["ts"] = document.get("_ts")
+    return model_class.model_validate(document)
+
+
+def construct_from_document(model_class, document):
+    return model_class.model_construct(
+        **{name: document[name] for name in model_class.model_fields if name in document}
+    )
+
+
+def sample_models():
+    plan = Plan(
+        session_id="session",
+        user_id="user",
+        initial_goal="Onboard a new employee",
+        overall_status=PlanStatus.in_progress,
+        summary="Prepare the workstation, accounts and the first week's schedule.",
+    )
+    step = Step(
+        plan_id=plan.id,
+        session_id="session",
+        user_id="user",
+        action="Create the employee's accounts in the HR system",
+        agent=AgentType.HR,
+        status=StepStatus.completed,
+        agent_reply="## Accounts created\n\n" + "The HR account is ready. " * 40,
+    )
+    message = AgentMessage(
+        session_id="session",
+        user_id="user",
+        plan_id=plan.id,
+        content="Step completed: accounts created for the new employee.",
+        source=AgentType.HR.value,
+        step_id=step.id,
+    )
+    return [step, plan, message]
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(
+        f"{'model':<14}{'write legacy':>14}{'write':>10}"
+        f"{'read legacy':>14}{'read':>10}{'construct':>12}   (us per call)"
+    )
+    for item in sample_models():
+        model_class = type(item)
+        text = json.dumps(to_document(item))
+        document = json.loads(text)
+        document["_ts"] = 1700000000
+
+        write_legacy = timed(lambda: json.dumps(legacy_to_document(item)), args.iterations)
+        write = timed(lambda: json.dumps(to_document(item)), args.iterations)
+        read_legacy = timed(
+            lambda: legacy_from_document(model_class, json.loads(text)), args.iterations
+        )
+        read = timed(lambda: from_document(model_class, json.loads(text)), args.iterations)
+        construct = timed(
+            lambda: construct_from_document(model_class, document), args.iterations
+        )
+        print(
+            f"{model_class.__name__:<14}{write_legacy:>14.2f}{write:>10.2f}"
+            f"{read_legacy:>14.2f}{read:>10.2f}{construct:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
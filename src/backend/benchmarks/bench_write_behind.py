@@ -0,0 +1,150 @@
+"""Benchmark Cosmos DB round trips for the planner's write path with and without write-behind.
+
+Replays the writes issued while a plan is created (the input task message from
+GroupChatManager, the Plan and every Step from PlannerAgent._create_structured_plan,
+and the planner's summary and clarification messages) against an in-memory
+container that counts round trips and simulates network latency.
+
+Usage (from src/backend):
+    python -m benchmarks.bench_write_behind --steps 6 --latency-ms 8
+"""
+import argparse
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+# AppConfig requires these settings; the benchmark never talks to Azure
+for _name in (
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_AI_SUBSCRIPTION_ID",
+    "AZURE_AI_RESOURCE_GROUP",
+    "AZURE_AI_PROJECT_NAME",
+    "AZURE_AI_AGENT_PROJECT_CONNECTION_STRING",
+):
+    os.environ.setdefault(_name, "benchmark")
+
+from app_config import config  # noqa: E402
+from context.cosmos_memory_kernel import CosmosMemoryContext  # noqa: E402
+from models.messages_kernel import (  # noqa: E402
+    AgentMessage,
+    AgentType,
+    HumanFeedbackStatus,
+    Plan,
+    PlanStatus,
+    Step,
+    StepStatus,
+)
+
+
+class CountingContainer:
+    """Minimal async container proxy that counts round trips."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.round_trips = 0
+        self.documents = {}
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    async def create_item(self, body, **kwargs):
+        await self._round_trip()
+        self.documents[body["id"]] = body
+        return body
+
+    async def upsert_item(self, body, **kwargs):
+        await self._round_trip()
+        self.documents[body["id"]] = body
+        return body
+
+    async def execute_item_batch(self, batch_operations, partition_key, **kwargs):
+        await self._round_trip()
+        for _operation, (body,) in batch_operations:
+            self.documents[body["id"]] = body
+        return []
+
+
+async def create_structured_plan(memory_store, session_id, user_id, steps):
+    """Issue the writes PlannerAgent makes when it stores a new plan."""
+    await memory_store.add_item(
+        AgentMessage(
+            session_id=session_id,
+            user_id=user_id,
+            plan_id="",
+            content="Onboard a new employee",
+            source=AgentType.HUMAN.value,
+            step_id="",
+        )
+    )
+    plan = Plan(
+        session_id=session_id,
+        user_id=user_id,
+        initial_goal="Onboard a new employee",
+        overall_status=PlanStatus.in_progress,
+        summary="Onboarding plan",
+        human_clarification_request="What is the employee's start date?",
+    )
+    await memory_store.add_plan(plan)
+    for index in range(steps):
+        await memory_store.add_step(
+            Step(
+                plan_id=plan.id,
+                session_id=session_id,
+                user_id=user_id,
+                action=f"Step {index}",
+                agent=AgentType.HR,
+                status=StepStatus.planned,
+                human_approval_status=HumanFeedbackStatus.requested,
+            )
+        )
+    for content in (
+        f"Generated a plan with {steps} steps.",
+        "I require additional information before we can proceed.",
+    ):
+        await memory_store.add_item(
+            AgentMessage(
+                session_id=session_id,
+                user_id=user_id,
+                plan_id=plan.id,
+                content=content,
+                source=AgentType.PLANNER.value,
+                step_id="",
+            )
+        )
+    await memory_store.flush()
+
+
+async def run(write_behind: bool, steps: int, latency: float):
+    container = CountingContainer(latency)
+    with patch.object(config, "get_cosmos_container", return_value=container):
+        memory_store = CosmosMemoryContext(
+            "benchmark-session", "benchmark-user", write_behind=write_behind
+        )
+        memory_store._container = container
+        start = time.perf_counter()
+        await create_structured_plan(
+            memory_store, "benchmark-session", "benchmark-user", steps
+        )
+        elapsed = time.perf_counter() - start
+    return container.round_trips, elapsed, len(container.documents)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=8.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'round trips':>12}{'elapsed ms':>12}{'documents':>11}")
+    for write_behind in (False, True):
+        round_trips, elapsed, documents = await run(
+            write_behind, args.steps, args.latency_ms / 1000
+        )
+        mode = "write-behind" if write_behind else "direct"
+        print(f"{mode:<14}{round_trips:>12}{elapsed * 1000:>12.1f}{documents:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+# ann_index.py
+
+import json
+import os
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from context.vector_index import VectorIndex, top_k
+
+
+class IVFIndex(VectorIndex):
+    """An approximate cosine-similarity index using an inverted file (IVF).
+
+    The normalized embeddings are partitioned into n_lists clusters with
+    spherical k-means. A query only scores the rows of the n_probe clusters
+    whose centroids are closest to it. Until train() has run, searches are
+    exact. Inserts are assigned to their nearest centroid and removals reuse
+    the row compaction of VectorIndex. The index retrains once it has grown
+    by retrain_growth since the last training.
+
+    The index can be saved to a directory and loaded back with its arrays
+    memory-mapped; the arrays are copied into memory on the first write.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    ASSIGNMENTS_FILE = "assignments.npy"
+    CENTROIDS_FILE = "centroids.npy"
+    METADATA_FILE = "metadata.json"
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        initial_capacity: int = 64,
+        retrain_growth: float = 2.0,
+    ) -> None:
+        super().__init__(dimension, initial_capacity)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.retrain_growth = retrain_growth
+        self.metadata: Dict[str, Any] = {}
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+
+    @classmethod
+    def from_index(cls, index: VectorIndex, **kwargs: Any) -> "IVFIndex":
+        """Build an untrained IVF index holding the rows of an exact index."""
+        ivf = cls(dimension=index.dimension, **kwargs)
+        with index._lock:
+            size = len(index)
+            if size:
+                ivf._matrix = np.array(index._matrix[:size])
+                ivf._assignments = np.full(size, -1, dtype=np.int32)
+            ivf._ids = list(index._ids)
+            ivf._payloads = list(index._payloads)
+            ivf._positions = dict(index._positions)
+        return ivf
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def _ensure_capacity(self, size: int) -> None:
+        super()._ensure_capacity(size)
+        if self._assignments.shape[0] < self._matrix.shape[0]:
+            grown = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            grown[: len(self._ids)] = self._assignments[: len(self._ids)]
+            self._assignments = grown
+
+    def _ensure_writable(self) -> None:
+        """Copy memory-mapped arrays into memory before they are modified."""
+        if self._matrix is not None and not self._matrix.flags.writeable:
+            self._matrix = np.array(self._matrix)
+        if not self._assignments.flags.writeable:
+            self._assignments = np.array(self._assignments)
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def train(self, sample_size: int = 10000, iterations: int = 10, seed: int = 0) -> None:
+        """Cluster the current rows with spherical k-means and assign every row."""
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return
+            self._ensure_writable()
+
+            rng = np.random.default_rng(seed)
+            vectors = self._matrix[:size]
+            sample = vectors[rng.choice(size, min(size, sample_size), replace=False)]
+            n_lists = min(self.n_lists or max(1, int(np.sqrt(size))), sample.shape[0])
+
+            centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=n_lists)
+                empty = counts == 0
+                # Restart empty clusters from random sample rows
+                sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = sums / np.where(norms > 0, norms, 1)
+
+            self._centroids = centroids.astype(np.float32)
+            for start in range(0, size, 8192):
+                self._assignments[start : start + 8192] = self._nearest_lists(
+                    vectors[start : start + 8192]
+                )
+            self._trained_size = size
+
+    def upsert(self, item_id: Hashable, embedding: np.ndarray, payload: Any = None) -> None:
+        """Insert or replace a row and assign it to its nearest cluster."""
+        with self._lock:
+            self._ensure_writable()
+            super().upsert(item_id, embedding, payload)
+            if not self.is_trained:
+                return
+
+            position = self._positions[item_id]
+            self._assignments[position] = self._nearest_lists(
+                self._matrix[position : position + 1]
+            )[0]
+            if len(self._ids) >= self._trained_size * self.retrain_growth:
+                self.train()
+
+    def upsert_many(
+        self, item_ids: List[Hashable], embeddings: np.ndarray, payloads: List[Any]
+    ) -> None:
+        """Insert or replace several rows, assigning each to its nearest cluster."""
+        with self._lock:
+            for item_id, embedding, payload in zip(item_ids, embeddings, payloads):
+                self.upsert(item_id, embedding, payload)
+
+    def remove(self, item_id: Hashable) -> bool:
+        """Remove a row, moving the last row and its cluster assignment into its slot."""
+        with self._lock:
+            position = self._positions.get(item_id)
+            if position is None:
+                return False
+            self._ensure_writable()
+            self._assignments[position] = self._assignments[len(self._ids) - 1]
+            return super().remove(item_id)
+
+    def search(
+        self,
+        embedding: np.ndarray,
+        limit: int = 1,
+        min_relevance_score: float = 0.0,
+        n_probe: Optional[int] = None,
+    ) -> List[Tuple[Hashable, Any, float]]:
+        """Return up to limit (id, payload, score) tuples from the closest clusters."""
+        with self._lock:
+            if not self.is_trained:
+                return super().search(embedding, limit, min_relevance_score)
+
+            size = len(self._ids)
+            if size == 0 or limit <= 0:
+                return []
+
+            query = self._normalize_query(embedding)
+            n_probe = min(n_probe or self.n_probe, self._centroids.shape[0])
+            probed = top_k(self._centroids @ query, n_probe)
+            candidates = np.flatnonzero(np.isin(self._assignments[:size], probed))
+            scores = self._matrix[candidates] @ query
+            return [
+                (
+                    self._ids[candidates[position]],
+                    self._payloads[candidates[position]],
+                    float(scores[position]),
+                )
+                for position in top_k(scores, limit)
+                if scores[position] >= min_relevance_score
+            ]
+
+    def save(self, directory: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Write the index to a directory. Ids and payloads must be JSON serializable."""
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            size = len(self._ids)
+            matrix = (
+                self._matrix[:size]
+                if self._matrix is not None
+                else np.zeros((0, self.dimension or 0), dtype=np.float32)
+            )
+            np.save(os.path.join(directory, self.VECTORS_FILE), matrix)
+            np.save(
+                os.path.join(directory, self.ASSIGNMENTS_FILE), self._assignments[:size]
+            )
+            centroids_path = os.path.join(directory, self.CENTROIDS_FILE)
+            if self._centroids is not None:
+                np.save(centroids_path, self._centroids)
+            elif os.path.exists(centroids_path):
+                os.remove(centroids_path)
+
+            self.metadata = metadata or {}
+            document = {
+                "dimension": self.dimension,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "retrain_growth": self.retrain_growth,
+                "trained_size": self._trained_size,
+                "ids": self._ids,
+                "payloads": self._payloads,
+                "metadata": self.metadata,
+            }
+            # Written last and atomically, so a partial save is never loaded
+            metadata_path = os.path.join(directory, self.METADATA_FILE)
+            with open(metadata_path + ".tmp", "w") as f:
+                json.dump(document, f)
+            os.replace(metadata_path + ".tmp", metadata_path)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "IVFIndex":
+        """Load an index saved with save(), memory-mapping its arrays by default."""
+        with open(os.path.join(directory, cls.METADATA_FILE), "r") as f:
+            document = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        index = cls(
+            dimension=document["dimension"],
+            n_lists=document["n_lists"],
+            n_probe=document["n_probe"],
+            retrain_growth=document["retrain_growth"],
+        )
+        index._ids = document["ids"]
+        index._payloads = document["payloads"]
+        index._positions = {item_id: i for i, item_id in enumerate(index._ids)}
+        index.metadata = document["metadata"]
+        index._trained_size = document["trained_size"]
+        if index._ids:
+            index._matrix = np.load(
+                os.path.join(directory, cls.VECTORS_FILE), mmap_mode=mmap_mode
+            )
+            index._assignments = np.load(
+                os.path.join(directory, cls.ASSIGNMENTS_FILE), mmap_mode=mmap_mode
+            )
+        centroids_path = os.path.join(directory, cls.CENTROIDS_FILE)
+        if os.path.exists(centroids_path):
+            index._centroids = np.load(centroids_path)
+        return index
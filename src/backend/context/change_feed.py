@@ -0,0 +1,175 @@
+# change_feed.py
+
+import asyncio
+import json
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app_config import config
+from context.event_bus import EventBus, event_bus
+
+
+class ChangeFeedProcessor(ABC):
+    """Polls a store for changed documents and publishes them to an event bus.
+
+    Subclasses implement read_changes, which returns the documents changed
+    since the previous call, starting with changes made after the processor
+    first polled. caught_up is set once a poll finds nothing left to publish.
+    """
+
+    def __init__(self, bus: EventBus = event_bus, poll_interval: float = 1.0) -> None:
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.caught_up = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def read_changes(self) -> List[Dict[str, Any]]:
+        """Return the documents changed since the last call, oldest first."""
+
+    async def poll_once(self) -> int:
+        """Publish the pending changes and return how many there were."""
+        documents = await self.read_changes()
+        for document in documents:
+            await self.bus.publish_document(document)
+        if not documents:
+            self.caught_up.set()
+        return len(documents)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.poll_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"Change feed poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Start polling in a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class CosmosChangeFeedProcessor(ChangeFeedProcessor):
+    """Reads the Cosmos DB container's change feed from the time it first polls.
+
+    Only the latest version of each document is delivered, and deletes are not
+    part of the feed; they arrive as tombstone documents instead.
+    """
+
+    def __init__(self, bus: EventBus = event_bus, poll_interval: float = 1.0) -> None:
+        super().__init__(bus, poll_interval)
+        self._continuation: Optional[str] = None
+
+    async def read_changes(self) -> List[Dict[str, Any]]:
+        container = await config.get_cosmos_container()
+        if self._continuation:
+            feed = container.query_items_change_feed(continuation=self._continuation)
+        else:
+            feed = container.query_items_change_feed(start_time="Now")
+        pages = feed.by_page()
+        documents = []
+        async for page in pages:
+            documents.extend([item async for item in page])
+            if pages.continuation_token:
+                self._continuation = pages.continuation_token
+        return documents
+
+
+class SQLiteChangeFeedProcessor(ChangeFeedProcessor):
+    """Polls the SQLite memory store for rows written since the last poll.
+
+    The first poll only records the newest row, so rows written before the
+    processor started are not published.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[str] = None,
+        bus: EventBus = event_bus,
+        poll_interval: float = 1.0,
+        batch_size: int = 1000,
+    ) -> None:
+        super().__init__(bus, poll_interval)
+        self.database_path = database_path or config.SQLITE_DATABASE_PATH
+        self.batch_size = batch_size
+        self._position: Optional[Tuple[float, int]] = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    async def read_changes(self) -> List[Dict[str, Any]]:
+        # Polling the database blocks, so it runs on a worker thread
+        return await asyncio.to_thread(self._read_rows)
+
+    def _read_rows(self) -> List[Dict[str, Any]]:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        try:
+            if self._position is None:
+                latest = self._connection.execute(
+                    "SELECT _ts, rowid FROM items ORDER BY _ts DESC, rowid DESC LIMIT 1"
+                ).fetchone()
+                self._position = (latest[0], latest[1]) if latest else (-1.0, -1)
+                return []
+            last_ts, last_rowid = self._position
+            rows = self._connection.execute(
+                "SELECT rowid, _ts, body FROM items WHERE _ts > ? OR (_ts = ? AND rowid > ?) "
+                "ORDER BY _ts, rowid LIMIT ?",
+                (last_ts, last_ts, last_rowid, self.batch_size),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # The store has not created its table yet, so every row will be new
+            if self._position is None:
+                self._position = (-1.0, -1)
+            return []
+        if rows:
+            self._position = (rows[-1][1], rows[-1][0])
+        return [json.loads(body) for _, _, body in rows]
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._connection is not None:
+            await asyncio.to_thread(self._connection.close)
+            self._connection = None
+
+
+class InMemoryChangeFeed(ChangeFeedProcessor):
+    """A change feed fed by hand, for tests."""
+
+    def __init__(self, bus: EventBus = event_bus, poll_interval: float = 0.01) -> None:
+        super().__init__(bus, poll_interval)
+        self._pending: List[Dict[str, Any]] = []
+
+    def push(self, document: Dict[str, Any]) -> None:
+        self._pending.append(document)
+
+    async def read_changes(self) -> List[Dict[str, Any]]:
+        documents, self._pending = self._pending, []
+        return documents
+
+
+def create_change_feed_processor(bus: EventBus = event_bus) -> ChangeFeedProcessor:
+    """Create the change-feed processor for the configured MEMORY_BACKEND."""
+    if config.MEMORY_BACKEND == "sqlite":
+        return SQLiteChangeFeedProcessor(
+            bus=bus, poll_interval=config.CHANGE_FEED_POLL_SECONDS
+        )
+    if config.MEMORY_BACKEND == "cosmos":
+        return CosmosChangeFeedProcessor(
+            bus=bus, poll_interval=config.CHANGE_FEED_POLL_SECONDS
+        )
+    raise ValueError(f"Unknown MEMORY_BACKEND: {config.MEMORY_BACKEND}")
@@ -5,19 +5,35 @@ import logging
 import uuid
 import json
 import datetime
-from typing import Any, Dict, List, Optional, Type, Tuple
-import numpy as np
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Type, Tuple
 
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 from azure.cosmos.partition_key import PartitionKey
 from azure.cosmos.aio import CosmosClient
-from azure.identity import DefaultAzureCredential
 from semantic_kernel.memory.memory_record import MemoryRecord
-from semantic_kernel.memory.memory_store_base import MemoryStoreBase
 from semantic_kernel.contents import ChatMessageContent, ChatHistory, AuthorRole
 
 # Import the AppConfig instance
 from app_config import config
-from models.messages_kernel import BaseDataModel, Plan, Session, Step, AgentMessage
+from context.cosmos_resilience import ResilientContainer, is_transient
+from context.embedding_codec import decode_embedding
+from context.event_bus import DocumentChange
+from context.memory_cache import TTLCache
+from context.memory_context_base import MemoryContextBase
+from context.vector_index import VectorIndex
+from models.messages_kernel import (
+    AgentMessage,
+    BaseDataModel,
+    Plan,
+    Session,
+    Step,
+    StepSummary,
+    UserSessionIndex,
+)
+from models.merge import merge_plan, merge_step
+from models.serialization import from_document, to_document
 
 
 # Add custom JSON encoder class for datetime objects
@@ -30,16 +46,32 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-class CosmosMemoryContext(MemoryStoreBase):
+class CosmosMemoryContext(MemoryContextBase):
     """A buffered chat completion context that saves messages and data models to Cosmos DB."""
 
-    MODEL_CLASS_MAPPING = {
-        "session": Session,
-        "plan": Plan,
-        "step": Step,
-        "agent_message": AgentMessage,
-        # Messages are handled separately
-    }
+    # Cosmos DB limits a transactional batch to 100 operations
+    MAX_BATCH_OPERATIONS = 100
+
+    # Attempts at writing a write-behind item that keeps failing transiently
+    WRITE_BEHIND_MAX_ATTEMPTS = 5
+
+    # Attempts at a conditional update of the per-user session index
+    USER_INDEX_UPDATE_ATTEMPTS = 5
+
+    # Version 1 indexes every session with data of the user, not just those with a plan
+    USER_INDEX_VERSION = 1
+
+    # Contexts holding unflushed write-behind operations, flushed at shutdown
+    _contexts_with_pending_writes: "weakref.WeakSet[CosmosMemoryContext]" = (
+        weakref.WeakSet()
+    )
+
+    # Process-wide read-through cache of plans by session and steps by plan,
+    # kept current by the write methods of every context in the process
+    _plan_cache = TTLCache(
+        max_entries=config.COSMOSDB_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.COSMOSDB_CACHE_TTL_SECONDS,
+    )
 
     def __init__(
         self,
@@ -50,6 +82,9 @@ class CosmosMemoryContext(MemoryStoreBase):
         cosmos_database: str = None,
         buffer_size: int = 100,
         initial_messages: Optional[List[ChatMessageContent]] = None,
+        write_behind: Optional[bool] = None,
+        write_behind_batch_size: Optional[int] = None,
+        write_behind_flush_interval: Optional[float] = None,
     ) -> None:
         self._buffer_size = buffer_size
         self._messages = initial_messages or []
@@ -61,29 +96,70 @@ class CosmosMemoryContext(MemoryStoreBase):
 
         self._database = None
         self._container = None
+        # Client owned by this context when it targets a non-default account/database.
+        # Contexts using the configured account share the pooled client in AppConfig.
+        self._cosmos_client = None
         self.session_id = session_id
         self.user_id = user_id
         self._initialized = asyncio.Event()
         # Skip auto-initialize in constructor to avoid requiring a running event loop
         self._initialized.set()
 
+        # Write-behind mode queues add_item/update_item per session_id partition and
+        # flushes them as transactional batches on a size or time threshold
+        self._write_behind = (
+            config.COSMOSDB_WRITE_BEHIND if write_behind is None else write_behind
+        )
+        self._write_behind_batch_size = min(
+            write_behind_batch_size or config.COSMOSDB_WRITE_BEHIND_BATCH_SIZE,
+            self.MAX_BATCH_OPERATIONS,
+        )
+        self._write_behind_flush_interval = (
+            config.COSMOSDB_WRITE_BEHIND_FLUSH_INTERVAL
+            if write_behind_flush_interval is None
+            else write_behind_flush_interval
+        )
+        # partition key -> item id -> (operation, document), in arrival order
+        self._pending_writes: Dict[str, Dict[str, Tuple[str, Dict[str, Any]]]] = {}
+        # item id -> failed attempts at writing its queued operation
+        self._write_attempts: Dict[str, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Sessions this context already moved to the front of the user's index
+        self._indexed_sessions: Set[str] = set()
+
+    def _uses_shared_client(self) -> bool:
+        """Whether this context targets the account configured in AppConfig."""
+        return (
+            self._cosmos_endpoint == config.COSMOSDB_ENDPOINT
+            and self._cosmos_database == config.COSMOSDB_DATABASE
+            and self._cosmos_container == config.COSMOSDB_CONTAINER
+        )
+
     async def initialize(self):
         """Initialize the memory context using CosmosDB."""
         try:
-            if not self._database:
-                # Create Cosmos client
-                cosmos_client = CosmosClient(
-                    self._cosmos_endpoint, credential=DefaultAzureCredential()
-                )
-                self._database = cosmos_client.get_database_client(
-                    self._cosmos_database
-                )
+            if self._uses_shared_client():
+                # Reuse the process-wide client and container proxy
+                container = await config.get_cosmos_container()
+            else:
+                if not self._database:
+                    # Create a dedicated Cosmos client for this context
+                    self._cosmos_client = CosmosClient(
+                        self._cosmos_endpoint,
+                        credential=config.get_azure_credentials(),
+                    )
+                    self._database = self._cosmos_client.get_database_client(
+                        self._cosmos_database
+                    )
 
-            # Set up CosmosDB container
-            self._container = await self._database.create_container_if_not_exists(
-                id=self._cosmos_container,
-                partition_key=PartitionKey(path="/session_id"),
-            )
+                # Set up CosmosDB container
+                container = await self._database.create_container_if_not_exists(
+                    id=self._cosmos_container,
+                    partition_key=PartitionKey(path="/session_id"),
+                )
+            # Retry throttled requests and record latency and RU charge per operation
+            self._container = ResilientContainer(container)
             logging.info("Successfully connected to CosmosDB")
         except Exception as e:
             logging.error(
@@ -115,21 +191,28 @@ class CosmosMemoryContext(MemoryStoreBase):
                     "CosmosDB container is not available. Initialization failed."
                 )
 
+    @staticmethod
+    def _to_document(item: BaseDataModel) -> Dict[str, Any]:
+        """Convert a data model to a Cosmos DB document."""
+        return to_document(item)
+
     async def add_item(self, item: BaseDataModel) -> None:
         """Add a data model item to Cosmos DB."""
         await self.ensure_initialized()
 
         try:
-            # Convert the model to a dict
-            document = item.model_dump()
-
-            # Handle datetime objects by converting them to ISO format strings
-            for key, value in list(document.items()):
-                if isinstance(value, datetime.datetime):
-                    document[key] = value.isoformat()
-
-            # Now create the item with the serialized datetime values
-            await self._container.create_item(body=document)
+            document = self._to_document(item)
+
+            if self._write_behind and document.get("session_id"):
+                await self._enqueue_write("create", document)
+                await self._publish(document)
+                await self._index_session(document)
+                return
+
+            created = await self._container.create_item(body=document)
+            self._remember_etag(item, created)
+            await self._publish(created if isinstance(created, dict) else document)
+            await self._index_session(document)
             logging.info(f"Item added to Cosmos DB - {document['id']}")
         except Exception as e:
             logging.exception(f"Failed to add item to Cosmos DB: {e}")
@@ -140,20 +223,262 @@ class CosmosMemoryContext(MemoryStoreBase):
         await self.ensure_initialized()
 
         try:
-            # Convert the model to a dict
-            document = item.model_dump()
+            document = self._to_document(item)
 
-            # Handle datetime objects by converting them to ISO format strings
-            for key, value in list(document.items()):
-                if isinstance(value, datetime.datetime):
-                    document[key] = value.isoformat()
+            if self._write_behind and document.get("session_id"):
+                await self._enqueue_write("upsert", document)
+                await self._publish(document)
+                return
 
-            # Now upsert the item with the serialized datetime values
-            await self._container.upsert_item(body=document)
+            written = await self._container.upsert_item(body=document)
+            self._remember_etag(item, written)
+            await self._publish(written if isinstance(written, dict) else document)
         except Exception as e:
             logging.exception(f"Failed to update item in Cosmos DB: {e}")
             raise  # Propagate the error instead of silently failing
 
+    @staticmethod
+    def _remember_etag(item: BaseDataModel, response: Any) -> None:
+        """Keep the _etag of the document Cosmos DB returned for a write."""
+        if isinstance(response, dict):
+            item._etag = response.get("_etag")
+
+    async def _read_document(
+        self, item_id: str, partition_key: str
+    ) -> Optional[Dict[str, Any]]:
+        """Point-read a document with its _etag, or None if it does not exist."""
+        await self.ensure_initialized()
+        await self._flush_before_read()
+        try:
+            return await self._container.read_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            return None
+
+    async def _replace_if_match(
+        self, document: Dict[str, Any], etag: str
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a document only if it is unchanged since it had this _etag."""
+        try:
+            replaced = await self._container.replace_item(
+                item=document["id"],
+                body=document,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except CosmosHttpResponseError as e:
+            # 412: changed since it was read; 404: deleted concurrently
+            if e.status_code in (404, 412):
+                return None
+            raise
+        return replaced if isinstance(replaced, dict) else document
+
+    async def _patch_if_match(
+        self,
+        item_id: str,
+        partition_key: str,
+        operations: List[Dict[str, Any]],
+        etag: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Patch a document on the server only if it is unchanged since it had this _etag."""
+        await self.ensure_initialized()
+        await self._flush_before_read()
+        try:
+            return await self._container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=operations,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except CosmosHttpResponseError as e:
+            # 412: changed since it was read; 404: deleted concurrently
+            if e.status_code in (404, 412):
+                return None
+            raise
+
+    async def _enqueue_write(self, operation: str, document: Dict[str, Any]) -> None:
+        """Queue a write for its session_id partition and flush on a size threshold."""
+        partition_key = document["session_id"]
+        pending = self._pending_writes.setdefault(partition_key, {})
+
+        # Coalesce repeated writes to the same item: a create followed by an
+        # upsert is still a single create of the latest document
+        previous = pending.pop(document["id"], None)
+        if previous is not None and previous[0] == "create":
+            operation = "create"
+        pending[document["id"]] = (operation, document)
+        CosmosMemoryContext._contexts_with_pending_writes.add(self)
+
+        if len(pending) >= self._write_behind_batch_size:
+            await self._flush_partition(partition_key)
+        elif self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_after_interval()
+            )
+
+    async def _flush_after_interval(self) -> None:
+        """Flush pending writes once the time threshold has passed."""
+        await asyncio.sleep(self._write_behind_flush_interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.exception(f"Failed to flush write-behind buffer: {e}")
+
+    async def _flush_partition(self, partition_key: str) -> None:
+        """Write the queued operations of one partition as transactional batches."""
+        async with self._flush_lock:
+            await self._write_partition(partition_key)
+
+    async def _write_partition(self, partition_key: str) -> None:
+        """Write one partition's queue; the caller holds _flush_lock.
+
+        Operations that failed transiently are queued again ahead of any newer
+        write of the same item, up to WRITE_BEHIND_MAX_ATTEMPTS attempts. Other
+        failures are logged and dropped. The first failure is raised.
+        """
+        pending = self._pending_writes.pop(partition_key, None)
+        if not pending:
+            return
+
+        operations = list(pending.values())
+        failed: List[Tuple[str, Dict[str, Any]]] = []
+        errors: List[Exception] = []
+        dropped = 0
+        for start in range(0, len(operations), self.MAX_BATCH_OPERATIONS):
+            chunk = operations[start : start + self.MAX_BATCH_OPERATIONS]
+            try:
+                await self._container.execute_item_batch(
+                    batch_operations=[
+                        (operation, (document,)) for operation, document in chunk
+                    ],
+                    partition_key=partition_key,
+                )
+            except Exception as e:
+                # The batch is rolled back as a whole; replay it one item at a
+                # time so valid writes land and only the failing ones stay queued
+                logging.warning(
+                    f"Transactional batch failed for partition {partition_key}, "
+                    f"writing items individually: {e}"
+                )
+                for operation, document in chunk:
+                    try:
+                        await self._write_item(operation, document)
+                    except Exception as item_error:
+                        errors.append(item_error)
+                        attempts = self._write_attempts.pop(document["id"], 0) + 1
+                        if is_transient(item_error) and attempts < self.WRITE_BEHIND_MAX_ATTEMPTS:
+                            logging.warning(
+                                f"Failed to write item {document['id']} for partition "
+                                f"{partition_key} (attempt {attempts}), will retry: {item_error}"
+                            )
+                            self._write_attempts[document["id"]] = attempts
+                            failed.append((operation, document))
+                        else:
+                            logging.error(
+                                f"Dropping write-behind {operation} of item {document['id']} "
+                                f"for partition {partition_key} after {attempts} attempt(s): "
+                                f"{item_error}; document: {json.dumps(document, default=str)}"
+                            )
+                            dropped += 1
+                    else:
+                        self._write_attempts.pop(document["id"], None)
+            else:
+                for _, document in chunk:
+                    self._write_attempts.pop(document["id"], None)
+
+        written = len(operations) - len(failed) - dropped
+        logging.info(
+            f"Flushed {written} write-behind items to Cosmos DB for partition {partition_key}"
+        )
+        if failed:
+            self._requeue(partition_key, failed)
+        if errors:
+            raise RuntimeError(
+                f"{len(failed) + dropped} write-behind items for partition {partition_key} "
+                f"were not written: {len(failed)} remain queued, {dropped} were dropped"
+            ) from errors[0]
+
+    async def _write_item(self, operation: str, document: Dict[str, Any]) -> None:
+        """Write one queued operation on its own."""
+        if operation != "create":
+            await self._container.upsert_item(body=document)
+            return
+        try:
+            await self._container.create_item(body=document)
+        except CosmosHttpResponseError as e:
+            if e.status_code != 409:
+                raise
+            # An earlier attempt of this create landed; the queued document
+            # holds the latest version of the item, so write it over that one
+            await self._container.upsert_item(body=document)
+
+    def _requeue(
+        self, partition_key: str, failed: List[Tuple[str, Dict[str, Any]]]
+    ) -> None:
+        """Put unwritten operations back in front of writes queued during the flush."""
+        newer = self._pending_writes.get(partition_key, {})
+        requeued: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for operation, document in failed:
+            requeued[document["id"]] = (operation, document)
+        for item_id, (operation, document) in newer.items():
+            # Same coalescing as _enqueue_write: a failed create stays a create
+            previous = requeued.pop(item_id, None)
+            if previous is not None and previous[0] == "create":
+                operation = "create"
+            requeued[item_id] = (operation, document)
+        self._pending_writes[partition_key] = requeued
+        CosmosMemoryContext._contexts_with_pending_writes.add(self)
+
+    async def flush(self) -> None:
+        """Write all queued write-behind operations to Cosmos DB.
+
+        Call at the end of a request; reads issued through this context flush
+        automatically so they always see their own writes. Waits for a flush
+        already in progress, and keeps operations that failed queued.
+        """
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        errors: List[Exception] = []
+        async with self._flush_lock:
+            for partition_key in list(self._pending_writes.keys()):
+                try:
+                    await self._write_partition(partition_key)
+                except Exception as e:
+                    errors.append(e)
+
+            if not self._pending_writes:
+                CosmosMemoryContext._contexts_with_pending_writes.discard(self)
+
+        if errors:
+            raise errors[0]
+
+    async def _flush_before_read(self) -> None:
+        """Flush queued writes so reads observe this context's own writes.
+
+        Always goes through the flush lock, so a read that races a flush in
+        another task waits until that batch has landed. A failed flush is
+        logged and the read still runs against the store, without the writes
+        that could not be flushed.
+        """
+        if not self._write_behind:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Reading without the write-behind items that failed to flush: {e}")
+
+    @classmethod
+    async def flush_all(cls) -> None:
+        """Flush every context that still holds write-behind operations."""
+        for context in list(cls._contexts_with_pending_writes):
+            try:
+                await context.flush()
+            except Exception as e:
+                logging.exception(f"Failed to flush write-behind buffer: {e}")
+
     async def get_item_by_id(
         self, item_id: str, partition_key: str, model_class: Type[BaseDataModel]
     ) -> Optional[BaseDataModel]:
@@ -161,10 +486,11 @@ class CosmosMemoryContext(MemoryStoreBase):
         await self.ensure_initialized()
 
         try:
+            await self._flush_before_read()
             item = await self._container.read_item(
                 item=item_id, partition_key=partition_key
             )
-            return model_class.model_validate(item)
+            return from_document(model_class, item)
         except Exception as e:
             logging.exception(f"Failed to retrieve item from Cosmos DB: {e}")
             return None
@@ -174,24 +500,188 @@ class CosmosMemoryContext(MemoryStoreBase):
         query: str,
         parameters: List[Dict[str, Any]],
         model_class: Type[BaseDataModel],
+        partition_key: Optional[str] = None,
     ) -> List[BaseDataModel]:
-        """Query items from Cosmos DB and return a list of model instances."""
+        """Query items from Cosmos DB and return a list of model instances.
+
+        Pass partition_key whenever the session is known so the query is served
+        by a single partition instead of fanning out across the container.
+        """
         await self.ensure_initialized()
 
         try:
-            items = self._container.query_items(query=query, parameters=parameters)
-            result_list = []
-            async for item in items:
-                item["ts"] = item["_ts"]
-                result_list.append(model_class.model_validate(item))
-            return result_list
+            await self._flush_before_read()
+            items = self._query_container(query, parameters, partition_key)
+            return [from_document(model_class, item) async for item in items]
         except Exception as e:
             logging.exception(f"Failed to query items from Cosmos DB: {e}")
             return []
 
-    async def add_session(self, session: Session) -> None:
-        """Add a session to Cosmos DB."""
-        await self.add_item(session)
+    async def _query_documents(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a query and return the raw documents, reading the store's own writes."""
+        await self.ensure_initialized()
+        await self._flush_before_read()
+        return [
+            item async for item in self._query_container(query, parameters, partition_key)
+        ]
+
+    def _query_container(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ):
+        """Run a query, scoped to a single partition when the key is known."""
+        if partition_key:
+            return self._container.query_items(
+                query=query, parameters=parameters, partition_key=partition_key
+            )
+        return self._container.query_items(query=query, parameters=parameters)
+
+    @staticmethod
+    def _user_index_id(user_id: str) -> str:
+        return f"user_index_{user_id}"
+
+    async def _read_user_index(self) -> Tuple[Optional[UserSessionIndex], Optional[str]]:
+        """Point-read the session index of the current user with its etag."""
+        index_id = self._user_index_id(self.user_id)
+        try:
+            item = await self._container.read_item(item=index_id, partition_key=index_id)
+        except CosmosResourceNotFoundError:
+            return None, None
+        return from_document(UserSessionIndex, item), item.get("_etag")
+
+    async def _read_current_user_index(
+        self,
+    ) -> Tuple[Optional[UserSessionIndex], Optional[str]]:
+        """Read the session index, rebuilding it if it is missing or outdated."""
+        index, etag = await self._read_user_index()
+        if index is None or index.version < self.USER_INDEX_VERSION:
+            index = await self._rebuild_user_index(etag)
+            index, etag = await self._read_user_index()
+        return index, etag
+
+    async def _write_user_index(
+        self, index: UserSessionIndex, etag: Optional[str]
+    ) -> None:
+        """Create the index, or replace it only if nobody changed it since it was read."""
+        document = self._to_document(index)
+        if etag is None:
+            await self._container.create_item(body=document)
+        else:
+            await self._container.replace_item(
+                item=index.id,
+                body=document,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+
+    async def _rebuild_user_index(self, etag: Optional[str] = None) -> UserSessionIndex:
+        """Build the index of a user that predates it with one cross-partition scan.
+
+        Pass the etag of an outdated index to replace it.
+        """
+        query = "SELECT c.session_id, c._ts FROM c WHERE c.user_id=@user_id AND c.data_type!=@data_type"
+        parameters = [
+            {"name": "@user_id", "value": self.user_id},
+            {"name": "@data_type", "value": "user_index"},
+        ]
+        last_activity: Dict[str, int] = {}
+        async for item in self._container.query_items(query=query, parameters=parameters):
+            session_id = item.get("session_id")
+            if session_id:
+                last_activity[session_id] = max(
+                    last_activity.get(session_id, 0), item.get("_ts", 0)
+                )
+
+        index_id = self._user_index_id(self.user_id)
+        index = UserSessionIndex(
+            id=index_id,
+            session_id=index_id,
+            user_id=self.user_id,
+            session_ids=sorted(last_activity, key=last_activity.get, reverse=True)[
+                : config.COSMOSDB_USER_INDEX_MAX_SESSIONS
+            ],
+            version=self.USER_INDEX_VERSION,
+        )
+        try:
+            await self._write_user_index(index, etag)
+        except CosmosHttpResponseError as e:
+            # Another request rebuilt it first; theirs is just as good
+            logging.info(f"User index already rebuilt concurrently: {e}")
+        return index
+
+    async def get_user_session_ids(self) -> List[str]:
+        """Return the current user's session ids, most recently active first."""
+        await self.ensure_initialized()
+        await self._flush_before_read()
+        try:
+            index, etag = await self._read_user_index()
+            if index is None or index.version < self.USER_INDEX_VERSION:
+                index = await self._rebuild_user_index(etag)
+            return index.session_ids
+        except Exception as e:
+            logging.exception(f"Failed to read user session index from Cosmos DB: {e}")
+            return []
+
+    async def touch_user_session(self, session_id: str) -> None:
+        """Move a session to the front of the current user's session index."""
+        await self.ensure_initialized()
+        for _ in range(self.USER_INDEX_UPDATE_ATTEMPTS):
+            try:
+                index, etag = await self._read_current_user_index()
+                if index is None:
+                    continue
+
+                if index.session_ids[:1] == [session_id]:
+                    return
+                # Keep the document small: only the most recent sessions are listed
+                index.session_ids = (
+                    [session_id] + [s for s in index.session_ids if s != session_id]
+                )[: config.COSMOSDB_USER_INDEX_MAX_SESSIONS]
+                await self._write_user_index(index, etag)
+                return
+            except CosmosHttpResponseError as e:
+                # 412 (changed since read) or 409 (created concurrently): retry
+                if e.status_code not in (409, 412):
+                    logging.exception(f"Failed to update user session index: {e}")
+                    return
+            except Exception as e:
+                # The index only routes listings; never fail the write that touched it
+                logging.exception(f"Failed to update user session index: {e}")
+                return
+        logging.warning(
+            f"Gave up updating the session index of user {self.user_id} after "
+            f"{self.USER_INDEX_UPDATE_ATTEMPTS} attempts"
+        )
+
+    async def _index_session(self, document: Dict[str, Any]) -> None:
+        """Record the session of a document written for the current user in the index.
+
+        Every session that holds data of the user must be in the index, or it
+        would be missing from the user-wide listings. Each context touches a
+        session once.
+        """
+        session_id = document.get("session_id")
+        if (
+            not session_id
+            or document.get("user_id") != self.user_id
+            or document.get("data_type") == "user_index"
+            or session_id in self._indexed_sessions
+        ):
+            return
+        await self.touch_user_session(session_id)
+        self._indexed_sessions.add(session_id)
+
+    async def delete_user_index(self) -> None:
+        """Delete the current user's session index."""
+        index_id = self._user_index_id(self.user_id)
+        await self.delete_item(index_id, partition_key=index_id)
 
     async def get_session(self, session_id: str) -> Optional[Session]:
         """Retrieve a session by session_id."""
@@ -212,24 +702,112 @@ class CosmosMemoryContext(MemoryStoreBase):
         sessions = await self.query_items(query, parameters, Session)
         return sessions
 
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """Return hit/miss counters of the plan and step cache for monitoring."""
+        return cls._plan_cache.stats()
+
+    @staticmethod
+    def _plan_cache_key(user_id: str, session_id: str) -> Tuple[str, str, str]:
+        return ("plan", user_id, session_id)
+
+    @staticmethod
+    def _steps_cache_key(user_id: str, plan_id: str) -> Tuple[str, str, str]:
+        return ("steps", user_id, plan_id)
+
+    @classmethod
+    def apply_change(cls, change: DocumentChange) -> None:
+        """Drop cached plans and steps that another process changed.
+
+        Subscribed to the event bus. Changes written by this process carry the
+        _etag already cached and are skipped. Tombstones drop everything cached
+        for the user, and the similarity index of a deleted collection.
+        """
+        document = change.document
+        if change.data_type == "tombstone":
+            user_id = document.get("target_user_id")
+            cls._plan_cache.invalidate_where(lambda key: key[1] == user_id)
+            if document.get("collection") and document.get("target_session_id"):
+                cls._vector_indexes.invalidate(
+                    (document["target_session_id"], document["collection"])
+                )
+        elif change.data_type == "plan" and change.user_id and change.session_id:
+            key = cls._plan_cache_key(change.user_id, change.session_id)
+            cached_plan = cls._plan_cache.peek(key)
+            if cached_plan is not None and cached_plan._etag != document.get("_etag"):
+                cls._plan_cache.invalidate(key)
+        elif change.data_type == "step" and change.user_id and document.get("plan_id"):
+            key = cls._steps_cache_key(change.user_id, document["plan_id"])
+            cached_steps = cls._plan_cache.peek(key)
+            if cached_steps is not None and not any(
+                step.id == change.id and step._etag == document.get("_etag")
+                for step in cached_steps
+            ):
+                cls._plan_cache.invalidate(key)
+
+    @staticmethod
+    def _merge_cached_step(steps: List[Step], step: Step) -> List[Step]:
+        """Replace the cached copy of a step in place, or append it if new."""
+        cached_step = step.model_copy(deep=True)
+        for index, existing in enumerate(steps):
+            if existing.id == step.id:
+                steps[index] = cached_step
+                return steps
+        steps.append(cached_step)
+        return steps
+
     async def add_plan(self, plan: Plan) -> None:
         """Add a plan to Cosmos DB."""
         await self.add_item(plan)
+        await self._add_plan_aggregate(plan)
+        self._plan_cache.set(
+            self._plan_cache_key(plan.user_id, plan.session_id),
+            plan.model_copy(deep=True),
+        )
+        # A new plan has no steps yet; add_step fills in the cached list
+        self._plan_cache.set(self._steps_cache_key(plan.user_id, plan.id), [])
 
     async def update_plan(self, plan: Plan) -> None:
-        """Update an existing plan in Cosmos DB."""
-        await self.update_item(plan)
+        """Update an existing plan in Cosmos DB.
+
+        The plan is replaced conditionally on its _etag and merged with
+        concurrent updates on conflict (see merge_plan). Write-behind contexts
+        queue a plain upsert instead.
+        """
+        if self._write_behind:
+            await self.update_item(plan)
+        else:
+            await self.ensure_initialized()
+            await self._update_with_merge(plan, merge_plan)
+        await self._update_aggregate_plan(plan)
+        self._plan_cache.set(
+            self._plan_cache_key(plan.user_id, plan.session_id),
+            plan.model_copy(deep=True),
+        )
+        if plan.user_id == self.user_id:
+            await self.touch_user_session(plan.session_id)
 
     async def get_plan_by_session(self, session_id: str) -> Optional[Plan]:
         """Retrieve a plan associated with a session."""
+        cache_key = self._plan_cache_key(self.user_id, session_id)
+        cached_plan = self._plan_cache.get(cache_key)
+        if cached_plan is not None:
+            return cached_plan.model_copy(deep=True)
+
         query = "SELECT * FROM c WHERE c.session_id=@session_id AND c.user_id=@user_id AND c.data_type=@data_type"
         parameters = [
             {"name": "@session_id", "value": session_id},
             {"name": "@data_type", "value": "plan"},
             {"name": "@user_id", "value": self.user_id},
         ]
-        plans = await self.query_items(query, parameters, Plan)
-        return plans[0] if plans else None
+        plans = await self.query_items(
+            query, parameters, Plan, partition_key=session_id
+        )
+        if not plans:
+            return None
+
+        self._plan_cache.set(cache_key, plans[0].model_copy(deep=True))
+        return plans[0]
 
     async def get_thread_by_session(self, session_id: str) -> Optional[Any]:
         """Retrieve a plan associated with a session."""
@@ -239,7 +817,9 @@ class CosmosMemoryContext(MemoryStoreBase):
             {"name": "@data_type", "value": "thread"},
             {"name": "@user_id", "value": self.user_id},
         ]
-        threads = await self.query_items(query, parameters, Plan)
+        threads = await self.query_items(
+            query, parameters, Plan, partition_key=session_id
+        )
         return threads[0] if threads else None
 
     async def get_plan(self, plan_id: str) -> Optional[Plan]:
@@ -256,61 +836,143 @@ class CosmosMemoryContext(MemoryStoreBase):
             plan_id, partition_key=self.session_id, model_class=Plan
         )
 
-    async def get_all_plans(self) -> List[Plan]:
-        """Retrieve all plans."""
-        query = "SELECT * FROM c WHERE c.user_id=@user_id AND c.data_type=@data_type ORDER BY c._ts DESC OFFSET 0 LIMIT 5"
-        parameters = [
-            {"name": "@data_type", "value": "plan"},
-            {"name": "@user_id", "value": self.user_id},
-        ]
-        plans = await self.query_items(query, parameters, Plan)
-        return plans
+    async def get_all_plans(self, limit: int = 5) -> List[Plan]:
+        """Retrieve the most recent plans of the current user.
+
+        One point read of the user's session index followed by single-partition
+        plan lookups for the most recently active sessions.
+        """
+        session_ids = await self.get_user_session_ids()
+        plans: List[Plan] = []
+        for start in range(0, len(session_ids), limit):
+            window = session_ids[start : start + limit]
+            found = await asyncio.gather(
+                *[self.get_plan_by_session(session_id) for session_id in window]
+            )
+            plans.extend(plan for plan in found if plan is not None)
+            if len(plans) >= limit:
+                break
+        return plans[:limit]
+
+    @staticmethod
+    def _resolve_session_position(session_ids: List[str], position: Dict[str, Any]) -> int:
+        """Find where a continuation resumes in the user's session list.
+
+        Sessions move to the front as they become active, so the recorded session
+        id wins over the recorded position when they disagree.
+        """
+        index = position.get("i", 0)
+        session_id = position.get("s")
+        if session_id and (index >= len(session_ids) or session_ids[index] != session_id):
+            if session_id in session_ids:
+                index = session_ids.index(session_id)
+        return index
+
+    def _session_continuation(
+        self,
+        session_ids: List[str],
+        index: int,
+        page_token: Optional[str] = None,
+        skip: int = 0,
+    ) -> Optional[str]:
+        """Continuation token for a position in the user's session list, None at the end."""
+        if index >= len(session_ids):
+            return None
+        return self._encode_continuation(
+            {"i": index, "s": session_ids[index], "t": page_token, "k": skip}
+        )
+
+    async def iter_all_plans(
+        self, continuation_token: Optional[str] = None, page_size: int = 5
+    ) -> AsyncIterator[Tuple[Plan, Optional[str]]]:
+        """Yield the current user's plans, most recently active session first.
+
+        Walks the user's session index in windows of page_size sessions whose
+        plans are looked up concurrently.
+        """
+        position = self._decode_continuation(continuation_token)
+        session_ids = await self.get_user_session_ids()
+        start = self._resolve_session_position(session_ids, position)
+        for window_start in range(start, len(session_ids), page_size):
+            window = session_ids[window_start : window_start + page_size]
+            found = await asyncio.gather(
+                *[self.get_plan_by_session(session_id) for session_id in window]
+            )
+            for offset, plan in enumerate(found):
+                if plan is not None:
+                    yield plan, self._session_continuation(
+                        session_ids, window_start + offset + 1
+                    )
 
     async def add_step(self, step: Step) -> None:
         """Add a step to Cosmos DB."""
         await self.add_item(step)
+        await self._update_aggregate_step(step)
+        self._plan_cache.update(
+            self._steps_cache_key(step.user_id, step.plan_id),
+            lambda steps: self._merge_cached_step(steps, step),
+        )
 
     async def update_step(self, step: Step) -> None:
-        """Update an existing step in Cosmos DB."""
-        await self.update_item(step)
+        """Update an existing step in Cosmos DB.
 
-    async def get_steps_by_plan(self, plan_id: str) -> List[Step]:
-        """Retrieve all steps associated with a plan."""
-        query = "SELECT * FROM c WHERE c.plan_id=@plan_id AND c.user_id=@user_id AND c.data_type=@data_type"
-        parameters = [
-            {"name": "@plan_id", "value": plan_id},
-            {"name": "@data_type", "value": "step"},
-            {"name": "@user_id", "value": self.user_id},
-        ]
-        steps = await self.query_items(query, parameters, Step)
-        return steps
+        The step is replaced conditionally on its _etag and merged with
+        concurrent updates on conflict (see merge_step). Write-behind contexts
+        queue a plain upsert instead.
+        """
+        if self._write_behind:
+            await self.update_item(step)
+        else:
+            await self.ensure_initialized()
+            await self._update_with_merge(step, merge_step)
+        await self._update_aggregate_step(step)
+        self._plan_cache.update(
+            self._steps_cache_key(step.user_id, step.plan_id),
+            lambda steps: self._merge_cached_step(steps, step),
+        )
 
-    async def get_steps_for_plan(
+    async def get_steps_by_plan(
         self, plan_id: str, session_id: Optional[str] = None
     ) -> List[Step]:
         """Retrieve all steps associated with a plan.
 
         Args:
             plan_id: The ID of the plan to retrieve steps for
-            session_id: Optional session ID if known
-
-        Returns:
-            List of Step objects
+            session_id: The plan's session ID, if known, to query a single partition
         """
-        return await self.get_steps_by_plan(plan_id)
+        cache_key = self._steps_cache_key(self.user_id, plan_id)
+        cached_steps = self._plan_cache.get(cache_key)
+        if cached_steps is not None:
+            return [step.model_copy(deep=True) for step in cached_steps]
 
-    async def get_step(self, step_id: str, session_id: str) -> Optional[Step]:
-        return await self.get_item_by_id(
-            step_id, partition_key=session_id, model_class=Step
+        query = "SELECT * FROM c WHERE c.plan_id=@plan_id AND c.user_id=@user_id AND c.data_type=@data_type"
+        parameters = [
+            {"name": "@plan_id", "value": plan_id},
+            {"name": "@data_type", "value": "step"},
+            {"name": "@user_id", "value": self.user_id},
+        ]
+        steps = await self.query_items(
+            query, parameters, Step, partition_key=session_id
         )
+        if steps:
+            self._plan_cache.set(
+                cache_key, [step.model_copy(deep=True) for step in steps]
+            )
+        return steps
 
-    async def add_agent_message(self, message: AgentMessage) -> None:
-        """Add an agent message to Cosmos DB.
-
-        Args:
-            message: The AgentMessage to add
-        """
-        await self.add_item(message)
+    async def get_step_summaries_by_plan(
+        self, plan_id: str, session_id: Optional[str] = None
+    ) -> List[StepSummary]:
+        """Retrieve the step summaries of a plan, from the cached steps when present."""
+        cached_steps = self._plan_cache.get(self._steps_cache_key(self.user_id, plan_id))
+        if cached_steps is not None:
+            return [
+                StepSummary.model_validate(
+                    step.model_dump(include=set(StepSummary.model_fields))
+                )
+                for step in cached_steps
+            ]
+        return await super().get_step_summaries_by_plan(plan_id, session_id=session_id)
 
     async def get_agent_messages_by_session(
         self, session_id: str
@@ -328,7 +990,9 @@ class CosmosMemoryContext(MemoryStoreBase):
             {"name": "@session_id", "value": session_id},
             {"name": "@data_type", "value": "agent_message"},
         ]
-        messages = await self.query_items(query, parameters, AgentMessage)
+        messages = await self.query_items(
+            query, parameters, AgentMessage, partition_key=session_id
+        )
         return messages
 
     async def add_message(self, message: ChatMessageContent) -> None:
@@ -354,6 +1018,7 @@ class CosmosMemoryContext(MemoryStoreBase):
                 "source": message.metadata.get("source", ""),
             }
             await self._container.create_item(body=message_dict)
+            await self._index_session(message_dict)
         except Exception as e:
             logging.exception(f"Failed to add message to Cosmos DB: {e}")
             raise  # Propagate the error instead of silently failing
@@ -374,10 +1039,7 @@ class CosmosMemoryContext(MemoryStoreBase):
                 {"name": "@data_type", "value": "message"},
                 {"name": "@limit", "value": self._buffer_size},
             ]
-            items = self._container.query_items(
-                query=query,
-                parameters=parameters,
-            )
+            items = self._query_container(query, parameters, self.session_id)
             messages = []
             async for item in items:
                 content = item.get("content", {})
@@ -427,7 +1089,9 @@ class CosmosMemoryContext(MemoryStoreBase):
                 {"name": "@data_type", "value": data_type},
                 {"name": "@user_id", "value": self.user_id},
             ]
-            return await self.query_items(query, parameters, model_class)
+            return await self.query_items(
+                query, parameters, model_class, partition_key=self.session_id
+            )
         except Exception as e:
             logging.exception(f"Failed to query data by type from Cosmos DB: {e}")
             return []
@@ -435,18 +1099,27 @@ class CosmosMemoryContext(MemoryStoreBase):
     async def delete_item(self, item_id: str, partition_key: str) -> None:
         """Delete an item from Cosmos DB."""
         await self.ensure_initialized()
+        self._plan_cache.invalidate_where(
+            lambda key: key[2] == item_id or key[2] == partition_key
+        )
         try:
             await self._container.delete_item(item=item_id, partition_key=partition_key)
         except Exception as e:
             logging.exception(f"Failed to delete item from Cosmos DB: {e}")
+            return
+        await self._record_deletion(session_id=partition_key, item_ids=[item_id])
 
     async def delete_items_by_query(
-        self, query: str, parameters: List[Dict[str, Any]]
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
     ) -> None:
         """Delete items matching the query."""
         await self.ensure_initialized()
         try:
-            items = self._container.query_items(query=query, parameters=parameters)
+            await self._flush_before_read()
+            items = self._query_container(query, parameters, partition_key)
             async for item in items:
                 item_id = item["id"]
                 partition_key = item.get("session_id", None)
@@ -463,55 +1136,202 @@ class CosmosMemoryContext(MemoryStoreBase):
             {"name": "@data_type", "value": data_type},
             {"name": "@user_id", "value": self.user_id},
         ]
+        # A cross-partition scan rather than the session index, so that sessions
+        # missing from the index or trimmed from it are deleted as well
         await self.delete_items_by_query(query, parameters)
+        self._plan_cache.invalidate_where(lambda key: key[1] == self.user_id)
+        await self._record_deletion(data_types=[data_type])
 
     async def delete_all_items(self, data_type) -> None:
         """Delete all items of a specific type from Cosmos DB."""
         await self.delete_all_messages(data_type)
 
-    async def get_all_messages(self) -> List[Dict[str, Any]]:
-        """Retrieve all messages from Cosmos DB."""
+    async def iter_all_messages(
+        self, continuation_token: Optional[str] = None, page_size: int = 100
+    ) -> AsyncIterator[Tuple[Dict[str, Any], Optional[str]]]:
+        """Yield the current user's items as Cosmos DB pages arrive.
+
+        Walks the user's sessions, most recent first, reading each with a
+        single-partition query of page_size items per page. The continuation
+        token records the session, the Cosmos continuation of the current page
+        and how many of its items were already returned.
+        """
+        position = self._decode_continuation(continuation_token)
+        await self.ensure_initialized()
+        await self._flush_before_read()
+
+        session_ids = await self.get_user_session_ids()
+        index = self._resolve_session_position(session_ids, position)
+        resuming = index < len(session_ids) and position.get("s") == session_ids[index]
+        page_token = position.get("t") if resuming else None
+        skip = position.get("k", 0) if resuming else 0
+
+        query = "SELECT * FROM c WHERE c.user_id=@user_id"
+        parameters = [{"name": "@user_id", "value": self.user_id}]
+        while index < len(session_ids):
+            pages = self._container.query_items(
+                query=query,
+                parameters=parameters,
+                partition_key=session_ids[index],
+                max_item_count=page_size,
+            ).by_page(page_token)
+            async for page in pages:
+                items = [item async for item in page]
+                next_page_token = pages.continuation_token
+                for position_in_page in range(skip, len(items)):
+                    if position_in_page + 1 < len(items):
+                        token = self._session_continuation(
+                            session_ids, index, page_token, position_in_page + 1
+                        )
+                    elif next_page_token:
+                        token = self._session_continuation(
+                            session_ids, index, next_page_token
+                        )
+                    else:
+                        token = self._session_continuation(session_ids, index + 1)
+                    yield items[position_in_page], token
+                page_token, skip = next_page_token, 0
+            index += 1
+            page_token, skip = None, 0
+
+    async def bulk_delete(
+        self,
+        data_types: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Delete every item of the current user with one of the given data types.
+
+        One query collects the ids of all matching items, which are grouped by
+        partition key and deleted as transactional batches, several partitions
+        at a time.
+
+        Args:
+            data_types: The data types to delete
+            on_progress: Called with (total, processed) as batches complete
+            concurrency: Maximum number of batches in flight
+
+        Returns:
+            Counts of deleted items and items that failed to delete
+        """
+        await self.ensure_initialized()
+        await self._flush_before_read()
+
+        query = (
+            "SELECT c.id, c.session_id FROM c "
+            "WHERE c.user_id=@user_id AND ARRAY_CONTAINS(@data_types, c.data_type)"
+        )
+        parameters = [
+            {"name": "@user_id", "value": self.user_id},
+            {"name": "@data_types", "value": data_types},
+        ]
+        partitions: Dict[Optional[str], List[str]] = {}
+        async for item in self._query_container(query, parameters):
+            partitions.setdefault(item.get("session_id"), []).append(item["id"])
+
+        batches = [
+            (partition_key, item_ids[start : start + self.MAX_BATCH_OPERATIONS])
+            for partition_key, item_ids in partitions.items()
+            for start in range(0, len(item_ids), self.MAX_BATCH_OPERATIONS)
+        ]
+        total = sum(len(item_ids) for _, item_ids in batches)
+        counts = {"total": total, "deleted": 0, "failed": 0}
+        if on_progress:
+            on_progress(total, 0)
+
+        semaphore = asyncio.Semaphore(
+            concurrency or config.COSMOSDB_BATCH_CONCURRENCY
+        )
+
+        async def delete_batch(partition_key: Optional[str], item_ids: List[str]) -> None:
+            async with semaphore:
+                deleted = await self._delete_batch(partition_key, item_ids)
+            counts["deleted"] += deleted
+            counts["failed"] += len(item_ids) - deleted
+            if on_progress:
+                on_progress(total, counts["deleted"] + counts["failed"])
+
+        await asyncio.gather(
+            *(delete_batch(partition_key, item_ids) for partition_key, item_ids in batches)
+        )
+        self._plan_cache.invalidate_where(lambda key: key[1] == self.user_id)
+        await self._record_deletion(data_types=data_types)
+        logging.info(
+            f"Bulk deleted {counts['deleted']} of {total} items for user {self.user_id}"
+        )
+        return counts
+
+    async def _delete_batch(self, partition_key: Optional[str], item_ids: List[str]) -> int:
+        """Delete items of one partition, returning how many are gone."""
+        if partition_key is not None:
+            try:
+                await self._container.execute_item_batch(
+                    batch_operations=[("delete", (item_id,)) for item_id in item_ids],
+                    partition_key=partition_key,
+                )
+                return len(item_ids)
+            except Exception as e:
+                # A single missing item fails the whole batch; fall back to
+                # individual deletes so the rest still go through
+                logging.warning(
+                    f"Transactional delete failed for partition {partition_key}, "
+                    f"deleting items individually: {e}"
+                )
+
+        deleted = 0
+        for item_id in item_ids:
+            try:
+                await self._container.delete_item(
+                    item=item_id, partition_key=partition_key
+                )
+                deleted += 1
+            except CosmosResourceNotFoundError:
+                deleted += 1
+            except Exception as e:
+                logging.exception(f"Failed to delete item {item_id} from Cosmos DB: {e}")
+        return deleted
+
+    async def get_all_messages(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retrieve all messages from Cosmos DB.
+
+        Walks the user's indexed sessions, most recent first, with single-partition
+        queries. The index lists the latest COSMOSDB_USER_INDEX_MAX_SESSIONS sessions.
+        """
         await self.ensure_initialized()
         if self._container is None:
             return []
 
         try:
+            session_ids = await self.get_user_session_ids()
             messages_list = []
             query = "SELECT * FROM c WHERE c.user_id=@user_id OFFSET 0 LIMIT @limit"
-            parameters = [
-                {"name": "@user_id", "value": self.user_id},
-                {"name": "@limit", "value": 100},
-            ]
-            items = self._container.query_items(query=query, parameters=parameters)
-            async for item in items:
-                messages_list.append(item)
+            for session_id in session_ids:
+                if len(messages_list) >= limit:
+                    break
+                parameters = [
+                    {"name": "@user_id", "value": self.user_id},
+                    {"name": "@limit", "value": limit - len(messages_list)},
+                ]
+                items = self._query_container(query, parameters, session_id)
+                async for item in items:
+                    messages_list.append(item)
             return messages_list
         except Exception as e:
             logging.exception(f"Failed to get messages from Cosmos DB: {e}")
             return []
 
-    async def get_all_items(self) -> List[Dict[str, Any]]:
-        """Retrieve all items from Cosmos DB."""
-        return await self.get_all_messages()
-
-    def close(self) -> None:
-        """Close the Cosmos DB client."""
-        # No-op or implement synchronous cleanup if required
-        return
-
-    async def __aenter__(self):
-        return self
+    async def close(self) -> None:
+        """Close the Cosmos DB client owned by this context, if any.
 
-    async def __aexit__(self, exc_type, exc, tb):
-        # Call synchronous close
-        self.close()
-
-    def __del__(self):
-        try:
-            # Synchronous close
-            self.close()
-        except Exception as e:
-            logging.warning(f"Error closing CosmosMemoryContext in __del__: {e}")
+        The pooled client shared through AppConfig is left open; it is closed
+        once by the application lifespan on shutdown.
+        """
+        client = self._cosmos_client
+        self._cosmos_client = None
+        if client is not None:
+            self._database = None
+            self._container = None
+            await client.close()
 
     async def create_collection(self, collection_name: str) -> None:
         """Create a new collection. For CosmosDB, we don't need to create new collections
@@ -531,7 +1351,7 @@ class CosmosMemoryContext(MemoryStoreBase):
             """
             parameters = [{"name": "@session_id", "value": self.session_id}]
 
-            items = self._container.query_items(query=query, parameters=parameters)
+            items = self._query_container(query, parameters, self.session_id)
             collections = []
             async for item in items:
                 if "collection" in item and item["collection"] not in collections:
@@ -561,33 +1381,28 @@ class CosmosMemoryContext(MemoryStoreBase):
                 {"name": "@session_id", "value": self.session_id},
             ]
 
-            items = self._container.query_items(query=query, parameters=parameters)
+            self._vector_indexes.invalidate((self.session_id, collection_name))
+            items = self._query_container(query, parameters, self.session_id)
             async for item in items:
                 await self._container.delete_item(
                     item=item["id"], partition_key=item["session_id"]
                 )
         except Exception as e:
             logging.exception(f"Failed to delete collection from Cosmos DB: {e}")
+            return
+        await self._record_deletion(
+            session_id=self.session_id, data_types=["memory"], collection=collection_name
+        )
 
     async def upsert_memory_record(self, collection: str, record: MemoryRecord) -> str:
         """Store a memory record."""
-        memory_dict = {
-            "id": record.id or str(uuid.uuid4()),
-            "session_id": self.session_id,
-            "user_id": self.user_id,
-            "data_type": "memory",
-            "collection": collection,
-            "text": record.text,
-            "description": record.description,
-            "external_source_name": record.external_source_name,
-            "additional_metadata": record.additional_metadata,
-            "embedding": (
-                record.embedding.tolist() if record.embedding is not None else None
-            ),
-            "key": record.key,
-        }
+        memory_dict = self._memory_document(collection, record)
 
         await self._container.upsert_item(body=memory_dict)
+
+        index = self._get_loaded_vector_index(collection)
+        if index is not None:
+            self._index_memory_document(index, memory_dict)
         return memory_dict["id"]
 
     async def get_memory_record(
@@ -605,20 +1420,11 @@ class CosmosMemoryContext(MemoryStoreBase):
             {"name": "@data_type", "value": "memory"},
         ]
 
-        items = self._container.query_items(query=query, parameters=parameters)
+        items = self._query_container(query, parameters, self.session_id)
         async for item in items:
-            return MemoryRecord(
-                id=item["id"],
-                text=item["text"],
-                description=item["description"],
-                external_source_name=item["external_source_name"],
-                additional_metadata=item["additional_metadata"],
-                embedding=(
-                    np.array(item["embedding"])
-                    if with_embedding and "embedding" in item
-                    else None
-                ),
-                key=item["key"],
+            return self._to_memory_record(
+                item,
+                decode_embedding(item.get("embedding")) if with_embedding else None,
             )
         return None
 
@@ -635,11 +1441,14 @@ class CosmosMemoryContext(MemoryStoreBase):
             {"name": "@data_type", "value": "memory"},
         ]
 
-        items = self._container.query_items(query=query, parameters=parameters)
+        index = self._get_loaded_vector_index(collection)
+        items = self._query_container(query, parameters, self.session_id)
         async for item in items:
             await self._container.delete_item(
                 item=item["id"], partition_key=self.session_id
             )
+            if index is not None:
+                index.remove(item["id"])
 
     async def upsert_async(self, collection_name: str, record: Dict[str, Any]) -> str:
         """Helper method to insert documents directly."""
@@ -680,112 +1489,180 @@ class CosmosMemoryContext(MemoryStoreBase):
                 {"name": "@limit", "value": limit},
             ]
 
-            items = self._container.query_items(query=query, parameters=parameters)
+            items = self._query_container(query, parameters, self.session_id)
             records = []
             async for item in items:
-                embedding = None
-                if with_embeddings and "embedding" in item and item["embedding"]:
-                    embedding = np.array(item["embedding"])
-
-                record = MemoryRecord(
-                    id=item["id"],
-                    key=item.get("key", ""),
-                    text=item.get("text", ""),
-                    embedding=embedding,
-                    description=item.get("description", ""),
-                    additional_metadata=item.get("additional_metadata", ""),
-                    external_source_name=item.get("external_source_name", ""),
+                embedding = (
+                    decode_embedding(item.get("embedding")) if with_embeddings else None
                 )
-                records.append(record)
+
+                records.append(self._to_memory_record(item, embedding))
             return records
         except Exception as e:
             logging.exception(f"Failed to get memory records from Cosmos DB: {e}")
             return []
 
-    async def upsert(self, collection_name: str, record: MemoryRecord) -> str:
-        """Upsert a memory record into the store."""
-        return await self.upsert_memory_record(collection_name, record)
-
     async def upsert_batch(
         self, collection_name: str, records: List[MemoryRecord]
     ) -> List[str]:
-        """Upsert a batch of memory records into the store."""
-        result_ids = []
-        for record in records:
-            record_id = await self.upsert_memory_record(collection_name, record)
-            result_ids.append(record_id)
-        return result_ids
-
-    async def get(
-        self, collection_name: str, key: str, with_embedding: bool = False
-    ) -> MemoryRecord:
-        """Get a memory record from the store."""
-        return await self.get_memory_record(collection_name, key, with_embedding)
+        """Upsert a batch of memory records into the store.
+
+        Records are written as transactional batches within the session
+        partition, several batches at a time. Ids are returned in input order.
+        """
+        await self.ensure_initialized()
+        documents = [self._memory_document(collection_name, record) for record in records]
+        chunks = [
+            documents[start : start + self.MAX_BATCH_OPERATIONS]
+            for start in range(0, len(documents), self.MAX_BATCH_OPERATIONS)
+        ]
+
+        async def upsert_chunk(chunk: List[Dict[str, Any]]) -> None:
+            try:
+                await self._container.execute_item_batch(
+                    batch_operations=[("upsert", (document,)) for document in chunk],
+                    partition_key=self.session_id,
+                )
+            except Exception as e:
+                logging.warning(
+                    f"Transactional upsert failed for partition {self.session_id}, "
+                    f"writing items individually: {e}"
+                )
+                for document in chunk:
+                    await self._container.upsert_item(body=document)
+
+        await self._gather_bounded(upsert_chunk(chunk) for chunk in chunks)
+
+        index = self._get_loaded_vector_index(collection_name)
+        if index is not None:
+            for document in documents:
+                self._index_memory_document(index, document)
+        return [document["id"] for document in documents]
+
+    async def _query_memory_by_keys(
+        self, collection: str, keys: List[str], fields: str = "*"
+    ) -> List[Dict[str, Any]]:
+        """Fetch the memory documents of a collection by key, one query per chunk of keys."""
+        query = f"""
+            SELECT {fields}
+            FROM c
+            WHERE c.collection = @collection
+            AND c.data_type = 'memory'
+            AND c.session_id = @session_id
+            AND ARRAY_CONTAINS(@keys, c.key)
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        documents: List[Dict[str, Any]] = []
+
+        async def query_chunk(chunk: List[str]) -> None:
+            parameters = [
+                {"name": "@collection", "value": collection},
+                {"name": "@session_id", "value": self.session_id},
+                {"name": "@keys", "value": chunk},
+            ]
+            async for item in self._query_container(query, parameters, self.session_id):
+                documents.append(item)
+
+        await self._gather_bounded(
+            query_chunk(unique_keys[start : start + self.MAX_BATCH_OPERATIONS])
+            for start in range(0, len(unique_keys), self.MAX_BATCH_OPERATIONS)
+        )
+        return documents
+
+    async def _gather_bounded(self, coroutines) -> List[Any]:
+        """Await coroutines with at most COSMOSDB_BATCH_CONCURRENCY in flight."""
+        semaphore = asyncio.Semaphore(config.COSMOSDB_BATCH_CONCURRENCY)
+
+        async def run(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
 
     async def get_batch(
         self, collection_name: str, keys: List[str], with_embeddings: bool = False
     ) -> List[MemoryRecord]:
-        """Get a batch of memory records from the store."""
+        """Get a batch of memory records from the store.
+
+        Missing keys are skipped; the found records keep the order of keys.
+        """
+        await self.ensure_initialized()
+        try:
+            documents = {
+                item["key"]: item
+                for item in await self._query_memory_by_keys(collection_name, keys)
+            }
+        except Exception as e:
+            logging.exception(f"Failed to get memory records from Cosmos DB: {e}")
+            return []
+
         results = []
         for key in keys:
-            record = await self.get_memory_record(collection_name, key, with_embeddings)
-            if record:
-                results.append(record)
+            item = documents.get(key)
+            if item is None:
+                continue
+            embedding = (
+                decode_embedding(item.get("embedding")) if with_embeddings else None
+            )
+            results.append(self._to_memory_record(item, embedding))
         return results
 
-    async def remove(self, collection_name: str, key: str) -> None:
-        """Remove a memory record from the store."""
-        await self.remove_memory_record(collection_name, key)
-
     async def remove_batch(self, collection_name: str, keys: List[str]) -> None:
-        """Remove a batch of memory records from the store."""
-        for key in keys:
-            await self.remove_memory_record(collection_name, key)
+        """Remove a batch of memory records from the store.
 
-    async def get_nearest_match(
-        self,
-        collection_name: str,
-        embedding: np.ndarray,
-        limit: int = 1,
-        min_relevance_score: float = 0.0,
-        with_embeddings: bool = False,
-    ) -> Tuple[MemoryRecord, float]:
-        """Get the nearest match to the given embedding."""
-        matches = await self.get_nearest_matches(
-            collection_name, embedding, limit, min_relevance_score, with_embeddings
-        )
-        return matches[0] if matches else (None, 0.0)
-
-    async def get_nearest_matches(
-        self,
-        collection_name: str,
-        embedding: np.ndarray,
-        limit: int = 1,
-        min_relevance_score: float = 0.0,
-        with_embeddings: bool = False,
-    ) -> List[Tuple[MemoryRecord, float]]:
-        """Get the nearest matches to the given embedding."""
+        The ids are resolved with one query per chunk of keys and deleted as
+        transactional batches within the session partition.
+        """
         await self.ensure_initialized()
-
-        try:
-            records = await self.get_memory_records(
-                collection_name, limit=100, with_embeddings=True
+        documents = await self._query_memory_by_keys(
+            collection_name, keys, fields="c.id, c.key"
+        )
+        item_ids = [document["id"] for document in documents]
+        await self._gather_bounded(
+            self._delete_batch(
+                self.session_id, item_ids[start : start + self.MAX_BATCH_OPERATIONS]
             )
+            for start in range(0, len(item_ids), self.MAX_BATCH_OPERATIONS)
+        )
 
-            results = []
-            for record in records:
-                if record.embedding is not None:
-                    similarity = np.dot(embedding, record.embedding) / (
-                        np.linalg.norm(embedding) * np.linalg.norm(record.embedding)
-                    )
+        index = self._get_loaded_vector_index(collection_name)
+        if index is not None:
+            for item_id in item_ids:
+                index.remove(item_id)
 
-                    if similarity >= min_relevance_score:
-                        if not with_embeddings:
-                            record.embedding = None
-                        results.append((record, float(similarity)))
+    async def _build_vector_index(self, collection: str) -> VectorIndex:
+        """Load every record of a collection into an exact index."""
+        query = """
+            SELECT *
+            FROM c
+            WHERE c.collection = @collection
+            AND c.data_type = 'memory'
+            AND c.session_id = @session_id
+        """
+        parameters = [
+            {"name": "@collection", "value": collection},
+            {"name": "@session_id", "value": self.session_id},
+        ]
+        index = VectorIndex()
+        self._index_memory_documents(
+            index,
+            [item async for item in self._query_container(query, parameters, self.session_id)],
+        )
+        return index
 
-            results.sort(key=lambda x: x[1], reverse=True)
-            return results[:limit]
-        except Exception as e:
-            logging.exception(f"Failed to get nearest matches from Cosmos DB: {e}")
-            return []
+    async def _get_memory_watermark(self, collection: str) -> Dict[str, Any]:
+        """Return the record count and last modification time of a collection."""
+        query = """
+            SELECT COUNT(1) AS count, MAX(c._ts) AS max_ts
+            FROM c
+            WHERE c.collection = @collection
+            AND c.data_type = 'memory'
+            AND c.session_id = @session_id
+        """
+        parameters = [
+            {"name": "@collection", "value": collection},
+            {"name": "@session_id", "value": self.session_id},
+        ]
+        async for item in self._query_container(query, parameters, self.session_id):
+            return {"count": item.get("count", 0), "max_ts": item.get("max_ts")}
+        return {"count": 0, "max_ts": None}
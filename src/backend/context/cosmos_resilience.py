@@ -0,0 +1,565 @@
+# cosmos_resilience.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.cosmos.exceptions import CosmosHttpResponseError
+
+from app_config import config
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+RETRY_AFTER_MS_HEADER = "x-ms-retry-after-ms"
+# Throttled requests the SDK already retried internally before answering
+THROTTLE_RETRY_COUNT_HEADER = "x-ms-throttle-retry-count"
+
+# 408 timeout, 429 throttled, 449 retry with, 503 unavailable
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 449, 503})
+# Answers that guarantee the request was not applied, so that even a
+# request that is not idempotent, such as a create, can be sent again
+NOT_APPLIED_STATUS_CODES = frozenset({429, 449})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling Cosmos DB while the circuit breaker is open."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error is throttling or unavailability, worth retrying later."""
+    if isinstance(error, CosmosHttpResponseError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (ServiceRequestError, ServiceResponseError, asyncio.TimeoutError))
+
+
+def is_not_applied(error: BaseException) -> bool:
+    """Whether a transient error guarantees the request had no effect."""
+    return (
+        isinstance(error, CosmosHttpResponseError)
+        and error.status_code in NOT_APPLIED_STATUS_CODES
+    )
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The delay the server asked for in x-ms-retry-after-ms, if any."""
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get(RETRY_AFTER_MS_HEADER)
+    try:
+        return float(value) / 1000 if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Decides whether and when a failed Cosmos DB request is retried.
+
+    Only transient errors are retried, at most max_retries times per request
+    and never once the total wait would exceed max_wait_seconds. A request
+    that is not idempotent is only retried on errors that guarantee it was not
+    applied. The server's retry-after hint wins over the exponential backoff
+    with jitter.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 5.0,
+        max_wait_seconds: float = 10.0,
+    ) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait_seconds = max_wait_seconds
+
+    def retry_delay(
+        self, error: BaseException, retries: int, waited: float, idempotent: bool = True
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if retries >= self.max_retries or not is_transient(error):
+            return None
+        if not idempotent and not is_not_applied(error):
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2**retries)
+            delay *= random.uniform(0.5, 1.0)
+        if waited + delay > self.max_wait_seconds:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures.
+
+    After failure_threshold consecutive transient failures the circuit opens
+    and requests raise CircuitOpenError. Once reset_seconds have passed, one
+    trial request is let through: success closes the circuit, failure opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError unless the request may go ahead."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                raise CircuitOpenError("Cosmos DB circuit breaker is open")
+            # Let this request through as the trial and keep the others out
+            # for another reset period, also if the trial never completes
+            self._opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self, error: BaseException) -> None:
+        """Count a failed request; errors that are not transient count as successes."""
+        if not is_transient(error):
+            self.record_success()
+            return
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or (
+                self.failure_threshold > 0 and self._failures >= self.failure_threshold
+            ):
+                if self._opened_at is None:
+                    self.times_opened += 1
+                    logging.warning(
+                        f"Cosmos DB circuit breaker opened after {self._failures} failures"
+                    )
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class OperationMetrics:
+    """Latency, RU charge and retry counters per Cosmos DB method and data_type."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def record(
+        self,
+        method: str,
+        data_type: Optional[str],
+        seconds: float,
+        request_charge: float,
+        retries: int,
+        failed: bool,
+    ) -> None:
+        key = (method, data_type or "unknown")
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "count": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "request_charge": 0.0,
+                    "latency_seconds_sum": 0.0,
+                    "latency_seconds_max": 0.0,
+                }
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["retries"] += retries
+            stats["request_charge"] += request_charge
+            stats["latency_seconds_sum"] += seconds
+            stats["latency_seconds_max"] = max(stats["latency_seconds_max"], seconds)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return the counters as one entry per method and data_type."""
+        with self._lock:
+            return [
+                {"method": method, "data_type": data_type, **stats}
+                for (method, data_type), stats in sorted(self._stats.items())
+            ]
+
+    def to_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        series = [
+            ("cosmos_operations_total", "counter", "count"),
+            ("cosmos_operation_errors_total", "counter", "errors"),
+            ("cosmos_operation_retries_total", "counter", "retries"),
+            ("cosmos_request_charge_total", "counter", "request_charge"),
+            ("cosmos_operation_latency_seconds_sum", "counter", "latency_seconds_sum"),
+            ("cosmos_operation_latency_seconds_max", "gauge", "latency_seconds_max"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for name, metric_type, field in series:
+            lines.append(f"# TYPE {name} {metric_type}")
+            for entry in snapshot:
+                labels = f'method="{entry["method"]}",data_type="{entry["data_type"]}"'
+                lines.append(f"{name}{{{labels}}} {entry[field]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class _RequestRecorder:
+    """Accumulates RU charge and SDK retries of one operation; passed as response_hook."""
+
+    def __init__(self, data_type: Optional[str]) -> None:
+        self.data_type = data_type
+        self.request_charge = 0.0
+        self.retries = 0
+
+    def add_headers(self, headers: Any) -> None:
+        if not headers:
+            return
+        try:
+            self.request_charge += float(headers.get(REQUEST_CHARGE_HEADER) or 0)
+            self.retries += int(headers.get(THROTTLE_RETRY_COUNT_HEADER) or 0)
+        except (TypeError, ValueError):
+            pass
+
+    def __call__(self, headers: Any, result: Any) -> None:
+        self.add_headers(headers)
+        if self.data_type is None:
+            document = result[0] if isinstance(result, list) and result else result
+            if isinstance(document, dict):
+                self.data_type = document.get("data_type")
+
+
+def _parameter_data_type(parameters: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    for parameter in parameters or []:
+        if parameter.get("name") == "@data_type" and isinstance(parameter.get("value"), str):
+            return parameter["value"]
+    return None
+
+
+async def _iterate(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+class ResilientContainer:
+    """Wraps a Cosmos DB container proxy with retries, a circuit breaker and metrics.
+
+    Exposes the container methods the memory stores use. Every call records
+    its latency, RU charge and retry count by method and data_type; other
+    attributes are read from the wrapped container.
+    """
+
+    def __init__(
+        self,
+        container: Any,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional["CircuitBreaker"] = None,
+        metrics: Optional[OperationMetrics] = None,
+    ) -> None:
+        self.container = container
+        self.policy = policy or default_retry_policy()
+        self.breaker = breaker or cosmos_circuit_breaker
+        self.metrics = metrics or cosmos_metrics
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.container, name)
+
+    async def _run(
+        self,
+        method: str,
+        data_type: Optional[str],
+        operation: Callable[[_RequestRecorder], Awaitable[Any]],
+        idempotent: bool = True,
+    ) -> Any:
+        """Run a request, retrying transient failures as the policy allows.
+
+        A request that is not idempotent is not retried after a timeout or an
+        unavailable answer, since its first attempt may have been applied.
+        """
+        recorder = _RequestRecorder(data_type)
+        start = time.perf_counter()
+        retries = waited = 0
+        failed = False
+        try:
+            while True:
+                self.breaker.before_request()
+                try:
+                    result = await operation(recorder)
+                except Exception as e:
+                    recorder.add_headers(getattr(e, "headers", None))
+                    self.breaker.record_failure(e)
+                    delay = self.policy.retry_delay(e, retries, waited, idempotent)
+                    if delay is None:
+                        raise
+                    logging.info(f"Retrying Cosmos DB {method} in {delay:.2f}s: {e}")
+                    retries += 1
+                    waited += delay
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.record(
+                method,
+                recorder.data_type,
+                time.perf_counter() - start,
+                recorder.request_charge,
+                retries + recorder.retries,
+                failed,
+            )
+
+    async def create_item(self, body: Dict[str, Any], **kwargs: Any) -> Any:
+        return await self._run(
+            "create_item",
+            body.get("data_type"),
+            lambda hook: self.container.create_item(body=body, response_hook=hook, **kwargs),
+            idempotent=False,
+        )
+
+    async def upsert_item(self, body: Dict[str, Any], **kwargs: Any) -> Any:
+        return await self._run(
+            "upsert_item",
+            body.get("data_type"),
+            lambda hook: self.container.upsert_item(body=body, response_hook=hook, **kwargs),
+        )
+
+    async def replace_item(self, item: Any, body: Dict[str, Any], **kwargs: Any) -> Any:
+        return await self._run(
+            "replace_item",
+            body.get("data_type"),
+            lambda hook: self.container.replace_item(
+                item=item, body=body, response_hook=hook, **kwargs
+            ),
+        )
+
+    async def patch_item(
+        self, item: Any, partition_key: Any, patch_operations: List[Dict[str, Any]], **kwargs: Any
+    ) -> Any:
+        return await self._run(
+            "patch_item",
+            None,
+            lambda hook: self.container.patch_item(
+                item=item,
+                partition_key=partition_key,
+                patch_operations=patch_operations,
+                response_hook=hook,
+                **kwargs,
+            ),
+        )
+
+    async def read_item(self, item: Any, partition_key: Any, **kwargs: Any) -> Any:
+        return await self._run(
+            "read_item",
+            None,
+            lambda hook: self.container.read_item(
+                item=item, partition_key=partition_key, response_hook=hook, **kwargs
+            ),
+        )
+
+    async def delete_item(self, item: Any, partition_key: Any, **kwargs: Any) -> Any:
+        return await self._run(
+            "delete_item",
+            kwargs.pop("data_type", None),
+            lambda hook: self.container.delete_item(
+                item=item, partition_key=partition_key, response_hook=hook, **kwargs
+            ),
+        )
+
+    async def execute_item_batch(
+        self, batch_operations: List[Any], partition_key: Any, **kwargs: Any
+    ) -> Any:
+        data_type = None
+        for _, arguments in batch_operations[:1]:
+            if arguments and isinstance(arguments[0], dict):
+                data_type = arguments[0].get("data_type")
+        return await self._run(
+            "execute_item_batch",
+            data_type,
+            lambda hook: self.container.execute_item_batch(
+                batch_operations=batch_operations,
+                partition_key=partition_key,
+                response_hook=hook,
+                **kwargs,
+            ),
+            # A batch is applied as a whole, so only creates make it unsafe to resend
+            idempotent=all(operation != "create" for operation, _ in batch_operations),
+        )
+
+    def query_items(self, query: str, parameters: Optional[List[Dict[str, Any]]] = None, **kwargs: Any):
+        return _ResilientQuery(self, _parameter_data_type(parameters), query, parameters, kwargs)
+
+
+class _ResilientQuery:
+    """A query that is retried until its first item arrives and recorded when done.
+
+    Once items were handed out a failure is raised as is, since restarting
+    would return them again. by_page reads are recorded per page and resume
+    from the continuation token of the last page.
+    """
+
+    def __init__(
+        self,
+        owner: ResilientContainer,
+        data_type: Optional[str],
+        query: str,
+        parameters: Optional[List[Dict[str, Any]]],
+        kwargs: Dict[str, Any],
+    ) -> None:
+        self._owner = owner
+        self._data_type = data_type
+        self._query = query
+        self._parameters = parameters
+        self._kwargs = kwargs
+
+    def _start(self, hook: Callable[[Any, Any], None]):
+        return self._owner.container.query_items(
+            query=self._query, parameters=self._parameters, response_hook=hook, **self._kwargs
+        )
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Dict[str, Any]]:
+        owner = self._owner
+        recorder = _RequestRecorder(self._data_type)
+        elapsed = waited = 0.0
+        retries = 0
+        failed = False
+        try:
+            while True:
+                owner.breaker.before_request()
+                iterator = self._start(recorder).__aiter__()
+                returned_items = False
+                try:
+                    while True:
+                        fetch_start = time.perf_counter()
+                        try:
+                            item = await iterator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            elapsed += time.perf_counter() - fetch_start
+                        returned_items = True
+                        yield item
+                except Exception as e:
+                    recorder.add_headers(getattr(e, "headers", None))
+                    owner.breaker.record_failure(e)
+                    delay = None if returned_items else owner.policy.retry_delay(e, retries, waited)
+                    if delay is None:
+                        raise
+                    logging.info(f"Retrying Cosmos DB query in {delay:.2f}s: {e}")
+                    retries += 1
+                    waited += delay
+                    elapsed += delay
+                    await asyncio.sleep(delay)
+                    continue
+                owner.breaker.record_success()
+                return
+        except Exception:
+            failed = True
+            raise
+        finally:
+            owner.metrics.record(
+                "query_items",
+                recorder.data_type,
+                elapsed,
+                recorder.request_charge,
+                retries + recorder.retries,
+                failed,
+            )
+
+    def by_page(self, continuation_token: Optional[str] = None) -> "_ResilientPages":
+        return _ResilientPages(self, continuation_token)
+
+
+class _ResilientPages:
+    """Pages of a query, each fetched and recorded as one request."""
+
+    def __init__(self, query: _ResilientQuery, continuation_token: Optional[str]) -> None:
+        self._query = query
+        self.continuation_token = continuation_token
+        self._recorder: Optional[_RequestRecorder] = None
+        self._pages = None
+
+    def _hook(self, headers: Any, result: Any) -> None:
+        if self._recorder is not None:
+            self._recorder(headers, result)
+
+    def __aiter__(self) -> "_ResilientPages":
+        return self
+
+    async def __anext__(self) -> AsyncIterator[Dict[str, Any]]:
+        query = self._query
+        owner = query._owner
+        owner.breaker.before_request()
+        if self._pages is None:
+            self._pages = query._start(self._hook).by_page(self.continuation_token)
+        recorder = self._recorder = _RequestRecorder(query._data_type)
+        start = time.perf_counter()
+        try:
+            page = await self._pages.__anext__()
+            items = [item async for item in page]
+        except StopAsyncIteration:
+            raise
+        except Exception as e:
+            recorder.add_headers(getattr(e, "headers", None))
+            owner.breaker.record_failure(e)
+            self._record(recorder, start, failed=True)
+            raise
+        owner.breaker.record_success()
+        self._record(recorder, start, failed=False)
+        self.continuation_token = self._pages.continuation_token
+        return _iterate(items)
+
+    def _record(self, recorder: _RequestRecorder, start: float, failed: bool) -> None:
+        self._query._owner.metrics.record(
+            "query_items",
+            recorder.data_type,
+            time.perf_counter() - start,
+            recorder.request_charge,
+            recorder.retries,
+            failed,
+        )
+
+
+def default_retry_policy() -> RetryPolicy:
+    """The retry policy configured in AppConfig."""
+    return RetryPolicy(
+        max_retries=config.COSMOSDB_MAX_RETRIES,
+        max_wait_seconds=config.COSMOSDB_RETRY_MAX_WAIT_SECONDS,
+    )
+
+
+# Process-wide breaker and counters shared by every context using the account
+cosmos_circuit_breaker = CircuitBreaker(
+    failure_threshold=config.COSMOSDB_CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=config.COSMOSDB_CIRCUIT_RESET_SECONDS,
+)
+cosmos_metrics = OperationMetrics()
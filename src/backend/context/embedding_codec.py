@@ -0,0 +1,105 @@
+# embedding_codec.py
+
+import base64
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+# Version of the encoded embedding document written by encode_embedding
+EMBEDDING_CODEC_VERSION = 1
+
+# Stored element type of each binary encoding, little-endian on every platform
+_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+    "int8": np.dtype("i1"),
+}
+
+ENCODINGS = ("json",) + tuple(_DTYPES)
+
+StoredEmbedding = Union[List[float], Dict[str, Any], None]
+
+
+def encode_embedding(
+    embedding: Optional[np.ndarray], encoding: str = "float32"
+) -> StoredEmbedding:
+    """Encode an embedding for storage in a JSON document.
+
+    "json" keeps the plain list of floats that older versions wrote. The other
+    encodings store the raw little-endian values as base64 in a versioned
+    document; "int8" quantizes symmetrically with a per-vector scale.
+    """
+    if embedding is None:
+        return None
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    if encoding == "json":
+        return vector.tolist()
+
+    document: Dict[str, Any] = {
+        "v": EMBEDDING_CODEC_VERSION,
+        "dtype": encoding,
+        "dim": int(vector.shape[0]),
+    }
+    if encoding == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        vector = np.clip(np.rint(vector / scale), -127, 127)
+        document["scale"] = scale
+    document["data"] = base64.b64encode(
+        vector.astype(_DTYPES[encoding]).tobytes()
+    ).decode("ascii")
+    return document
+
+
+def embedding_dimension(value: StoredEmbedding) -> int:
+    """Return the dimension of a stored embedding without decoding it (0 if absent)."""
+    if not value:
+        return 0
+    if isinstance(value, dict):
+        return int(value["dim"])
+    return len(value)
+
+
+def decode_embedding(
+    value: StoredEmbedding, out: Optional[np.ndarray] = None
+) -> Optional[np.ndarray]:
+    """Decode a stored embedding into a float32 vector.
+
+    Reads both the versioned binary documents and plain lists of floats. When
+    out is given the values are written into it, which lets callers fill the
+    rows of a preallocated matrix. Without out, float32 data is returned as a
+    read-only view over the decoded bytes rather than a copy.
+    """
+    if not value:
+        return None
+
+    if not isinstance(value, dict):
+        if out is None:
+            return np.asarray(value, dtype=np.float32)
+        out[...] = value
+        return out
+
+    if value.get("v") != EMBEDDING_CODEC_VERSION:
+        raise ValueError(f"Unsupported embedding codec version: {value.get('v')}")
+    dtype = _DTYPES.get(value.get("dtype"))
+    if dtype is None:
+        raise ValueError(f"Unknown embedding encoding: {value.get('dtype')}")
+
+    raw = np.frombuffer(base64.b64decode(value["data"]), dtype=dtype)
+    if raw.shape[0] != value["dim"]:
+        raise ValueError(
+            f"Embedding has {raw.shape[0]} values, expected {value['dim']}"
+        )
+
+    if "scale" in value:
+        if out is None:
+            out = np.empty(raw.shape[0], dtype=np.float32)
+        np.multiply(raw, np.float32(value["scale"]), out=out, casting="unsafe")
+        return out
+    if out is None:
+        return raw if dtype == np.float32 else raw.astype(np.float32)
+    out[...] = raw
+    return out
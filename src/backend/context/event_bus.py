@@ -0,0 +1,93 @@
+# event_bus.py
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from semantic_kernel.kernel_pydantic import KernelBaseModel
+
+
+class DocumentChange(KernelBaseModel):
+    """A document that was created or updated in the memory store."""
+
+    id: str
+    data_type: Optional[str] = None
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+    document: Dict[str, Any]
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "DocumentChange":
+        return cls(
+            id=document["id"],
+            data_type=document.get("data_type"),
+            session_id=document.get("session_id"),
+            user_id=document.get("user_id"),
+            document=document,
+        )
+
+
+Subscriber = Callable[[DocumentChange], Any]
+
+
+class EventBus:
+    """In-process publish/subscribe for document changes.
+
+    Subscribers are plain or async callables, called in subscription order.
+    A failing subscriber is logged and does not affect the others. Push
+    channels that consume changes at their own pace use subscribe_queue.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> Callable[[], None]:
+        """Register a subscriber and return a function that unregisters it."""
+        self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def subscribe_queue(
+        self,
+        maxsize: int = 1000,
+        predicate: Optional[Callable[[DocumentChange], bool]] = None,
+    ) -> Tuple["asyncio.Queue[DocumentChange]", Callable[[], None]]:
+        """Deliver matching changes to a bounded queue.
+
+        When the queue is full the oldest change is dropped, so a slow consumer
+        never blocks publishers.
+        """
+        queue: "asyncio.Queue[DocumentChange]" = asyncio.Queue(maxsize)
+
+        def enqueue(change: DocumentChange) -> None:
+            if predicate is not None and not predicate(change):
+                return
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(change)
+
+        return queue, self.subscribe(enqueue)
+
+    async def publish(self, change: DocumentChange) -> None:
+        """Deliver a change to every subscriber."""
+        for subscriber in list(self._subscribers):
+            try:
+                result = subscriber(change)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.exception(f"Event bus subscriber failed for {change.id}: {e}")
+
+    async def publish_document(self, document: Dict[str, Any]) -> None:
+        """Publish a stored document, skipping the work when nobody listens."""
+        if self._subscribers:
+            await self.publish(DocumentChange.from_document(document))
+
+
+# Process-wide bus that the memory stores and the change-feed processor publish to
+event_bus = EventBus()
@@ -0,0 +1,214 @@
+# materialized_view.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app_config import config
+from context.change_feed import ChangeFeedProcessor
+from context.event_bus import DocumentChange
+from context.memory_context_base import MemoryContextBase
+from models.messages_kernel import AgentMessage, Plan, Step
+from models.serialization import from_document
+
+
+class _SessionView:
+    """The plan, steps and agent messages of one session of a user."""
+
+    __slots__ = ("plan", "steps", "messages", "complete", "loaded_at")
+
+    def __init__(self) -> None:
+        self.plan: Optional[Dict[str, Any]] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        # Set once the session was read from the store; until then only
+        # changes that arrived while loading are held
+        self.complete = False
+        self.loaded_at = 0.0
+
+    def plan_ids(self) -> List[str]:
+        plan_ids = {document["plan_id"] for document in self.steps.values()}
+        if self.plan is not None:
+            plan_ids.add(self.plan["id"])
+        return list(plan_ids)
+
+
+class MaterializedView:
+    """Plans, steps and agent messages of recently read sessions, kept current.
+
+    A session enters the view when a read endpoint loads it from the store
+    (load_session). From then on the view follows the event bus, which carries
+    both the writes of this process and the change feed of the store, and
+    answers reads of that session without querying the database. Changes of
+    sessions that are not loaded are ignored, since the feed starts at "now"
+    rather than replaying the whole store. A change only replaces a document if
+    it is not older than the version already held.
+
+    Deletes reach the view as tombstones, which drop the affected sessions so
+    that the next read loads them from the store again. Sessions are evicted
+    least recently used first, and reloaded after ttl_seconds in case a change
+    was missed.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = config.CHANGE_FEED_VIEW_MAX_SESSIONS,
+        ttl_seconds: float = config.CHANGE_FEED_VIEW_TTL_SECONDS,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._feed: Optional[ChangeFeedProcessor] = None
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[Tuple[str, str], _SessionView]" = OrderedDict()
+        self._session_by_plan: Dict[str, Tuple[str, str]] = {}
+
+    def follow(self, feed: Optional[ChangeFeedProcessor]) -> None:
+        """Serve reads once the change feed is following the store."""
+        self._feed = feed
+
+    @property
+    def ready(self) -> bool:
+        """Whether the view sees every change and can load sessions."""
+        return self._feed is not None and self._feed.caught_up.is_set()
+
+    @staticmethod
+    def _is_newer(document: Dict[str, Any], existing: Optional[Dict[str, Any]]) -> bool:
+        if existing is None:
+            return True
+        return document.get("_ts", 0) >= existing.get("_ts", 0)
+
+    def _put(self, documents: Dict[str, Dict[str, Any]], document: Dict[str, Any]) -> None:
+        if self._is_newer(document, documents.get(document["id"])):
+            documents[document["id"]] = document
+
+    def _apply_document(
+        self, key: Tuple[str, str], session: _SessionView, document: Dict[str, Any]
+    ) -> None:
+        data_type = document.get("data_type")
+        if data_type == "plan":
+            if self._is_newer(document, session.plan):
+                session.plan = document
+                self._session_by_plan[document["id"]] = key
+        elif data_type == "step" and document.get("plan_id"):
+            self._put(session.steps, document)
+            self._session_by_plan[document["plan_id"]] = key
+        elif data_type == "agent_message":
+            self._put(session.messages, document)
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return
+        for plan_id in session.plan_ids():
+            if self._session_by_plan.get(plan_id) == key:
+                del self._session_by_plan[plan_id]
+
+    def _apply_tombstone(self, document: Dict[str, Any]) -> None:
+        user_id = document.get("target_user_id")
+        session_id = document.get("target_session_id")
+        data_types = document.get("data_types")
+        if data_types is not None and not {"plan", "step", "agent_message"} & set(data_types):
+            return
+        for key in list(self._sessions):
+            if key[0] == user_id and (session_id is None or key[1] == session_id):
+                self._drop(key)
+
+    def apply(self, change: DocumentChange) -> None:
+        """Apply a document change to a loaded session. Other changes are ignored."""
+        with self._lock:
+            if change.data_type == "tombstone":
+                self._apply_tombstone(change.document)
+                return
+            key = (change.user_id, change.session_id)
+            session = self._sessions.get(key)
+            if session is not None:
+                self._apply_document(key, session, change.document)
+
+    def _get_complete(self, key: Tuple[str, str]) -> Optional[_SessionView]:
+        """The loaded session, or None if it is not held, still loading or expired."""
+        session = self._sessions.get(key)
+        if session is None or not session.complete:
+            return None
+        if time.monotonic() - session.loaded_at > self.ttl_seconds:
+            self._drop(key)
+            return None
+        self._sessions.move_to_end(key)
+        return session
+
+    async def load_session(self, memory_store: MemoryContextBase, session_id: str) -> bool:
+        """Make sure a session of the store's user is held, reading it on a miss.
+
+        Returns whether the view can answer reads of the session. Changes that
+        arrive while the session is read are kept if they are newer.
+        """
+        if not self.ready or self.max_sessions <= 0:
+            return False
+        key = (memory_store.user_id, session_id)
+        with self._lock:
+            if self._get_complete(key) is not None:
+                return True
+            session = _SessionView()
+            self._drop(key)
+            self._sessions[key] = session
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+
+        documents = await memory_store.get_session_documents(session_id)
+
+        with self._lock:
+            # Dropped by a tombstone or evicted while it was read
+            if self._sessions.get(key) is not session:
+                return False
+            for document in documents:
+                self._apply_document(key, session, document)
+            session.complete = True
+            session.loaded_at = time.monotonic()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._session_by_plan.clear()
+
+    def get_plan_by_session(self, session_id: str, user_id: str) -> Optional[Plan]:
+        """Return the plan of a loaded session of the user, or None."""
+        with self._lock:
+            session = self._get_complete((user_id, session_id))
+            document = session.plan if session is not None else None
+        return from_document(Plan, document) if document is not None else None
+
+    def get_steps_by_plan(self, plan_id: str, user_id: str) -> Optional[List[Step]]:
+        """Return the user's steps of a plan in creation order, or None if not held."""
+        with self._lock:
+            key = self._session_by_plan.get(plan_id)
+            if key is None or key[0] != user_id:
+                return None
+            session = self._get_complete(key)
+            if session is None:
+                return None
+            documents = [
+                document for document in session.steps.values()
+                if document["plan_id"] == plan_id
+            ]
+        # The feed orders documents by their last change, so sort by creation time
+        documents.sort(key=lambda document: document.get("timestamp") or "")
+        return [from_document(Step, document) for document in documents]
+
+    def get_agent_messages_by_session(
+        self, session_id: str, user_id: str
+    ) -> Optional[List[AgentMessage]]:
+        """Return the agent messages of a loaded session, oldest first, or None."""
+        with self._lock:
+            session = self._get_complete((user_id, session_id))
+            if session is None:
+                return None
+            documents = list(session.messages.values())
+        documents.sort(
+            key=lambda document: (document.get("_ts", 0), document.get("timestamp") or "")
+        )
+        return [from_document(AgentMessage, document) for document in documents]
+
+
+# Process-wide view, used when CHANGE_FEED_ENABLED is set
+materialized_view = MaterializedView()
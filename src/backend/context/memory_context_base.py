@@ -0,0 +1,863 @@
+# memory_context_base.py
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import uuid
+from abc import abstractmethod
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import numpy as np
+from semantic_kernel.contents import ChatMessageContent
+from semantic_kernel.kernel_pydantic import KernelBaseModel
+from semantic_kernel.memory.memory_record import MemoryRecord
+from semantic_kernel.memory.memory_store_base import MemoryStoreBase
+
+from app_config import config
+from context.ann_index import IVFIndex
+from context.embedding_codec import (
+    decode_embedding,
+    embedding_dimension,
+    encode_embedding,
+)
+from context.event_bus import event_bus
+from context.memory_cache import TTLCache
+from context.vector_index import VectorIndex
+from models.messages_kernel import (
+    AgentMessage,
+    BaseDataModel,
+    Plan,
+    PlanAggregate,
+    PlanSummary,
+    PlanWithSteps,
+    Session,
+    SessionSnapshot,
+    Step,
+    StepSummary,
+    Tombstone,
+)
+from models.serialization import from_document, from_documents, to_document
+
+ModelT = TypeVar("ModelT", bound=BaseDataModel)
+
+
+class UpdateConflictError(RuntimeError):
+    """An item kept changing while an update was being merged into it."""
+
+
+class MemoryContextBase(MemoryStoreBase):
+    """Storage interface used by the agents and the API endpoints.
+
+    Implementations persist sessions, plans, steps and agent messages per
+    session_id and user_id, and provide the Semantic Kernel memory-record
+    APIs. Similarity search over memory records is served from an in-process
+    index built from the hooks _build_vector_index and _get_memory_watermark.
+    """
+
+    MODEL_CLASS_MAPPING = {
+        "session": Session,
+        "plan": Plan,
+        "step": Step,
+        "agent_message": AgentMessage,
+        # Messages are handled separately
+    }
+
+    # Attempts of an optimistic update before UpdateConflictError is raised
+    MAX_UPDATE_ATTEMPTS = 5
+
+    # Process-wide similarity indexes keyed by (session_id, collection), reloaded
+    # from the store after their TTL and evicted least recently used first
+    _vector_indexes = TTLCache(
+        max_entries=config.MEMORY_INDEX_MAX_ENTRIES,
+        ttl_seconds=config.MEMORY_INDEX_TTL_SECONDS,
+    )
+
+    session_id: str
+    user_id: str
+
+    @abstractmethod
+    async def ensure_initialized(self) -> None:
+        """Make sure the underlying store is ready to use."""
+
+    @abstractmethod
+    async def add_item(self, item: BaseDataModel) -> None:
+        """Add a data model item to the store."""
+
+    @abstractmethod
+    async def update_item(self, item: BaseDataModel) -> None:
+        """Update an existing item in the store."""
+
+    @abstractmethod
+    async def get_item_by_id(
+        self, item_id: str, partition_key: str, model_class: Type[BaseDataModel]
+    ) -> Optional[BaseDataModel]:
+        """Retrieve an item by its ID and session ID."""
+
+    @abstractmethod
+    async def query_items(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        model_class: Type[BaseDataModel],
+        partition_key: Optional[str] = None,
+    ) -> List[BaseDataModel]:
+        """Run a Cosmos DB SQL style query and return a list of model instances."""
+
+    @abstractmethod
+    async def _query_documents(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a Cosmos DB SQL style query and return the raw documents."""
+
+    @abstractmethod
+    async def _read_document(
+        self, item_id: str, partition_key: str
+    ) -> Optional[Dict[str, Any]]:
+        """Read a stored document with its _etag, or None if it does not exist."""
+
+    @abstractmethod
+    async def _replace_if_match(
+        self, document: Dict[str, Any], etag: str
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a document if its stored _etag still matches.
+
+        Returns the stored document with its new _etag, or None if the document
+        changed or was deleted.
+        """
+
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[Session]:
+        """Retrieve a session by session_id."""
+
+    @abstractmethod
+    async def get_all_sessions(self) -> List[Session]:
+        """Retrieve all sessions."""
+
+    @abstractmethod
+    async def add_plan(self, plan: Plan) -> None:
+        """Add a plan to the store."""
+
+    @abstractmethod
+    async def update_plan(self, plan: Plan) -> None:
+        """Update an existing plan in the store."""
+
+    @abstractmethod
+    async def get_plan_by_session(self, session_id: str) -> Optional[Plan]:
+        """Retrieve the plan of a session."""
+
+    @abstractmethod
+    async def get_plan(self, plan_id: str) -> Optional[Plan]:
+        """Retrieve a plan of the current session by its ID."""
+
+    @abstractmethod
+    async def get_all_plans(self, limit: int = 5) -> List[Plan]:
+        """Retrieve the most recent plans of the current user."""
+
+    @abstractmethod
+    async def add_step(self, step: Step) -> None:
+        """Add a step to the store."""
+
+    @abstractmethod
+    async def update_step(self, step: Step) -> None:
+        """Update an existing step in the store."""
+
+    @abstractmethod
+    async def get_steps_by_plan(
+        self, plan_id: str, session_id: Optional[str] = None
+    ) -> List[Step]:
+        """Retrieve all steps of a plan."""
+
+    @abstractmethod
+    async def get_agent_messages_by_session(
+        self, session_id: str
+    ) -> List[AgentMessage]:
+        """Retrieve the agent messages of a session, oldest first."""
+
+    @abstractmethod
+    async def add_message(self, message: ChatMessageContent) -> None:
+        """Add a chat message to the current session."""
+
+    @abstractmethod
+    async def get_messages(self) -> List[ChatMessageContent]:
+        """Get recent chat messages of the current session."""
+
+    @abstractmethod
+    async def get_data_by_type(self, data_type: str) -> List[BaseDataModel]:
+        """Retrieve the current session's items of a data type, oldest first."""
+
+    @abstractmethod
+    async def delete_item(self, item_id: str, partition_key: str) -> None:
+        """Delete an item by its ID and session ID."""
+
+    @abstractmethod
+    async def bulk_delete(
+        self,
+        data_types: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Delete every item of the current user with one of the given data types."""
+
+    @abstractmethod
+    async def get_all_messages(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retrieve the current user's items, most recent sessions first."""
+
+    @abstractmethod
+    def iter_all_messages(
+        self, continuation_token: Optional[str] = None, page_size: int = 100
+    ) -> AsyncIterator[Tuple[Dict[str, Any], Optional[str]]]:
+        """Yield the current user's items as pages arrive from the store.
+
+        Each item comes with an opaque continuation token that resumes the
+        listing right after it, or None once the listing is complete.
+        """
+
+    @abstractmethod
+    def iter_all_plans(
+        self, continuation_token: Optional[str] = None, page_size: int = 5
+    ) -> AsyncIterator[Tuple[Plan, Optional[str]]]:
+        """Yield the current user's plans, most recent first, with continuation tokens."""
+
+    @abstractmethod
+    async def upsert_memory_record(self, collection: str, record: MemoryRecord) -> str:
+        """Store a memory record."""
+
+    @abstractmethod
+    async def get_memory_record(
+        self, collection: str, key: str, with_embedding: bool = False
+    ) -> Optional[MemoryRecord]:
+        """Retrieve a memory record."""
+
+    @abstractmethod
+    async def remove_memory_record(self, collection: str, key: str) -> None:
+        """Remove a memory record."""
+
+    @abstractmethod
+    async def upsert_async(self, collection_name: str, record: Dict[str, Any]) -> str:
+        """Insert or replace a raw document."""
+
+    @abstractmethod
+    async def _build_vector_index(self, collection: str) -> VectorIndex:
+        """Load every record of a collection into an exact index."""
+
+    @abstractmethod
+    async def _get_memory_watermark(self, collection: str) -> Dict[str, Any]:
+        """Return the record count and last modification time of a collection."""
+
+    @staticmethod
+    def _encode_continuation(position: Dict[str, Any]) -> str:
+        """Encode a listing position as an opaque, URL-safe continuation token."""
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def _decode_continuation(token: Optional[str]) -> Dict[str, Any]:
+        """Decode a continuation token. Raises ValueError if it is malformed."""
+        if not token:
+            return {}
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except Exception as e:
+            raise ValueError("Invalid continuation token") from e
+        if not isinstance(position, dict):
+            raise ValueError("Invalid continuation token")
+        return position
+
+    async def flush(self) -> None:
+        """Write any buffered operations. Stores that do not buffer have nothing to do."""
+
+    async def delete_all_items(self, data_type) -> None:
+        """Delete all items of a specific type of the current user."""
+        await self.bulk_delete([data_type])
+
+    async def add_session(self, session: Session) -> None:
+        """Add a session to the store."""
+        await self.add_item(session)
+
+    async def _update_with_merge(
+        self, item: ModelT, merge: Callable[[ModelT, ModelT], ModelT]
+    ) -> None:
+        """Write an update with optimistic concurrency instead of a blind upsert.
+
+        The item is replaced only if the stored document still has the _etag the
+        item was read with. Otherwise the stored version is read back, the item
+        is merged into it with merge(stored, item) and the replace is retried.
+        The item is updated in place with the merged values and the new _etag.
+        Items never read from or written to the store are merged into the
+        stored version first; items that do not exist yet are upserted.
+        """
+        candidate, etag = item, item._etag
+        for _ in range(self.MAX_UPDATE_ATTEMPTS):
+            if etag is None:
+                document = await self._read_document(item.id, item.session_id)
+                if document is None:
+                    await self.update_item(item)
+                    return
+                stored = from_document(type(item), document)
+                candidate, etag = merge(stored, item), stored._etag
+            written = await self._replace_if_match(to_document(candidate), etag)
+            if written is not None:
+                break
+            etag = None
+        else:
+            raise UpdateConflictError(
+                f"{type(item).__name__} {item.id} kept changing during "
+                f"{self.MAX_UPDATE_ATTEMPTS} update attempts"
+            )
+
+        if candidate is not item:
+            for name in type(item).model_fields:
+                if getattr(item, name) != getattr(candidate, name):
+                    setattr(item, name, getattr(candidate, name))
+        item._etag = written.get("_etag")
+        await self._publish(written)
+
+    @staticmethod
+    async def _publish(document: Dict[str, Any]) -> None:
+        """Publish a written document to the process-wide event bus."""
+        await event_bus.publish_document(document)
+
+    async def _record_deletion(
+        self,
+        session_id: Optional[str] = None,
+        data_types: Optional[List[str]] = None,
+        item_ids: Optional[List[str]] = None,
+        collection: Optional[str] = None,
+    ) -> None:
+        """Write a tombstone for documents of the current user that were deleted.
+
+        Other processes only learn about deletes from the tombstone, which
+        reaches them through the change feed. A failure to write it is logged
+        and does not fail the delete.
+        """
+        tombstone = Tombstone(
+            session_id=session_id or f"tombstone_{self.user_id}",
+            target_user_id=self.user_id,
+            target_session_id=session_id,
+            data_types=data_types,
+            item_ids=item_ids,
+            collection=collection,
+        )
+        try:
+            await self.add_item(tombstone)
+        except Exception as e:
+            logging.warning(f"Failed to record deletion for user {self.user_id}: {e}")
+
+    @staticmethod
+    def _apply_patch(
+        document: Dict[str, Any], operations: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Apply Cosmos DB patch operations (set, add, replace, remove, incr) to a document."""
+        for operation in operations:
+            *parents, name = operation["path"].strip("/").split("/")
+            target = document
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            if operation["op"] == "remove":
+                target.pop(name, None)
+            elif operation["op"] == "incr":
+                target[name] = target.get(name, 0) + operation["value"]
+            else:
+                target[name] = operation["value"]
+        return document
+
+    async def _patch_if_match(
+        self,
+        item_id: str,
+        partition_key: str,
+        operations: List[Dict[str, Any]],
+        etag: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Patch a document only if it is unchanged since it had this _etag.
+
+        Returns the patched document, or None if it changed or does not exist.
+        Stores without partial updates read, patch and conditionally replace it.
+        """
+        document = await self._read_document(item_id, partition_key)
+        if document is None or document.get("_etag") != etag:
+            return None
+        return await self._replace_if_match(self._apply_patch(document, operations), etag)
+
+    async def _add_plan_aggregate(self, plan: Plan) -> None:
+        """Create the aggregate of a new plan when PLAN_AGGREGATE_ENABLED is set."""
+        if config.PLAN_AGGREGATE_ENABLED:
+            await self.update_item(PlanAggregate.from_plan(to_document(plan)))
+
+    async def _update_plan_aggregate(
+        self,
+        session_id: str,
+        operations: Callable[[PlanAggregate], List[Dict[str, Any]]],
+    ) -> None:
+        """Patch the aggregate of a session when PLAN_AGGREGATE_ENABLED is set.
+
+        operations builds the patch from the stored aggregate, which is patched
+        only if it did not change in between. If it keeps changing, it is
+        rebuilt from the plan and step documents instead.
+        """
+        if not config.PLAN_AGGREGATE_ENABLED:
+            return
+        aggregate_id = PlanAggregate.aggregate_id(session_id)
+        for _ in range(self.MAX_UPDATE_ATTEMPTS):
+            document = await self._read_document(aggregate_id, session_id)
+            if document is None:
+                # Sessions from before aggregates were enabled have none until migrated
+                return
+            written = await self._patch_if_match(
+                aggregate_id,
+                session_id,
+                operations(from_document(PlanAggregate, document)),
+                document["_etag"],
+            )
+            if written is not None:
+                await self._publish(written)
+                return
+        logging.warning(f"Plan aggregate {aggregate_id} kept changing, rebuilding it")
+        await self.rebuild_plan_aggregate(session_id)
+
+    async def _update_aggregate_plan(self, plan: Plan) -> None:
+        await self._update_plan_aggregate(
+            plan.session_id, lambda aggregate: aggregate.plan_operations(to_document(plan))
+        )
+
+    async def _update_aggregate_step(self, step: Step) -> None:
+        await self._update_plan_aggregate(
+            step.session_id, lambda aggregate: aggregate.step_operations(to_document(step))
+        )
+
+    async def rebuild_plan_aggregate(self, session_id: str) -> bool:
+        """Write the aggregate of a session from its plan and step documents.
+
+        Returns False if the session has no plan.
+        """
+        plans = await self._query_documents(
+            "SELECT * FROM c WHERE c.session_id=@session_id AND c.data_type=@data_type",
+            [
+                {"name": "@session_id", "value": session_id},
+                {"name": "@data_type", "value": "plan"},
+            ],
+            partition_key=session_id,
+        )
+        if not plans:
+            return False
+        steps = await self._query_documents(
+            "SELECT * FROM c WHERE c.plan_id=@plan_id AND c.data_type=@data_type",
+            [
+                {"name": "@plan_id", "value": plans[0]["id"]},
+                {"name": "@data_type", "value": "step"},
+            ],
+            partition_key=session_id,
+        )
+        plan = to_document(from_document(Plan, plans[0]))
+        steps = [to_document(from_document(Step, step)) for step in steps]
+        await self.update_item(PlanAggregate.from_plan(plan, steps))
+        return True
+
+    async def rebuild_plan_aggregates(
+        self, on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """Write the aggregate of every session with a plan, of all users.
+
+        Used to migrate stores written before PLAN_AGGREGATE_ENABLED was set.
+        Returns the number of aggregates written.
+        """
+        plans = await self._query_documents(
+            "SELECT c.session_id FROM c WHERE c.data_type=@data_type",
+            [{"name": "@data_type", "value": "plan"}],
+        )
+        session_ids = list(dict.fromkeys(plan["session_id"] for plan in plans))
+        written = 0
+        for position, session_id in enumerate(session_ids, start=1):
+            written += await self.rebuild_plan_aggregate(session_id)
+            if on_progress:
+                on_progress(len(session_ids), position)
+        return written
+
+    async def get_plan_with_steps(self, session_id: str) -> Optional[PlanWithSteps]:
+        """Retrieve the plan of a session with its steps and step counts.
+
+        With PLAN_AGGREGATE_ENABLED this is one point read of the session's
+        aggregate; sessions without one are read from the plan and step
+        documents.
+        """
+        if config.PLAN_AGGREGATE_ENABLED:
+            document = await self._read_document(
+                PlanAggregate.aggregate_id(session_id), session_id
+            )
+            if document is not None and document.get("user_id") == self.user_id:
+                return from_document(PlanAggregate, document).to_plan_with_steps()
+
+        plan = await self.get_plan_by_session(session_id)
+        if plan is None:
+            return None
+        steps = await self.get_steps_by_plan(plan.id, session_id=session_id)
+        plan_with_steps = PlanWithSteps(**plan.model_dump(), steps=steps)
+        plan_with_steps.update_step_counts()
+        return plan_with_steps
+
+    async def get_session_documents(
+        self, session_id: str, since: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Read the raw plan, step and agent-message documents of a session.
+
+        Args:
+            session_id: The session to read
+            since: Only read documents changed at or after this _ts
+        """
+        where = (
+            "c.session_id=@session_id AND c.user_id=@user_id"
+            " AND ARRAY_CONTAINS(@data_types, c.data_type)"
+        )
+        parameters = [
+            {"name": "@session_id", "value": session_id},
+            {"name": "@user_id", "value": self.user_id},
+            {"name": "@data_types", "value": ["plan", "step", "agent_message"]},
+        ]
+        if since is not None:
+            # _ts has a resolution of seconds, so changes made in the same
+            # second as the watermark are read again rather than missed
+            where += " AND c._ts>=@since"
+            parameters.append({"name": "@since", "value": since})
+        return await self._query_documents(
+            f"SELECT * FROM c WHERE {where}", parameters, partition_key=session_id
+        )
+
+    async def get_session_snapshot(
+        self, session_id: str, since: Optional[int] = None
+    ) -> SessionSnapshot:
+        """Read a session's plan, steps and agent messages in one partition query.
+
+        Args:
+            session_id: The session to read
+            since: A previous snapshot's watermark; only documents changed at
+                or after it are read. Deleted documents are not reported.
+        """
+        documents = await self.get_session_documents(session_id, since)
+
+        snapshot = SessionSnapshot(session_id=session_id, since=since)
+        messages = []
+        for document in documents:
+            if document["data_type"] == "plan":
+                snapshot.plan = from_document(Plan, document)
+            elif document["data_type"] == "step":
+                snapshot.steps.append(from_document(Step, document))
+            else:
+                messages.append(document)
+        messages.sort(
+            key=lambda document: (document.get("_ts", 0), document.get("timestamp") or "")
+        )
+        snapshot.agent_messages = from_documents(AgentMessage, messages)
+        snapshot.watermark = max(
+            (document.get("_ts", 0) for document in documents), default=since
+        )
+        if since is None:
+            versions = sorted(
+                f"{document['id']}:{document.get('_etag', document.get('_ts'))}"
+                for document in documents
+            )
+            snapshot.etag = hashlib.sha256("\n".join(versions).encode()).hexdigest()[:32]
+        return snapshot
+
+    async def query_projection(
+        self,
+        fields: Sequence[str],
+        where: str,
+        parameters: List[Dict[str, Any]],
+        model_class: Type[KernelBaseModel],
+        partition_key: Optional[str] = None,
+    ) -> List[KernelBaseModel]:
+        """Query only the given fields and validate the documents into model_class.
+
+        Args:
+            fields: Top-level document fields to return
+            where: The WHERE clause, referring to the document as c
+            parameters: The query parameters
+            model_class: A model whose required fields are all projected
+            partition_key: The session ID, if known, to query a single partition
+        """
+        projection = ", ".join(f"c.{field}" for field in fields)
+        query = f"SELECT {projection} FROM c WHERE {where}"
+        try:
+            documents = await self._query_documents(query, parameters, partition_key)
+            return from_documents(model_class, documents)
+        except Exception as e:
+            logging.exception(f"Failed to run projection query: {e}")
+            return []
+
+    async def get_step_summaries_by_plan(
+        self, plan_id: str, session_id: Optional[str] = None
+    ) -> List[StepSummary]:
+        """Retrieve the summaries of the steps of a plan, without the agent replies.
+
+        Args:
+            plan_id: The ID of the plan to retrieve steps for
+            session_id: The plan's session ID, if known, to query a single partition
+        """
+        return await self.query_projection(
+            StepSummary.projected_fields(),
+            "c.plan_id=@plan_id AND c.user_id=@user_id AND c.data_type=@data_type",
+            [
+                {"name": "@plan_id", "value": plan_id},
+                {"name": "@data_type", "value": "step"},
+                {"name": "@user_id", "value": self.user_id},
+            ],
+            StepSummary,
+            partition_key=session_id,
+        )
+
+    async def get_plan_summary(self, plan: Plan) -> PlanSummary:
+        """Summarize a plan with the counts of its steps by status."""
+        steps = await self.get_step_summaries_by_plan(plan.id, session_id=plan.session_id)
+        return PlanSummary.from_plan(plan, steps)
+
+    async def get_all_plan_summaries(self) -> List[PlanSummary]:
+        """Summarize all plans of the current user."""
+        plans = await self.get_all_plans()
+        return list(await asyncio.gather(*[self.get_plan_summary(plan) for plan in plans]))
+
+    async def get_steps_for_plan(
+        self, plan_id: str, session_id: Optional[str] = None
+    ) -> List[Step]:
+        """Retrieve all steps associated with a plan.
+
+        Args:
+            plan_id: The ID of the plan to retrieve steps for
+            session_id: Optional session ID if known
+
+        Returns:
+            List of Step objects
+        """
+        return await self.get_steps_by_plan(plan_id, session_id=session_id)
+
+    async def get_step(self, step_id: str, session_id: str) -> Optional[Step]:
+        """Retrieve a step by its ID and session ID."""
+        return await self.get_item_by_id(
+            step_id, partition_key=session_id, model_class=Step
+        )
+
+    async def add_agent_message(self, message: AgentMessage) -> None:
+        """Add an agent message to the store.
+
+        Args:
+            message: The AgentMessage to add
+        """
+        await self.add_item(message)
+
+    async def get_all_items(self) -> List[Dict[str, Any]]:
+        """Retrieve all items of the current user."""
+        return await self.get_all_messages()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _memory_document(self, collection: str, record: MemoryRecord) -> Dict[str, Any]:
+        """Build the stored document of a memory record in the current session."""
+        return {
+            "id": record.id or str(uuid.uuid4()),
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "data_type": "memory",
+            "collection": collection,
+            "text": record.text,
+            "description": record.description,
+            # MemoryRecord exposes no properties for the source name and key
+            "external_source_name": record._external_source_name,
+            "additional_metadata": record.additional_metadata,
+            "embedding": encode_embedding(
+                record.embedding, config.MEMORY_EMBEDDING_ENCODING
+            ),
+            "key": record._key,
+        }
+
+    @staticmethod
+    def _to_memory_record(
+        item: Dict[str, Any], embedding: Optional[np.ndarray] = None
+    ) -> MemoryRecord:
+        """Build a MemoryRecord from a stored memory document."""
+        return MemoryRecord(
+            is_reference=False,
+            id=item["id"],
+            key=item.get("key", ""),
+            text=item.get("text", ""),
+            embedding=embedding,
+            description=item.get("description", ""),
+            additional_metadata=item.get("additional_metadata", ""),
+            external_source_name=item.get("external_source_name", ""),
+        )
+
+    async def upsert(self, collection_name: str, record: MemoryRecord) -> str:
+        """Upsert a memory record into the store."""
+        return await self.upsert_memory_record(collection_name, record)
+
+    async def get(
+        self, collection_name: str, key: str, with_embedding: bool = False
+    ) -> MemoryRecord:
+        """Get a memory record from the store."""
+        return await self.get_memory_record(collection_name, key, with_embedding)
+
+    async def remove(self, collection_name: str, key: str) -> None:
+        """Remove a memory record from the store."""
+        await self.remove_memory_record(collection_name, key)
+
+    async def get_nearest_match(
+        self,
+        collection_name: str,
+        embedding: np.ndarray,
+        limit: int = 1,
+        min_relevance_score: float = 0.0,
+        with_embeddings: bool = False,
+    ) -> Tuple[MemoryRecord, float]:
+        """Get the nearest match to the given embedding."""
+        matches = await self.get_nearest_matches(
+            collection_name, embedding, limit, min_relevance_score, with_embeddings
+        )
+        return matches[0] if matches else (None, 0.0)
+
+    async def get_nearest_matches(
+        self,
+        collection_name: str,
+        embedding: np.ndarray,
+        limit: int = 1,
+        min_relevance_score: float = 0.0,
+        with_embeddings: bool = False,
+    ) -> List[Tuple[MemoryRecord, float]]:
+        """Get the nearest matches to the given embedding.
+
+        Scores the whole collection against the in-memory similarity index.
+        """
+        await self.ensure_initialized()
+
+        try:
+            index = await self._get_vector_index(collection_name)
+            results = []
+            for _, (document, norm), score in index.search(
+                embedding, limit, min_relevance_score
+            ):
+                record_embedding = None
+                if with_embeddings:
+                    normalized = index.get(document["id"])[1]
+                    record_embedding = normalized * norm
+                results.append((self._to_memory_record(document, record_embedding), score))
+            return results
+        except Exception as e:
+            logging.exception(f"Failed to get nearest matches {e}")
+            return []
+
+    def _get_loaded_vector_index(self, collection: str) -> Optional[VectorIndex]:
+        """Return the collection's index if it is loaded and not yet stale."""
+        return self._vector_indexes.get((self.session_id, collection))
+
+    @staticmethod
+    def _index_memory_document(index: VectorIndex, document: Dict[str, Any]) -> None:
+        """Add a memory document to an index, keeping its original norm."""
+        embedding = decode_embedding(document.get("embedding"))
+        if embedding is None:
+            index.remove(document["id"])
+            return
+        payload = {key: value for key, value in document.items() if key != "embedding"}
+        try:
+            index.upsert(document["id"], embedding, (payload, float(np.linalg.norm(embedding))))
+        except ValueError as e:
+            logging.warning(f"Skipping memory record {document['id']} in index: {e}")
+
+    @staticmethod
+    def _index_memory_documents(
+        index: VectorIndex, documents: List[Dict[str, Any]]
+    ) -> None:
+        """Add memory documents to an index in one pass.
+
+        Embeddings are decoded straight into the rows of one preallocated matrix.
+        Documents without an embedding, or whose dimension differs from the
+        first one's, are skipped.
+        """
+        documents = [document for document in documents if document.get("embedding")]
+        if not documents:
+            return
+        dimension = index.dimension or embedding_dimension(documents[0]["embedding"])
+        matrix = np.empty((len(documents), dimension), dtype=np.float32)
+        ids, payloads = [], []
+        for document in documents:
+            if embedding_dimension(document["embedding"]) != dimension:
+                logging.warning(
+                    f"Skipping memory record {document['id']} in index: "
+                    f"embedding dimension does not match {dimension}"
+                )
+                continue
+            row = matrix[len(ids)]
+            decode_embedding(document["embedding"], out=row)
+            payload = {key: value for key, value in document.items() if key != "embedding"}
+            ids.append(document["id"])
+            payloads.append((payload, float(np.linalg.norm(row))))
+        index.upsert_many(ids, matrix[: len(ids)], payloads)
+
+    async def _get_vector_index(self, collection: str) -> VectorIndex:
+        """Return the collection's index, loading every record on first use.
+
+        The index is then kept current by upsert_memory_record and
+        remove_memory_record, and reloaded after MEMORY_INDEX_TTL_SECONDS to
+        pick up writes made by other processes. Collections of at least
+        MEMORY_ANN_MIN_RECORDS records get an approximate IVF index, which is
+        saved under MEMORY_ANN_INDEX_DIR when set and memory-mapped back as long
+        as the collection has not changed since.
+        """
+        index = self._get_loaded_vector_index(collection)
+        if index is not None:
+            return index
+
+        directory = None
+        watermark = None
+        if config.MEMORY_ANN_MIN_RECORDS > 0 and config.MEMORY_ANN_INDEX_DIR:
+            directory = self._ann_index_directory(collection)
+            watermark = await self._get_memory_watermark(collection)
+            index = self._load_ann_index(directory, watermark)
+
+        if index is None:
+            index = await self._build_vector_index(collection)
+            if 0 < config.MEMORY_ANN_MIN_RECORDS <= len(index):
+                index = IVFIndex.from_index(index, n_probe=config.MEMORY_ANN_N_PROBE)
+                index.train()
+                if directory:
+                    try:
+                        index.save(directory, metadata={"watermark": watermark})
+                    except Exception as e:
+                        logging.warning(f"Failed to save memory index to {directory}: {e}")
+
+        self._vector_indexes.set((self.session_id, collection), index)
+        return index
+
+    def _ann_index_directory(self, collection: str) -> str:
+        """Directory of the saved index of a collection in the current session."""
+        name = hashlib.sha256(f"{self.session_id}/{collection}".encode()).hexdigest()
+        return os.path.join(config.MEMORY_ANN_INDEX_DIR, name)
+
+    @staticmethod
+    def _load_ann_index(directory: str, watermark: Dict[str, Any]) -> Optional[IVFIndex]:
+        """Memory-map a saved index if it matches the collection's watermark."""
+        if not os.path.exists(os.path.join(directory, IVFIndex.METADATA_FILE)):
+            return None
+        try:
+            index = IVFIndex.load(directory)
+        except Exception as e:
+            logging.warning(f"Failed to load memory index from {directory}: {e}")
+            return None
+        if index.metadata.get("watermark") != watermark:
+            return None
+        return index
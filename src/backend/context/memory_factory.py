@@ -0,0 +1,15 @@
+# memory_factory.py
+
+from app_config import config
+from context.cosmos_memory_kernel import CosmosMemoryContext
+from context.memory_context_base import MemoryContextBase
+from context.sqlite_memory_context import SQLiteMemoryContext
+
+
+def create_memory_context(session_id: str, user_id: str) -> MemoryContextBase:
+    """Create a memory context for the backend selected by AppConfig.MEMORY_BACKEND."""
+    if config.MEMORY_BACKEND == "sqlite":
+        return SQLiteMemoryContext(session_id, user_id)
+    if config.MEMORY_BACKEND != "cosmos":
+        raise ValueError(f"Unknown memory backend: {config.MEMORY_BACKEND}")
+    return CosmosMemoryContext(session_id, user_id)
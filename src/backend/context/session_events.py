@@ -0,0 +1,259 @@
+# session_events.py
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from context.event_bus import DocumentChange
+
+# Data types pushed to clients that follow a session
+SESSION_EVENT_TYPES = ("plan", "step", "agent_message", "agent_message_delta")
+
+
+class SessionEvent:
+    """A change to a plan, step or agent message, numbered in arrival order."""
+
+    __slots__ = ("seq", "change")
+
+    def __init__(self, seq: int, change: DocumentChange) -> None:
+        self.seq = seq
+        self.change = change
+
+
+class _SessionLog:
+    __slots__ = ("events", "etags", "dropped_through", "waiter")
+
+    def __init__(self, dropped_through: int) -> None:
+        self.events: Deque[SessionEvent] = deque()
+        self.etags: Dict[str, str] = {}
+        # Sequence number of the newest event no longer held
+        self.dropped_through = dropped_through
+        self.waiter: Optional[asyncio.Event] = None
+
+
+class SessionEventLog:
+    """Recent plan, step and agent-message changes of each session.
+
+    The log subscribes to the event bus and keeps the latest events of the
+    most recently active sessions, so that a client that reconnects with the
+    id of the last event it received gets only what it missed. Event ids
+    carry an epoch of this process; an id from another process or one whose
+    successors were already dropped cannot be resumed, and the client is told
+    to reset and reload the session instead.
+
+    Only changes published in this process are seen, which includes the
+    store's change feed when it is enabled.
+    """
+
+    def __init__(self, max_events_per_session: int = 500, max_sessions: int = 1000) -> None:
+        self.max_events_per_session = max_events_per_session
+        self.max_sessions = max_sessions
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._evicted_through = 0
+        self._sessions: "OrderedDict[str, _SessionLog]" = OrderedDict()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}:{seq}"
+
+    def parse_event_id(self, event_id: str) -> Optional[int]:
+        """The sequence number of an event id of this process, or None."""
+        epoch, _, seq = event_id.partition(":")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _session(self, session_id: str) -> _SessionLog:
+        log = self._sessions.get(session_id)
+        if log is None:
+            log = _SessionLog(self._evicted_through)
+            self._sessions[session_id] = log
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                if evicted.events:
+                    self._evicted_through = max(
+                        self._evicted_through, evicted.events[-1].seq
+                    )
+        return log
+
+    def apply(self, change: DocumentChange) -> None:
+        """Record a document change. Other data types are ignored."""
+        if change.data_type not in SESSION_EVENT_TYPES or not change.session_id:
+            return
+        log = self._session(change.session_id)
+        self._sessions.move_to_end(change.session_id)
+
+        # A write is published by the store and again by the change feed
+        etag = change.document.get("_etag")
+        if etag is not None:
+            if log.etags.get(change.id) == etag:
+                return
+            log.etags[change.id] = etag
+
+        self._seq += 1
+        log.events.append(SessionEvent(self._seq, change))
+        while len(log.events) > self.max_events_per_session:
+            log.dropped_through = log.events.popleft().seq
+        if log.waiter is not None:
+            log.waiter.set()
+            log.waiter = None
+
+    def since(self, session_id: str, seq: int) -> Tuple[List[SessionEvent], bool]:
+        """The session's events after seq, and whether none of them were dropped."""
+        log = self._sessions.get(session_id)
+        if log is None:
+            return [], seq >= self._evicted_through
+        events = [event for event in log.events if event.seq > seq]
+        return events, seq >= log.dropped_through
+
+    async def wait(self, session_id: str, seq: int, timeout: float) -> bool:
+        """Wait up to timeout for an event of the session after seq."""
+        log = self._session(session_id)
+        if log.events and log.events[-1].seq > seq:
+            return True
+        if log.waiter is None:
+            log.waiter = asyncio.Event()
+        try:
+            await asyncio.wait_for(log.waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def clear(self) -> None:
+        self._sessions.clear()
+
+    def _format(self, event: str, seq: int, data: Any) -> str:
+        payload = json.dumps(data, default=str)
+        return f"id: {self.event_id(seq)}\nevent: {event}\ndata: {payload}\n\n"
+
+    def _format_change(self, event: SessionEvent) -> str:
+        document = {
+            key: value
+            for key, value in event.change.document.items()
+            if not key.startswith("_")
+        }
+        return self._format(event.change.data_type, event.seq, document)
+
+    async def stream(
+        self,
+        session_id: str,
+        user_id: str,
+        last_event_id: Optional[str] = None,
+        keepalive_seconds: float = 15.0,
+    ) -> AsyncIterator[str]:
+        """Server-Sent Events for the user's changes in a session.
+
+        Without last_event_id only changes from now on are sent. With one, the
+        events after it are replayed first, or a reset event is sent if they
+        can no longer be replayed.
+        """
+        yield "retry: 3000\n\n"
+        cursor = self._seq
+        if last_event_id:
+            resumed = self.parse_event_id(last_event_id)
+            if resumed is None:
+                yield self._format("reset", cursor, {"reason": "unknown_event_id"})
+            else:
+                cursor = resumed
+
+        while True:
+            events, complete = self.since(session_id, cursor)
+            if not complete:
+                cursor = self._seq
+                yield self._format("reset", cursor, {"reason": "events_dropped"})
+                continue
+            for event in events:
+                cursor = event.seq
+                if event.change.user_id == user_id:
+                    yield self._format_change(event)
+            if events:
+                continue
+            if not await self.wait(session_id, cursor, keepalive_seconds):
+                yield ": keepalive\n\n"
+
+
+# Process-wide log that the session event streams read from
+session_events = SessionEventLog()
+
+
+class AgentReplyStream:
+    """Collects the streamed chunks of an agent reply and forwards them.
+
+    Chunks are kept in a list and joined once at the end. What arrived since
+    the last forward is sent to the session's event stream as an
+    agent_message_delta event at most every min_interval seconds, so a long
+    reply does not crowd the session's events out of the log. The reply is not stored; the caller
+    persists the finished AgentMessage as usual.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        user_id: str,
+        source: str,
+        step_id: Optional[str] = None,
+        log: SessionEventLog = session_events,
+        min_interval: float = 0.1,
+    ) -> None:
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.user_id = user_id
+        self.source = source
+        self.step_id = step_id
+        self.log = log
+        self.min_interval = min_interval
+        self.first_chunk_seconds: Optional[float] = None
+        self._chunks: List[str] = []
+        self._forwarded = 0
+        self._forwarded_length = 0
+        self._started = time.monotonic()
+        self._last_forward = 0.0
+
+    def append(self, chunk: str) -> None:
+        if not chunk:
+            return
+        now = time.monotonic()
+        if self.first_chunk_seconds is None:
+            self.first_chunk_seconds = now - self._started
+        self._chunks.append(chunk)
+        if now - self._last_forward >= self.min_interval:
+            self._forward(now, done=False)
+
+    def close(self) -> str:
+        """Forward what is left, mark the reply done and return its text."""
+        self._forward(time.monotonic(), done=True)
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def _forward(self, now: float, done: bool) -> None:
+        if self._forwarded == len(self._chunks) and not done:
+            return
+        delta = "".join(self._chunks[self._forwarded :])
+        offset = self._forwarded_length
+        self._forwarded = len(self._chunks)
+        self._forwarded_length += len(delta)
+        self._last_forward = now
+        self.log.apply(
+            DocumentChange(
+                id=self.id,
+                data_type="agent_message_delta",
+                session_id=self.session_id,
+                user_id=self.user_id,
+                document={
+                    "id": self.id,
+                    "session_id": self.session_id,
+                    "user_id": self.user_id,
+                    "source": self.source,
+                    "step_id": self.step_id,
+                    "offset": offset,
+                    "delta": delta,
+                    "done": done,
+                },
+            )
+        )
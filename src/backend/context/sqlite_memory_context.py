@@ -0,0 +1,785 @@
+# sqlite_memory_context.py
+
+import asyncio
+import datetime
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
+from semantic_kernel.memory.memory_record import MemoryRecord
+
+from app_config import config
+from context.embedding_codec import decode_embedding
+from context.memory_context_base import MemoryContextBase
+from context.vector_index import VectorIndex
+from models.messages_kernel import AgentMessage, BaseDataModel, Plan, Session, Step
+from models.merge import merge_plan, merge_step
+from models.serialization import from_document, from_documents, to_document
+
+
+class SQLiteMemoryContext(MemoryContextBase):
+    """A memory context that persists to a local SQLite database.
+
+    Documents are stored as JSON with the fields used for lookups copied into
+    indexed columns, so a single node can run without Cosmos DB. One connection
+    per database file is shared by every context in the process. Statements run
+    on a worker thread through asyncio.to_thread, one at a time under a lock, so
+    they never block the event loop.
+    """
+
+    # Fields of a document stored in their own, indexed columns
+    COLUMNS = ("session_id", "id", "user_id", "data_type", "plan_id", "collection", "key")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            session_id TEXT NOT NULL,
+            id TEXT NOT NULL,
+            user_id TEXT,
+            data_type TEXT,
+            plan_id TEXT,
+            collection TEXT,
+            key TEXT,
+            _ts REAL NOT NULL,
+            body TEXT NOT NULL,
+            PRIMARY KEY (session_id, id)
+        );
+        CREATE INDEX IF NOT EXISTS ix_items_session_type ON items (session_id, data_type);
+        CREATE INDEX IF NOT EXISTS ix_items_user_type_ts ON items (user_id, data_type, _ts);
+        CREATE INDEX IF NOT EXISTS ix_items_plan ON items (plan_id);
+        CREATE INDEX IF NOT EXISTS ix_items_memory ON items (session_id, collection, key);
+    """
+
+    # Shared connections by database path
+    _connections: Dict[str, sqlite3.Connection] = {}
+    _connections_lock = threading.Lock()
+
+    def __init__(
+        self,
+        session_id: str,
+        user_id: str,
+        database_path: Optional[str] = None,
+        buffer_size: int = 100,
+        initial_messages: Optional[List[ChatMessageContent]] = None,
+    ) -> None:
+        self._buffer_size = buffer_size
+        self._messages = initial_messages or []
+        self._database_path = database_path or config.SQLITE_DATABASE_PATH
+        self._connection: Optional[sqlite3.Connection] = None
+        self.session_id = session_id
+        self.user_id = user_id
+
+    async def initialize(self) -> None:
+        """Open the shared connection to the database, creating the schema if needed."""
+        self._connection = await asyncio.to_thread(
+            self._open_connection, self._database_path
+        )
+
+    @classmethod
+    def _open_connection(cls, database_path: str) -> sqlite3.Connection:
+        with cls._connections_lock:
+            connection = cls._connections.get(database_path)
+            if connection is None:
+                connection = sqlite3.connect(database_path, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.executescript(cls.SCHEMA)
+                cls._connections[database_path] = connection
+                logging.info(f"Opened SQLite memory store at {database_path}")
+            return connection
+
+    async def ensure_initialized(self) -> None:
+        """Ensure that the database connection is open."""
+        if self._connection is None:
+            await self.initialize()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Close every shared connection. Called once on application shutdown."""
+        with cls._connections_lock:
+            for connection in cls._connections.values():
+                connection.close()
+            cls._connections.clear()
+
+    async def close(self) -> None:
+        """Release this context. The shared connection stays open."""
+        self._connection = None
+
+    # Storage primitives
+
+    def _fetch_rows(self, statement: str, parameters: Any) -> List[Tuple[Any, ...]]:
+        with self._connections_lock:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def _execute_in_transaction(
+        self, statement: str, parameters: Any, many: bool = False
+    ) -> int:
+        with self._connections_lock, self._connection:
+            if many:
+                return self._connection.executemany(statement, parameters).rowcount
+            return self._connection.execute(statement, parameters).rowcount
+
+    async def _fetchall(self, statement: str, parameters: Any = ()) -> List[Tuple[Any, ...]]:
+        """Run a query on a worker thread and return its rows."""
+        return await asyncio.to_thread(self._fetch_rows, statement, parameters)
+
+    async def _execute(self, statement: str, parameters: Any = (), many: bool = False) -> int:
+        """Run a statement in a transaction on a worker thread; returns the rowcount."""
+        return await asyncio.to_thread(
+            self._execute_in_transaction, statement, parameters, many
+        )
+
+    @staticmethod
+    def _to_document(item: BaseDataModel) -> Dict[str, Any]:
+        """Convert a data model to a JSON document."""
+        return to_document(item)
+
+    async def _write(self, documents: Iterable[Dict[str, Any]], create: bool = False) -> None:
+        """Insert documents, or insert-or-update them unless create is set.
+
+        Each document gets a new _etag, as Cosmos DB does. Updates keep the row's insertion order, which listings of steps rely on.
+        """
+        now = time.time()
+        rows = []
+        for document in documents:
+            document["_ts"] = int(now)
+            document["_etag"] = uuid.uuid4().hex
+            rows.append(
+                tuple(
+                    document.get(column) or ("" if column == "session_id" else None)
+                    for column in self.COLUMNS
+                )
+                + (now, json.dumps(document))
+            )
+
+        statement = (
+            "INSERT INTO items (session_id, id, user_id, data_type, plan_id, collection, key, _ts, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        if not create:
+            statement += (
+                " ON CONFLICT (session_id, id) DO UPDATE SET user_id=excluded.user_id, "
+                "data_type=excluded.data_type, plan_id=excluded.plan_id, "
+                "collection=excluded.collection, key=excluded.key, _ts=excluded._ts, "
+                "body=excluded.body"
+            )
+        await self._execute(statement, rows, many=True)
+
+    async def _select(
+        self,
+        where: str,
+        parameters: Any = (),
+        order_by: str = "rowid",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Return the documents matching a WHERE clause over the items table."""
+        statement = f"SELECT body FROM items WHERE {where} ORDER BY {order_by}"
+        if limit is not None:
+            statement += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        rows = await self._fetchall(statement, parameters)
+        return [json.loads(body) for (body,) in rows]
+
+    async def _delete(self, where: str, parameters: Any = ()) -> int:
+        """Delete the rows matching a WHERE clause and return how many were deleted."""
+        return await self._execute(f"DELETE FROM items WHERE {where}", parameters)
+
+    @staticmethod
+    def _validate(documents: List[Dict[str, Any]], model_class: Type[BaseDataModel]):
+        return from_documents(model_class, documents)
+
+    # Query translation
+
+    _QUERY_PATTERN = re.compile(
+        r"^\s*SELECT\s+(?P<projection>.+?)\s+FROM\s+c\b"
+        r"(?:\s+WHERE\s+(?P<where>.+?))?"
+        r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+        r"(?:\s+OFFSET\s+(?P<offset>\S+)\s+LIMIT\s+(?P<limit>\S+))?\s*$",
+        re.IGNORECASE | re.DOTALL,
+    )
+
+    def _translate_field(self, match: "re.Match") -> str:
+        field = match.group(1)
+        if field in self.COLUMNS or field == "_ts":
+            return field
+        return f"json_extract(body, '$.{field}')"
+
+    def _translate_query(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, Any], Optional[List[str]]]:
+        """Translate the Cosmos DB SQL subset used by this app into SQLite.
+
+        Supports SELECT * or a list of c.fields, WHERE with comparisons and
+        ARRAY_CONTAINS(@param, c.field), ORDER BY and OFFSET/LIMIT.
+
+        Returns:
+            The statement, its named parameters and the projected fields (None for *)
+        """
+        match = self._QUERY_PATTERN.match(query)
+        if match is None:
+            raise ValueError(f"Unsupported query for the SQLite memory store: {query}")
+
+        projection = match.group("projection").strip()
+        fields = None
+        if projection != "*":
+            fields = [field.strip() for field in projection.split(",")]
+            if not all(re.fullmatch(r"c\.\w+", field) for field in fields):
+                raise ValueError(f"Unsupported projection for the SQLite memory store: {projection}")
+            fields = [field[2:] for field in fields]
+
+        values = {}
+        for parameter in parameters:
+            value = parameter["value"]
+            values[parameter["name"].lstrip("@")] = (
+                json.dumps(value) if isinstance(value, (list, dict)) else value
+            )
+
+        def translate(expression: str) -> str:
+            expression = re.sub(
+                r"ARRAY_CONTAINS\(\s*@(\w+)\s*,\s*c\.(\w+)\s*\)",
+                lambda m: f"c.{m.group(2)} IN (SELECT value FROM json_each(:{m.group(1)}))",
+                expression,
+                flags=re.IGNORECASE,
+            )
+            expression = re.sub(r"\bc\.(\w+)", self._translate_field, expression)
+            return re.sub(r"@(\w+)", r":\1", expression)
+
+        conditions = []
+        if match.group("where"):
+            conditions.append(f"({translate(match.group('where'))})")
+        if partition_key is not None:
+            conditions.append("session_id = :_partition_key")
+            values["_partition_key"] = partition_key
+        statement = "SELECT body FROM items"
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        order = translate(match.group("order")) if match.group("order") else "rowid"
+        statement += f" ORDER BY {order}"
+        if match.group("limit"):
+            statement += (
+                f" LIMIT {translate(match.group('limit'))}"
+                f" OFFSET {translate(match.group('offset'))}"
+            )
+        return statement, values, fields
+
+    async def _run_query(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        statement, values, fields = self._translate_query(query, parameters, partition_key)
+        rows = await self._fetchall(statement, values)
+        documents = [json.loads(body) for (body,) in rows]
+        if fields is not None:
+            documents = [
+                {field: document[field] for field in fields if field in document}
+                for document in documents
+            ]
+        return documents
+
+    # Data models
+
+    async def add_item(self, item: BaseDataModel) -> None:
+        """Add a data model item to the database."""
+        await self.ensure_initialized()
+        try:
+            document = self._to_document(item)
+            await self._write([document], create=True)
+            item._etag = document["_etag"]
+            await self._publish(document)
+        except Exception as e:
+            logging.exception(f"Failed to add item to SQLite: {e}")
+            raise
+
+    async def update_item(self, item: BaseDataModel) -> None:
+        """Insert or update a data model item in the database."""
+        await self.ensure_initialized()
+        try:
+            document = self._to_document(item)
+            await self._write([document])
+            item._etag = document["_etag"]
+            await self._publish(document)
+        except Exception as e:
+            logging.exception(f"Failed to update item in SQLite: {e}")
+            raise
+
+    async def _read_document(
+        self, item_id: str, partition_key: str
+    ) -> Optional[Dict[str, Any]]:
+        """Read a stored document with its _etag, or None if it does not exist."""
+        await self.ensure_initialized()
+        documents = await self._select("session_id = ? AND id = ?", (partition_key or "", item_id))
+        return documents[0] if documents else None
+
+    async def _replace_if_match(
+        self, document: Dict[str, Any], etag: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a document only if its stored _etag still matches."""
+        now = time.time()
+        document["_ts"] = int(now)
+        document["_etag"] = uuid.uuid4().hex
+        updated = await self._execute(
+            "UPDATE items SET _ts = ?, body = ? WHERE session_id = ? AND id = ? "
+            "AND json_extract(body, '$._etag') IS ?",
+            (now, json.dumps(document), document.get("session_id") or "", document["id"], etag),
+        )
+        return document if updated else None
+
+    async def get_item_by_id(
+        self, item_id: str, partition_key: str, model_class: Type[BaseDataModel]
+    ) -> Optional[BaseDataModel]:
+        """Retrieve an item by its ID and session ID."""
+        await self.ensure_initialized()
+        documents = await self._select("session_id = ? AND id = ?", (partition_key or "", item_id))
+        return from_document(model_class, documents[0]) if documents else None
+
+    async def query_items(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        model_class: Type[BaseDataModel],
+        partition_key: Optional[str] = None,
+    ) -> List[BaseDataModel]:
+        """Run a Cosmos DB SQL style query and return a list of model instances."""
+        await self.ensure_initialized()
+        try:
+            return self._validate(
+                await self._run_query(query, parameters, partition_key), model_class
+            )
+        except Exception as e:
+            logging.exception(f"Failed to query items from SQLite: {e}")
+            return []
+
+    async def _query_documents(
+        self,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a Cosmos DB SQL style query and return the raw documents."""
+        await self.ensure_initialized()
+        return await self._run_query(query, parameters, partition_key)
+
+    async def get_session(self, session_id: str) -> Optional[Session]:
+        """Retrieve a session by session_id."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "id = ? AND data_type = 'session'", (session_id,), limit=1
+        )
+        return from_document(Session, documents[0]) if documents else None
+
+    async def get_all_sessions(self) -> List[Session]:
+        """Retrieve all sessions."""
+        await self.ensure_initialized()
+        return self._validate(await self._select("data_type = 'session'"), Session)
+
+    async def add_plan(self, plan: Plan) -> None:
+        """Add a plan to the database."""
+        await self.add_item(plan)
+        await self._add_plan_aggregate(plan)
+
+    async def update_plan(self, plan: Plan) -> None:
+        """Update an existing plan, merging concurrent updates (see merge_plan)."""
+        await self.ensure_initialized()
+        await self._update_with_merge(plan, merge_plan)
+        await self._update_aggregate_plan(plan)
+
+    async def get_plan_by_session(self, session_id: str) -> Optional[Plan]:
+        """Retrieve the plan of a session."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "session_id = ? AND data_type = 'plan' AND user_id = ?",
+            (session_id, self.user_id),
+            limit=1,
+        )
+        return from_document(Plan, documents[0]) if documents else None
+
+    async def get_plan(self, plan_id: str) -> Optional[Plan]:
+        """Retrieve a plan of the current session by its ID."""
+        return await self.get_item_by_id(
+            plan_id, partition_key=self.session_id, model_class=Plan
+        )
+
+    async def get_all_plans(self, limit: int = 5) -> List[Plan]:
+        """Retrieve the most recently updated plans of the current user."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "user_id = ? AND data_type = 'plan'",
+            (self.user_id,),
+            order_by="_ts DESC",
+            limit=limit,
+        )
+        return self._validate(documents, Plan)
+
+    async def iter_all_plans(
+        self, continuation_token: Optional[str] = None, page_size: int = 5
+    ) -> AsyncIterator[Tuple[Plan, Optional[str]]]:
+        """Yield the current user's plans, most recently updated first.
+
+        Pages are read with keyset pagination on (_ts, rowid), which the
+        continuation token records.
+        """
+        position = self._decode_continuation(continuation_token)
+        await self.ensure_initialized()
+        last_ts, last_rowid = position.get("ts"), position.get("r")
+        while True:
+            rows = await self._fetchall(
+                "SELECT rowid, _ts, body FROM items "
+                "WHERE user_id = ? AND data_type = 'plan' "
+                "AND (? IS NULL OR _ts < ? OR (_ts = ? AND rowid < ?)) "
+                "ORDER BY _ts DESC, rowid DESC LIMIT ?",
+                (self.user_id, last_ts, last_ts, last_ts, last_rowid, page_size),
+            )
+            for n, (rowid, ts, body) in enumerate(rows):
+                done = len(rows) < page_size and n == len(rows) - 1
+                token = None if done else self._encode_continuation({"ts": ts, "r": rowid})
+                yield from_document(Plan, json.loads(body)), token
+            if len(rows) < page_size:
+                return
+            last_ts, last_rowid = rows[-1][1], rows[-1][0]
+
+    async def add_step(self, step: Step) -> None:
+        """Add a step to the database."""
+        await self.add_item(step)
+        await self._update_aggregate_step(step)
+
+    async def update_step(self, step: Step) -> None:
+        """Update an existing step, merging concurrent updates (see merge_step)."""
+        await self.ensure_initialized()
+        await self._update_with_merge(step, merge_step)
+        await self._update_aggregate_step(step)
+
+    async def get_steps_by_plan(
+        self, plan_id: str, session_id: Optional[str] = None
+    ) -> List[Step]:
+        """Retrieve all steps of a plan in the order they were added."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "plan_id = ? AND data_type = 'step' AND user_id = ?",
+            (plan_id, self.user_id),
+        )
+        return self._validate(documents, Step)
+
+    async def get_agent_messages_by_session(
+        self, session_id: str
+    ) -> List[AgentMessage]:
+        """Retrieve the agent messages of a session, oldest first."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "session_id = ? AND data_type = 'agent_message'",
+            (session_id,),
+            order_by="_ts, rowid",
+        )
+        return self._validate(documents, AgentMessage)
+
+    async def get_data_by_type(self, data_type: str) -> List[BaseDataModel]:
+        """Retrieve the current session's items of a data type, oldest first."""
+        await self.ensure_initialized()
+        model_class = self.MODEL_CLASS_MAPPING.get(data_type, BaseDataModel)
+        documents = await self._select(
+            "session_id = ? AND data_type = ? AND user_id = ?",
+            (self.session_id, data_type, self.user_id),
+            order_by="_ts, rowid",
+        )
+        return self._validate(documents, model_class)
+
+    async def delete_item(self, item_id: str, partition_key: str) -> None:
+        """Delete an item by its ID and session ID."""
+        await self.ensure_initialized()
+        await self._delete("session_id = ? AND id = ?", (partition_key or "", item_id))
+        await self._record_deletion(session_id=partition_key, item_ids=[item_id])
+
+    async def bulk_delete(
+        self,
+        data_types: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Delete every item of the current user with one of the given data types.
+
+        Runs as a single DELETE statement; concurrency is accepted for
+        interface compatibility and ignored.
+        """
+        await self.ensure_initialized()
+        deleted = await self._delete(
+            "user_id = ? AND data_type IN (SELECT value FROM json_each(?))",
+            (self.user_id, json.dumps(data_types)),
+        )
+        if on_progress:
+            on_progress(deleted, deleted)
+        await self._record_deletion(data_types=data_types)
+        return {"total": deleted, "deleted": deleted, "failed": 0}
+
+    async def get_all_messages(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retrieve the current user's most recently updated items."""
+        await self.ensure_initialized()
+        return await self._select(
+            "user_id = ?", (self.user_id,), order_by="_ts DESC", limit=limit
+        )
+
+    async def iter_all_messages(
+        self, continuation_token: Optional[str] = None, page_size: int = 100
+    ) -> AsyncIterator[Tuple[Dict[str, Any], Optional[str]]]:
+        """Yield the current user's items, newest first, page by page.
+
+        Pages are read with keyset pagination on rowid, which the continuation
+        token records.
+        """
+        position = self._decode_continuation(continuation_token)
+        await self.ensure_initialized()
+        last_rowid = position.get("r")
+        while True:
+            rows = await self._fetchall(
+                "SELECT rowid, body FROM items WHERE user_id = ? "
+                "AND (? IS NULL OR rowid < ?) ORDER BY rowid DESC LIMIT ?",
+                (self.user_id, last_rowid, last_rowid, page_size),
+            )
+            for n, (rowid, body) in enumerate(rows):
+                done = len(rows) < page_size and n == len(rows) - 1
+                token = None if done else self._encode_continuation({"r": rowid})
+                yield json.loads(body), token
+            if len(rows) < page_size:
+                return
+            last_rowid = rows[-1][0]
+
+    # Chat messages
+
+    async def add_message(self, message: ChatMessageContent) -> None:
+        """Add a message to the memory and save it to the database."""
+        await self.ensure_initialized()
+        self._messages.append(message)
+        # Ensure buffer size is maintained
+        while len(self._messages) > self._buffer_size:
+            self._messages.pop(0)
+
+        await self._write(
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "session_id": self.session_id,
+                    "user_id": self.user_id,
+                    "data_type": "message",
+                    "content": {
+                        "role": message.role.value,
+                        "content": message.content,
+                        "metadata": message.metadata,
+                    },
+                    "source": message.metadata.get("source", ""),
+                }
+            ],
+            create=True,
+        )
+
+    async def get_messages(self) -> List[ChatMessageContent]:
+        """Get recent messages for the session."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "session_id = ? AND data_type = 'message'",
+            (self.session_id,),
+            order_by="_ts, rowid",
+            limit=self._buffer_size,
+        )
+        roles = {
+            "user": AuthorRole.USER,
+            "system": AuthorRole.SYSTEM,
+            "tool": AuthorRole.TOOL,
+        }
+        messages = []
+        for document in documents:
+            content = document.get("content", {})
+            messages.append(
+                ChatMessageContent(
+                    role=roles.get(content.get("role", "user"), AuthorRole.ASSISTANT),
+                    content=content.get("content", ""),
+                    metadata=content.get("metadata", {}),
+                )
+            )
+        return messages
+
+    def get_chat_history(self) -> ChatHistory:
+        """Convert the buffered messages to a ChatHistory object."""
+        history = ChatHistory()
+        for message in self._messages:
+            history.add_message(message)
+        return history
+
+    async def save_chat_history(self, history: ChatHistory) -> None:
+        """Save a ChatHistory object to the store."""
+        for message in history.messages:
+            await self.add_message(message)
+
+    # Memory records
+
+    async def create_collection(self, collection_name: str) -> None:
+        """Collections are implicit; records carry their collection name."""
+        await self.ensure_initialized()
+
+    async def get_collections(self) -> List[str]:
+        """Get all collections of the current session."""
+        await self.ensure_initialized()
+        rows = await self._fetchall(
+            "SELECT DISTINCT collection FROM items "
+            "WHERE session_id = ? AND data_type = 'memory'",
+            (self.session_id,),
+        )
+        return [collection for (collection,) in rows if collection is not None]
+
+    async def does_collection_exist(self, collection_name: str) -> bool:
+        """Check if a collection exists."""
+        return collection_name in await self.get_collections()
+
+    async def delete_collection(self, collection_name: str) -> None:
+        """Delete a collection."""
+        await self.ensure_initialized()
+        self._vector_indexes.invalidate((self.session_id, collection_name))
+        await self._delete(
+            "session_id = ? AND collection = ? AND data_type = 'memory'",
+            (self.session_id, collection_name),
+        )
+        await self._record_deletion(
+            session_id=self.session_id, data_types=["memory"], collection=collection_name
+        )
+
+    async def _select_memory(
+        self, collection: str, keys: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        where = "session_id = ? AND collection = ? AND data_type = 'memory'"
+        parameters: Tuple[Any, ...] = (self.session_id, collection)
+        if keys is not None:
+            where += " AND key IN (SELECT value FROM json_each(?))"
+            parameters += (json.dumps(keys),)
+        return await self._select(where, parameters)
+
+    async def upsert_memory_record(self, collection: str, record: MemoryRecord) -> str:
+        """Store a memory record."""
+        return (await self.upsert_batch(collection, [record]))[0]
+
+    async def upsert_batch(
+        self, collection_name: str, records: List[MemoryRecord]
+    ) -> List[str]:
+        """Upsert a batch of memory records in one transaction. Ids keep input order."""
+        await self.ensure_initialized()
+        documents = [self._memory_document(collection_name, record) for record in records]
+        await self._write(documents)
+
+        index = self._get_loaded_vector_index(collection_name)
+        if index is not None:
+            for document in documents:
+                self._index_memory_document(index, document)
+        return [document["id"] for document in documents]
+
+    async def get_memory_record(
+        self, collection: str, key: str, with_embedding: bool = False
+    ) -> Optional[MemoryRecord]:
+        """Retrieve a memory record."""
+        records = await self.get_batch(collection, [key], with_embedding)
+        return records[0] if records else None
+
+    async def get_batch(
+        self, collection_name: str, keys: List[str], with_embeddings: bool = False
+    ) -> List[MemoryRecord]:
+        """Get a batch of memory records in the order of keys, skipping missing ones."""
+        await self.ensure_initialized()
+        documents = {
+            document["key"]: document
+            for document in await self._select_memory(collection_name, keys)
+        }
+        results = []
+        for key in keys:
+            document = documents.get(key)
+            if document is None:
+                continue
+            embedding = (
+                decode_embedding(document.get("embedding")) if with_embeddings else None
+            )
+            results.append(self._to_memory_record(document, embedding))
+        return results
+
+    async def remove_memory_record(self, collection: str, key: str) -> None:
+        """Remove a memory record."""
+        await self.remove_batch(collection, [key])
+
+    async def remove_batch(self, collection_name: str, keys: List[str]) -> None:
+        """Remove a batch of memory records in one statement."""
+        await self.ensure_initialized()
+        index = self._get_loaded_vector_index(collection_name)
+        if index is not None:
+            for document in await self._select_memory(collection_name, keys):
+                index.remove(document["id"])
+        await self._delete(
+            "session_id = ? AND collection = ? AND data_type = 'memory' "
+            "AND key IN (SELECT value FROM json_each(?))",
+            (self.session_id, collection_name, json.dumps(keys)),
+        )
+
+    async def get_memory_records(
+        self, collection: str, limit: int = 1000, with_embeddings: bool = False
+    ) -> List[MemoryRecord]:
+        """Get the most recently updated memory records of a collection."""
+        await self.ensure_initialized()
+        documents = await self._select(
+            "session_id = ? AND collection = ? AND data_type = 'memory'",
+            (self.session_id, collection),
+            order_by="_ts DESC",
+            limit=limit,
+        )
+        return [
+            self._to_memory_record(
+                document,
+                decode_embedding(document.get("embedding")) if with_embeddings else None,
+            )
+            for document in documents
+        ]
+
+    async def upsert_async(self, collection_name: str, record: Dict[str, Any]) -> str:
+        """Helper method to insert documents directly."""
+        await self.ensure_initialized()
+        try:
+            record.setdefault("session_id", self.session_id)
+            record.setdefault("id", str(uuid.uuid4()))
+            await self._write([json.loads(json.dumps(record, default=_json_default))])
+            return record["id"]
+        except Exception as e:
+            logging.exception(f"Failed to upsert item to SQLite: {e}")
+            return ""
+
+    async def _build_vector_index(self, collection: str) -> VectorIndex:
+        """Load every record of a collection into an exact index."""
+        index = VectorIndex()
+        self._index_memory_documents(index, await self._select_memory(collection))
+        return index
+
+    async def _get_memory_watermark(self, collection: str) -> Dict[str, Any]:
+        """Return the record count and last modification time of a collection."""
+        await self.ensure_initialized()
+        ((count, max_ts),) = await self._fetchall(
+            "SELECT COUNT(*), MAX(_ts) FROM items "
+            "WHERE session_id = ? AND collection = ? AND data_type = 'memory'",
+            (self.session_id, collection),
+        )
+        return {"count": count, "max_ts": max_ts}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
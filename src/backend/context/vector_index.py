@@ -0,0 +1,168 @@
+# vector_index.py
+
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+def top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Return the positions of the limit highest scores, best first."""
+    if limit < scores.shape[0]:
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """An exact cosine-similarity index over one memory collection.
+
+    Embeddings are normalized once on insert and kept in a contiguous float32
+    matrix, so a query is a single matrix-vector product followed by a top-k
+    selection with argpartition. Each row carries an id and an arbitrary payload.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, initial_capacity: int = 64) -> None:
+        self.dimension = dimension
+        self._initial_capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[Hashable] = []
+        self._payloads: List[Any] = []
+        self._positions: Dict[Hashable, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._positions
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _normalize_query(self, embedding: np.ndarray) -> np.ndarray:
+        query = self._normalize(embedding)
+        if query.shape[0] != self.dimension:
+            raise ValueError(
+                f"Query dimension {query.shape[0]} does not match index "
+                f"dimension {self.dimension}"
+            )
+        return query
+
+    def _ensure_capacity(self, size: int) -> None:
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, size)
+            self._matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        elif size > self._matrix.shape[0]:
+            capacity = max(self._matrix.shape[0] * 2, size)
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[: len(self._ids)] = self._matrix[: len(self._ids)]
+            self._matrix = grown
+
+    def upsert(self, item_id: Hashable, embedding: np.ndarray, payload: Any = None) -> None:
+        """Insert or replace the embedding and payload stored under item_id."""
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vector.shape[0]
+            if vector.shape[0] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vector.shape[0]} does not match index "
+                    f"dimension {self.dimension}"
+                )
+
+            position = self._positions.get(item_id)
+            if position is None:
+                position = len(self._ids)
+                self._ensure_capacity(position + 1)
+                self._ids.append(item_id)
+                self._payloads.append(payload)
+                self._positions[item_id] = position
+            else:
+                self._payloads[position] = payload
+            self._matrix[position] = vector
+
+    def upsert_many(
+        self, item_ids: List[Hashable], embeddings: np.ndarray, payloads: List[Any]
+    ) -> None:
+        """Insert or replace the rows of a (count, dimension) embedding matrix.
+
+        The matrix is normalized in one pass and, when none of the ids are in
+        the index yet, copied into the index without per-row work.
+        """
+        if not len(item_ids):
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        vectors = embeddings / np.where(norms > 0, norms, 1)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            new_ids = not any(item_id in self._positions for item_id in item_ids)
+            if not new_ids or len(set(item_ids)) != len(item_ids):
+                for item_id, vector, payload in zip(item_ids, vectors, payloads):
+                    self.upsert(item_id, vector, payload)
+                return
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match index "
+                    f"dimension {self.dimension}"
+                )
+
+            start = len(self._ids)
+            self._ensure_capacity(start + len(item_ids))
+            self._matrix[start : start + len(item_ids)] = vectors
+            self._ids.extend(item_ids)
+            self._payloads.extend(payloads)
+            for offset, item_id in enumerate(item_ids):
+                self._positions[item_id] = start + offset
+
+    def remove(self, item_id: Hashable) -> bool:
+        """Remove item_id by moving the last row into its slot. Returns whether it existed."""
+        with self._lock:
+            position = self._positions.pop(item_id, None)
+            if position is None:
+                return False
+
+            last = len(self._ids) - 1
+            if position != last:
+                moved_id = self._ids[last]
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = moved_id
+                self._payloads[position] = self._payloads[last]
+                self._positions[moved_id] = position
+            self._ids.pop()
+            self._payloads.pop()
+            return True
+
+    def get(self, item_id: Hashable) -> Optional[Tuple[Any, np.ndarray]]:
+        """Return the payload and normalized embedding stored under item_id."""
+        with self._lock:
+            position = self._positions.get(item_id)
+            if position is None:
+                return None
+            return self._payloads[position], self._matrix[position].copy()
+
+    def search(
+        self, embedding: np.ndarray, limit: int = 1, min_relevance_score: float = 0.0
+    ) -> List[Tuple[Hashable, Any, float]]:
+        """Return up to limit (id, payload, score) tuples, best first.
+
+        Only rows whose cosine similarity is at least min_relevance_score are returned.
+        """
+        with self._lock:
+            size = len(self._ids)
+            if size == 0 or limit <= 0:
+                return []
+
+            query = self._normalize_query(embedding)
+            scores = self._matrix[:size] @ query
+            return [
+                (self._ids[position], self._payloads[position], float(scores[position]))
+                for position in top_k(scores, limit)
+                if scores[position] >= min_relevance_score
+            ]
@@ -0,0 +1,131 @@
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import Depends, HTTPException, Request
+
+from admission import AdmissionRejected, admission_controller
+from app_config import config
+from auth.auth_utils import get_authenticated_user_details
+from context.memory_context_base import MemoryContextBase
+from context.memory_factory import create_memory_context
+from event_utils import track_event_if_configured
+
+
+class AppResources:
+    """Clients shared by every request, owned by the application lifespan.
+
+    The AI project client is created on first use and lives until shutdown
+    instead of being built for each request.
+    """
+
+    def __init__(self) -> None:
+        self._ai_project_client: Optional[Any] = None
+
+    @property
+    def ai_project_client(self) -> Optional[Any]:
+        """The shared AIProjectClient, or None if it cannot be created."""
+        if self._ai_project_client is None:
+            try:
+                self._ai_project_client = config.get_ai_project_client()
+            except Exception as e:
+                logging.error(f"Error creating AIProjectClient: {e}")
+        return self._ai_project_client
+
+    def memory_store(self, session_id: str, user_id: str) -> MemoryContextBase:
+        """A memory context for a session of a user, backed by the pooled store client."""
+        return create_memory_context(session_id, user_id)
+
+    async def close(self) -> None:
+        self._ai_project_client = None
+        await config.close_ai_project_client()
+
+
+class RequestScope:
+    """What an endpoint needs for one request of an authenticated user.
+
+    Memory contexts are created on first use, one per session, and flushed
+    when the request ends. They stay open because cached agents keep using
+    them; the pooled clients behind them are closed by the lifespan. Read
+    endpoints that never ask for the AI project client do not touch it.
+    """
+
+    def __init__(self, resources: AppResources, user_id: str) -> None:
+        self.resources = resources
+        self.user_id = user_id
+        self._memory_stores: Dict[str, MemoryContextBase] = {}
+
+    def memory_store(self, session_id: str = "") -> MemoryContextBase:
+        """The current user's memory context for a session."""
+        memory_store = self._memory_stores.get(session_id)
+        if memory_store is None:
+            memory_store = self.resources.memory_store(session_id, self.user_id)
+            self._memory_stores[session_id] = memory_store
+        return memory_store
+
+    @property
+    def ai_project_client(self) -> Optional[Any]:
+        return self.resources.ai_project_client
+
+    async def close(self) -> None:
+        for memory_store in self._memory_stores.values():
+            try:
+                await memory_store.flush()
+            except Exception as e:
+                logging.exception(f"Failed to flush memory context: {e}")
+        self._memory_stores.clear()
+
+
+def get_resources(request: Request) -> AppResources:
+    """The AppResources created by the application lifespan."""
+    return request.app.state.resources
+
+
+def get_user_id(request: Request) -> str:
+    """The authenticated user's id; 400 if the request carries none."""
+    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
+    user_id = authenticated_user["user_principal_id"]
+    if not user_id:
+        track_event_if_configured(
+            "UserIdNotFound", {"status_code": 400, "detail": "no user"}
+        )
+        raise HTTPException(status_code=400, detail="no user")
+    return user_id
+
+
+async def get_request_scope(
+    user_id: str = Depends(get_user_id),
+    resources: AppResources = Depends(get_resources),
+) -> AsyncIterator[RequestScope]:
+    """Hand out a RequestScope and flush its memory contexts after the request."""
+    scope = RequestScope(resources, user_id)
+    try:
+        yield scope
+    finally:
+        await scope.close()
+
+
+def not_admitted(user_id: str, error: AdmissionRejected) -> HTTPException:
+    """The response to a rejected request: 503 if the server is full, else 429."""
+    track_event_if_configured(
+        "RequestNotAdmitted",
+        {"user_id": user_id, "reason": error.reason, "retry_after": error.retry_after},
+    )
+    return HTTPException(
+        status_code=503 if error.reason == "registry_full" else 429,
+        detail="Service unavailable" if error.reason == "registry_full" else "Too many requests",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+async def admit_request(user_id: str = Depends(get_user_id)) -> AsyncIterator[None]:
+    """Hold an admission slot for the request; 429 with Retry-After if none is free."""
+    try:
+        await admission_controller.acquire(user_id)
+    except AdmissionRejected as e:
+        raise not_admitted(user_id, e)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        admission_controller.release(user_id, time.monotonic() - started)
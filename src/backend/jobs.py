@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import math
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from admission import AdmissionRejected
+from models.messages_kernel import Job, JobStatus
+
+
+class JobRegistry:
+    """In-process registry of background jobs started by the API.
+
+    Jobs run as asyncio tasks; the registry keeps the most recent ones so that
+    clients can poll their progress. A kind of job can be given a concurrency
+    limit, in which case its jobs stay queued until one of its workers is free.
+    The queue of a kind and the unfinished jobs of a user can be bounded, and
+    queued and running jobs count toward max_jobs, so a submit beyond any of
+    these limits raises AdmissionRejected instead of starting a task.
+    """
+
+    def __init__(self, max_jobs: int = 1000) -> None:
+        self._max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._workers: Dict[str, asyncio.Semaphore] = {}
+        self._worker_limits: Dict[str, int] = {}
+        self._max_queue: Dict[str, int] = {}
+        self._max_per_user: Dict[str, int] = {}
+        self._queued: Dict[str, int] = defaultdict(int)
+        self._unfinished_by_user: Dict[Tuple[str, str], int] = defaultdict(int)
+        # Moving average of how long a job of each kind runs
+        self._run_seconds: Dict[str, float] = defaultdict(lambda: 1.0)
+
+    def set_concurrency(
+        self, kind: str, limit: int, max_queue: int = 0, max_per_user: int = 0
+    ) -> None:
+        """Limit the jobs of a kind; a limit of 0 disables it.
+
+        Args:
+            kind: Short name of the job type
+            limit: Jobs of the kind that run at a time
+            max_queue: Jobs of the kind that may wait for a worker
+            max_per_user: Queued and running jobs of the kind per user
+        """
+        if limit > 0:
+            self._workers[kind] = asyncio.Semaphore(limit)
+            self._worker_limits[kind] = limit
+        else:
+            self._workers.pop(kind, None)
+            self._worker_limits.pop(kind, None)
+        self._max_queue[kind] = max_queue
+        self._max_per_user[kind] = max_per_user
+
+    def retry_after(self, kind: str) -> int:
+        """Seconds after which a rejected job of a kind is likely to be accepted."""
+        rounds = (self._queued[kind] + 1) / self._worker_limits.get(kind, 1)
+        return max(1, math.ceil(rounds * self._run_seconds[kind]))
+
+    def _check_admission(self, kind: str, user_id: str) -> None:
+        self._evict_finished()
+        if len(self._jobs) >= self._max_jobs:
+            raise AdmissionRejected("registry_full", self.retry_after(kind))
+        max_queue = self._max_queue.get(kind, 0)
+        if max_queue and self._queued[kind] >= max_queue:
+            raise AdmissionRejected("queue_full", self.retry_after(kind))
+        max_per_user = self._max_per_user.get(kind, 0)
+        if max_per_user and self._unfinished_by_user[(kind, user_id)] >= max_per_user:
+            raise AdmissionRejected("user_queue_full", self.retry_after(kind))
+
+    def submit(
+        self,
+        kind: str,
+        user_id: str,
+        work: Callable[[Job], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Job:
+        """Register a job and start running it in the background.
+
+        Args:
+            kind: Short name of the job type
+            user_id: The user that owns the job
+            work: Coroutine function receiving the job to report progress on;
+                its return value becomes the job result
+
+        Returns:
+            The queued job
+
+        Raises:
+            AdmissionRejected: The registry is full of unfinished jobs, the
+                queue of the kind is full or the user has too many jobs of it
+        """
+        self._check_admission(kind, user_id)
+        job = Job(kind=kind, user_id=user_id)
+        self._jobs[job.id] = job
+        self._queued[kind] += 1
+        self._unfinished_by_user[(kind, user_id)] += 1
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(
+            self._run(job, work)
+        )
+        return job
+
+    async def _run(
+        self, job: Job, work: Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> None:
+        workers = self._workers.get(job.kind)
+        waiting = True
+        try:
+            if workers is not None:
+                await workers.acquire()
+            self._queued[job.kind] -= 1
+            waiting = False
+            try:
+                await self._execute(job, work)
+            finally:
+                if workers is not None:
+                    workers.release()
+            self._run_seconds[job.kind] = (
+                0.8 * self._run_seconds[job.kind] + 0.2 * (job.run_seconds or 0.0)
+            )
+        finally:
+            if waiting:
+                # Cancelled before a worker was free
+                self._queued[job.kind] -= 1
+            key = (job.kind, job.user_id)
+            self._unfinished_by_user[key] -= 1
+            if not self._unfinished_by_user[key]:
+                del self._unfinished_by_user[key]
+            self._tasks.pop(job.id, None)
+
+    @staticmethod
+    async def _execute(
+        job: Job, work: Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> None:
+        job.status = JobStatus.running
+        job.started_at = datetime.now(timezone.utc)
+        job.queue_seconds = (job.started_at - job.created_at).total_seconds()
+        try:
+            job.result = await work(job)
+            job.status = JobStatus.completed
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.error = str(e)
+            job.status = JobStatus.failed
+        finally:
+            job.completed_at = datetime.now(timezone.utc)
+            job.run_seconds = (job.completed_at - job.started_at).total_seconds()
+
+    def get(self, job_id: str, user_id: str) -> Optional[Job]:
+        """Return a job if it exists and belongs to the user."""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def _evict_finished(self) -> None:
+        """Drop the oldest finished jobs to make room for one more job."""
+        overflow = len(self._jobs) - self._max_jobs + 1
+        for job_id in list(self._jobs.keys()):
+            if overflow <= 0:
+                break
+            if self._jobs[job_id].status in (JobStatus.completed, JobStatus.failed):
+                del self._jobs[job_id]
+                overflow -= 1
+
+    async def shutdown(self) -> None:
+        """Cancel jobs that are still running."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Create a global job registry
+job_registry = JobRegistry()
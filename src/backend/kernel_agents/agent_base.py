@@ -14,6 +14,7 @@ from semantic_kernel.agents import AzureAIAgentThread
 # Import the new AppConfig instance
 from app_config import config
 from context.cosmos_memory_kernel import CosmosMemoryContext
+from context.session_events import AgentReplyStream
 from event_utils import track_event_if_configured
 from models.messages_kernel import (
     ActionRequest,
@@ -115,6 +116,48 @@ class BaseAgent(AzureAIAgent):
         # Tools are registered with the kernel via get_tools_from_config
         return self
 
+    async def _invoke_agent(
+        self, session_id: str, step_id: Optional[str] = None, **kwargs: Any
+    ) -> str:
+        """Run the Azure AI agent and return its reply.
+
+        With AGENT_STREAMING_ENABLED the reply is streamed, and its chunks are
+        forwarded to the session's event stream as they arrive.
+
+        Args:
+            session_id: The session the reply belongs to
+            step_id: The step the reply is for, if any
+            **kwargs: Arguments for the agent's invoke or invoke_stream
+
+        Returns:
+            The text of the reply
+        """
+        if not config.AGENT_STREAMING_ENABLED:
+            chunks = []
+            async for chunk in self._agent.invoke(**kwargs):
+                if chunk is not None:
+                    chunks.append(str(chunk))
+            return "".join(chunks)
+
+        reply = AgentReplyStream(session_id, self._user_id, self._agent_name, step_id)
+        try:
+            async for chunk in self._agent.invoke_stream(**kwargs):
+                if chunk is not None:
+                    reply.append(str(chunk))
+        finally:
+            response_content = reply.close()
+        track_event_if_configured(
+            "Agent reply streamed",
+            {
+                "session_id": session_id,
+                "source": self._agent_name,
+                "step_id": step_id,
+                "first_chunk_seconds": reply.first_chunk_seconds,
+                "length": len(response_content),
+            },
+        )
+        return response_content
+
     async def handle_action_request(self, action_request: ActionRequest) -> str:
         """Handle an action request from another agent or the system.
 
@@ -160,18 +203,13 @@ class BaseAgent(AzureAIAgent):
             # thread = self.client.agents.get_thread(
             #     thread=step.session_id
             # )  # AzureAIAgentThread(thread_id=step.session_id)
-            async_generator = self._agent.invoke(
+            response_content = await self._invoke_agent(
+                action_request.session_id,
+                step_id=action_request.step_id,
                 messages=f"{str(self._chat_history)}\n\nPlease perform this action",
                 thread=thread,
             )
 
-            response_content = ""
-
-            # Collect the response from the async generator
-            async for chunk in async_generator:
-                if chunk is not None:
-                    response_content += str(chunk)
-
             logging.info(f"Response content length: {len(response_content)}")
             logging.info(f"Response content: {response_content}")
 
@@ -23,10 +23,12 @@ from kernel_agents.procurement_agent import ProcurementAgent
 from kernel_agents.product_agent import ProductAgent
 from kernel_agents.planner_agent import PlannerAgent  # Add PlannerAgent import
 from kernel_agents.group_chat_manager import GroupChatManager
+from kernel_agents.sdg_agent import SDGAgent
 from kernel_tools.sdg_tools import SDGTools
 
 from semantic_kernel.prompt_template.prompt_template_config import PromptTemplateConfig
-from context.cosmos_memory_kernel import CosmosMemoryContext
+from context.memory_context_base import MemoryContextBase
+from context.memory_factory import create_memory_context
 from models.messages_kernel import PlannerResponsePlan, AgentType
 
 from azure.ai.projects.models import (
@@ -95,7 +97,7 @@ class AgentFactory:
         session_id: str,
         user_id: str,
         temperature: float = 0.0,
-        memory_store: Optional[CosmosMemoryContext] = None,
+        memory_store: Optional[MemoryContextBase] = None,
         system_message: Optional[str] = None,
         response_format: Optional[Any] = None,
         client: Optional[Any] = None,
@@ -146,7 +148,7 @@ class AgentFactory:
 
         # Create memory store
         if memory_store is None:
-            memory_store = CosmosMemoryContext(session_id, user_id)
+            memory_store = create_memory_context(session_id, user_id)
 
         # Use default system message if none provided
         if system_message is None:
@@ -242,7 +244,7 @@ class AgentFactory:
         session_id: str,
         user_id: str,
         temperature: float = 0.0,
-        memory_store: Optional[CosmosMemoryContext] = None,
+        memory_store: Optional[MemoryContextBase] = None,
         client: Optional[Any] = None,
     ) -> Dict[AgentType, BaseAgent]:
         """Create all agent types for a session in a specific order.
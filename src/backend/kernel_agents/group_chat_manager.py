@@ -1,8 +1,9 @@
+import asyncio
 import logging
 import json
 from datetime import datetime
 import re
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 
 import semantic_kernel as sk
 from semantic_kernel.functions.kernel_function import KernelFunction
@@ -13,6 +14,7 @@ from semantic_kernel.agents.strategies import (
     TerminationStrategy,
 )
 
+from app_config import config
 from kernel_agents.agent_base import BaseAgent
 from context.cosmos_memory_kernel import CosmosMemoryContext
 from models.messages_kernel import (
@@ -174,7 +176,9 @@ class GroupChatManager(BaseAgent):
         # Need to retrieve all the steps for the plan
         logging.info(f"GroupChatManager Received human feedback: {message}")
 
-        steps: List[Step] = await self._memory_store.get_steps_by_plan(message.plan_id)
+        steps: List[Step] = await self._memory_store.get_steps_by_plan(
+            message.plan_id, session_id=message.session_id
+        )
         # Filter for steps that are planned or awaiting feedback
 
         # Get the first step assigned to HumanAgent for feedback
@@ -226,7 +230,7 @@ class GroupChatManager(BaseAgent):
                     # TODO: Implement this logic later
                     step.status = StepStatus.rejected
                     step.human_approval_status = HumanFeedbackStatus.rejected
-                    self._memory_store.update_step(step)
+                    await self._memory_store.update_step(step)
                     track_event_if_configured(
                         "Group Chat Manager - Steps has been rejected and updated into the cosmos",
                         {
@@ -237,30 +241,137 @@ class GroupChatManager(BaseAgent):
                             "source": step.agent,
                         },
                     )
+        elif message.approved:
+            # Execute all steps, independent ones concurrently
+            await self._execute_steps(
+                message.session_id, steps, received_human_feedback
+            )
         else:
-            # Update and execute all steps if no specific step_id is provided
+            # Reject all steps if no specific step_id is provided
             for step in steps:
                 await self._update_step_status(
                     step, message.approved, received_human_feedback
                 )
-                if message.approved:
-                    await self._execute_step(message.session_id, step)
-                else:
-                    # Notify the GroupChatManager that the step has been rejected
-                    # TODO: Implement this logic later
-                    step.status = StepStatus.rejected
-                    step.human_approval_status = HumanFeedbackStatus.rejected
-                    self._memory_store.update_step(step)
-                    track_event_if_configured(
-                        f"{AgentType.GROUP_CHAT_MANAGER.value} - Step has been rejected and updated into the cosmos",
-                        {
-                            "status": StepStatus.rejected,
-                            "session_id": message.session_id,
-                            "user_id": self._user_id,
-                            "human_approval_status": HumanFeedbackStatus.rejected,
-                            "source": step.agent,
-                        },
+                # Notify the GroupChatManager that the step has been rejected
+                # TODO: Implement this logic later
+                step.status = StepStatus.rejected
+                step.human_approval_status = HumanFeedbackStatus.rejected
+                await self._memory_store.update_step(step)
+                track_event_if_configured(
+                    f"{AgentType.GROUP_CHAT_MANAGER.value} - Step has been rejected and updated into the cosmos",
+                    {
+                        "status": StepStatus.rejected,
+                        "session_id": message.session_id,
+                        "user_id": self._user_id,
+                        "human_approval_status": HumanFeedbackStatus.rejected,
+                        "source": step.agent,
+                    },
+                )
+
+    @staticmethod
+    def _step_dependencies(steps: List[Step]) -> Dict[str, List[str]]:
+        """The ids of the earlier steps each step of a plan waits for.
+
+        Steps list their dependencies in depends_on. A step without it, as
+        in plans made before dependencies were planned, waits for the step
+        before it, so such plans run in order. Dependencies on later or
+        unknown steps are ignored, which keeps the graph acyclic.
+        """
+        dependencies = {}
+        for index, step in enumerate(steps):
+            earlier = [previous.id for previous in steps[:index]]
+            if step.depends_on is None:
+                dependencies[step.id] = earlier[-1:]
+            else:
+                dependencies[step.id] = [
+                    step_id for step_id in step.depends_on if step_id in earlier
+                ]
+        return dependencies
+
+    async def _execute_steps(
+        self, session_id: str, steps: List[Step], received_human_feedback: str
+    ) -> None:
+        """Approve and execute the steps of a plan, independent ones concurrently.
+
+        A step starts once the steps it depends on have completed, and sees
+        their replies, and those of their own dependencies, in its context.
+        At most STEP_CONCURRENCY steps of the plan run at once, and the steps
+        of one agent run one at a time since an agent keeps a single chat
+        history. A step that fails is marked failed, and so are the steps
+        depending on it, which are not executed. Every error is logged, and the
+        first one is raised once the other steps have finished.
+        """
+        dependencies = self._step_dependencies(steps)
+        predecessors: Dict[str, Set[str]] = {}
+        for step in steps:
+            predecessors[step.id] = set(dependencies[step.id])
+            for step_id in dependencies[step.id]:
+                predecessors[step.id] |= predecessors[step_id]
+
+        workers = asyncio.Semaphore(max(1, config.STEP_CONCURRENCY))
+        agent_locks: Dict[str, asyncio.Lock] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        failed: Set[str] = set()
+
+        async def run(step: Step) -> None:
+            await asyncio.gather(
+                *(tasks[step_id] for step_id in dependencies[step.id]),
+                return_exceptions=True,
+            )
+            failed_dependencies = [
+                step_id for step_id in dependencies[step.id] if step_id in failed
+            ]
+            if failed_dependencies:
+                failed.add(step.id)
+                await self._mark_step_failed(
+                    step,
+                    f"Not executed because step(s) {', '.join(failed_dependencies)} failed",
+                )
+                return
+            lock = agent_locks.setdefault(step.agent.value, asyncio.Lock())
+            async with lock, workers:
+                try:
+                    await self._update_step_status(step, True, received_human_feedback)
+                    await self._execute_step(
+                        session_id, step, history_step_ids=predecessors[step.id]
                     )
+                except Exception as e:
+                    failed.add(step.id)
+                    await self._mark_step_failed(step, f"Step failed: {e}")
+                    raise
+
+        for step in steps:
+            tasks[step.id] = asyncio.create_task(run(step))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        errors = []
+        for step_id, result in zip(tasks, results):
+            if isinstance(result, BaseException):
+                logging.error(
+                    f"Step {step_id} of session {session_id} failed: {result}",
+                    exc_info=result,
+                )
+                errors.append(result)
+        if errors:
+            raise errors[0]
+
+    async def _mark_step_failed(self, step: Step, reason: str) -> None:
+        """Record a step as failed with the reason as its reply."""
+        step.status = StepStatus.failed
+        step.agent_reply = reason
+        try:
+            await self._memory_store.update_step(step)
+        except Exception as e:
+            logging.exception(f"Failed to mark step {step.id} as failed: {e}")
+        track_event_if_configured(
+            f"{AgentType.GROUP_CHAT_MANAGER.value} - Step failed",
+            {
+                "status": StepStatus.failed,
+                "session_id": step.session_id,
+                "user_id": self._user_id,
+                "reason": reason,
+                "source": step.agent,
+            },
+        )
 
     # Function to update step status and add feedback
     async def _update_step_status(
@@ -287,9 +398,17 @@ class GroupChatManager(BaseAgent):
             },
         )
 
-    async def _execute_step(self, session_id: str, step: Step):
+    async def _execute_step(
+        self,
+        session_id: str,
+        step: Step,
+        history_step_ids: Optional[Set[str]] = None,
+    ):
         """
         Executes the given step by sending an ActionRequest to the appropriate agent.
+
+        The conversation history given to the agent holds the steps before
+        this one, or only those in history_step_ids when it is set.
         """
         # Update step status to 'action_requested'
         step.status = StepStatus.action_requested
@@ -306,7 +425,9 @@ class GroupChatManager(BaseAgent):
 
         # generate conversation history for the invoked agent
         plan = await self._memory_store.get_plan_by_session(session_id=session_id)
-        steps: List[Step] = await self._memory_store.get_steps_by_plan(plan.id)
+        steps: List[Step] = await self._memory_store.get_steps_by_plan(
+            plan.id, session_id=session_id
+        )
 
         current_step_id = step.id
         # Initialize the formatted string
@@ -324,12 +445,14 @@ class GroupChatManager(BaseAgent):
         )
 
         # Iterate over the steps until the current_step_id
-        for i, step in enumerate(steps):
-            if step.id == current_step_id:
+        for i, previous in enumerate(steps):
+            if previous.id == current_step_id:
                 break
+            if history_step_ids is not None and previous.id not in history_step_ids:
+                continue
             formatted_string += f"Step {i}\n"
-            formatted_string += f"{AgentType.GROUP_CHAT_MANAGER.value}: {step.action}\n"
-            formatted_string += f"{step.agent.value}: {step.agent_reply}\n"
+            formatted_string += f"{AgentType.GROUP_CHAT_MANAGER.value}: {previous.action}\n"
+            formatted_string += f"{previous.agent.value}: {previous.agent_reply}\n"
         formatted_string += "<conversation_history \\>"
 
         logging.info(f"Formatted string: {formatted_string}")
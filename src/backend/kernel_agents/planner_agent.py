@@ -32,13 +32,7 @@ from models.messages_kernel import (
 )
 from event_utils import track_event_if_configured
 from app_config import config
-from kernel_tools.hr_tools import HrTools
-from kernel_tools.generic_tools import GenericTools
-from kernel_tools.marketing_tools import MarketingTools
-from kernel_tools.procurement_tools import ProcurementTools
-from kernel_tools.product_tools import ProductTools
-from kernel_tools.tech_support_tools import TechSupportTools
-from kernel_tools.sdg_tools import SDGTools
+from kernel_tools.tool_catalog import TOOL_CLASSES, tool_catalog
 
 
 class PlannerAgent(BaseAgent):
@@ -104,15 +98,9 @@ class PlannerAgent(BaseAgent):
              AgentType.SDG.value,  # Add this line
             AgentType.GENERIC.value,
         ]
+        # The tool documents are introspected once per process by the catalog
         self._agent_tools_list = {
-            AgentType.HR: HrTools.generate_tools_json_doc(),
-            AgentType.MARKETING: MarketingTools.generate_tools_json_doc(),
-            AgentType.PRODUCT: ProductTools.generate_tools_json_doc(),
-            AgentType.PROCUREMENT: ProcurementTools.generate_tools_json_doc(),
-            AgentType.TECH_SUPPORT: TechSupportTools.generate_tools_json_doc(),
-            AgentType.GENERIC: GenericTools.generate_tools_json_doc(),
-             AgentType.SDG: SDGTools.generate_tools_json_doc(),  # Use the actual SDG tools 
-             
+            agent: tool_catalog.tools_json_doc(agent) for agent in TOOL_CLASSES
         }
 
         self._agent_instances = agent_instances or {}
@@ -337,7 +325,8 @@ class PlannerAgent(BaseAgent):
             # )
             thread = None
             # thread = self.client.agents.create_thread(thread_id=input_task.session_id)
-            async_generator = self._agent.invoke(
+            response_content = await self._invoke_agent(
+                input_task.session_id,
                 arguments=kernel_args,
                 settings={
                     "temperature": 0.0,  # Keep temperature low for consistent planning
@@ -346,14 +335,6 @@ class PlannerAgent(BaseAgent):
                 thread=thread,
             )
 
-            # Call invoke with proper keyword arguments and JSON response schema
-            response_content = ""
-
-            # Collect the response from the async generator
-            async for chunk in async_generator:
-                if chunk is not None:
-                    response_content += str(chunk)
-
             logging.info(f"Response content length: {len(response_content)}")
 
             # Check if response is empty or whitespace
@@ -405,6 +386,13 @@ class PlannerAgent(BaseAgent):
             for step_data in steps_data:
                 action = step_data.action
                 agent_name = step_data.agent
+                depends_on = None
+                if step_data.depends_on is not None:
+                    depends_on = [
+                        steps[index].id
+                        for index in step_data.depends_on
+                        if 0 <= index < len(steps)
+                    ]
 
                 # Validate agent name
                 if agent_name not in self._available_agents:
@@ -423,6 +411,7 @@ class PlannerAgent(BaseAgent):
                     agent=agent_name,
                     status=StepStatus.planned,
                     human_approval_status=HumanFeedbackStatus.requested,
+                    depends_on=depends_on,
                 )
 
                 # Store the step
@@ -596,6 +585,8 @@ class PlannerAgent(BaseAgent):
 
             Limit the plan to 6 steps or less.
 
+            For each step, set depends_on to the numbers of the earlier steps, counting from 0, whose results the step needs. Use an empty list for a step that needs no result of another step. Steps that do not depend on each other are executed at the same time.
+
             Choose from {{$agents_str}} ONLY for planning your steps.
 
             """
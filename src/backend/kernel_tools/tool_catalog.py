@@ -0,0 +1,124 @@
+import hashlib
+import inspect
+import json
+import threading
+from typing import Any, Dict, List, Optional, Type
+
+from kernel_tools.generic_tools import GenericTools
+from kernel_tools.hr_tools import HrTools
+from kernel_tools.marketing_tools import MarketingTools
+from kernel_tools.procurement_tools import ProcurementTools
+from kernel_tools.product_tools import ProductTools
+from kernel_tools.sdg_tools import SDGTools
+from kernel_tools.tech_support_tools import TechSupportTools
+from models.messages_kernel import AgentType
+
+# The tool class of each agent that has tools
+TOOL_CLASSES: Dict[AgentType, Type] = {
+    AgentType.HR: HrTools,
+    AgentType.MARKETING: MarketingTools,
+    AgentType.PRODUCT: ProductTools,
+    AgentType.PROCUREMENT: ProcurementTools,
+    AgentType.TECH_SUPPORT: TechSupportTools,
+    AgentType.GENERIC: GenericTools,
+    AgentType.SDG: SDGTools,
+}
+
+# JSON schema types of the type names generate_tools_json_doc reports
+_SCHEMA_TYPES = {
+    "str": "string",
+    "string": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "boolean": "boolean",
+    "list": "array",
+    "dict": "object",
+}
+
+
+class ToolCatalog:
+    """The tools of every agent, introspected once per process.
+
+    Holds, per agent, the JSON document the planner puts in its prompt, and
+    for every tool a structured entry whose parameters are a JSON schema.
+    version is a hash of the entries, so clients can cache the catalog until
+    a deployment changes the tools.
+    """
+
+    def __init__(self, tool_classes: Optional[Dict[AgentType, Type]] = None) -> None:
+        self._tool_classes = tool_classes if tool_classes is not None else TOOL_CLASSES
+        self._lock = threading.Lock()
+        self._docs: Optional[Dict[AgentType, str]] = None
+        self._tools: List[Dict[str, Any]] = []
+        self._version = ""
+
+    def build(self) -> None:
+        """Introspect the tool classes, unless that was already done."""
+        with self._lock:
+            if self._docs is not None:
+                return
+            docs = {}
+            tools = []
+            for agent, tool_class in self._tool_classes.items():
+                docs[agent] = tool_class.generate_tools_json_doc()
+                for entry in json.loads(docs[agent]):
+                    tools.append(self._structured_entry(tool_class, entry))
+            self._tools = tools
+            self._version = hashlib.sha256(
+                json.dumps(tools, sort_keys=True).encode()
+            ).hexdigest()[:32]
+            self._docs = docs
+
+    @staticmethod
+    def _structured_entry(tool_class: Type, entry: Dict[str, Any]) -> Dict[str, Any]:
+        method = getattr(tool_class, entry["function"])
+        arguments = json.loads(entry["arguments"].replace("'", '"'))
+        signature = inspect.signature(method)
+        properties = {
+            name: {
+                "title": argument["title"],
+                "type": _SCHEMA_TYPES.get(argument["type"], "string"),
+            }
+            for name, argument in arguments.items()
+        }
+        required = [
+            name
+            for name in arguments
+            if name in signature.parameters
+            and signature.parameters[name].default is inspect.Parameter.empty
+        ]
+        return {
+            "agent": entry["agent"],
+            "function": entry["function"],
+            "description": entry["description"]
+            or getattr(method, "__kernel_function_description__", None)
+            or "",
+            "arguments": entry["arguments"],
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+            },
+        }
+
+    @property
+    def tools(self) -> List[Dict[str, Any]]:
+        """Every tool of every agent, with its parameters as a JSON schema."""
+        self.build()
+        return self._tools
+
+    @property
+    def version(self) -> str:
+        """A hash of the tools that changes whenever one of them does."""
+        self.build()
+        return self._version
+
+    def tools_json_doc(self, agent: AgentType) -> str:
+        """The agent's tools as generate_tools_json_doc documents them."""
+        self.build()
+        return self._docs.get(agent, "[]")
+
+
+# Create a global tool catalog
+tool_catalog = ToolCatalog()
@@ -0,0 +1,44 @@
+"""Build the plan aggregate of every session that already has a plan.
+
+Plans and steps written before PLAN_AGGREGATE_ENABLED was set have no
+aggregate, so their sessions keep being read from the plan and step
+documents. This writes the aggregates of all users from those documents in
+the store selected by MEMORY_BACKEND. Running it again rewrites them, so it
+is safe to repeat; run it after enabling aggregates in the application so
+that sessions changed during the migration are patched from then on.
+
+Usage (from src/backend):
+    python -m migrations.plan_aggregates
+"""
+import argparse
+import asyncio
+import logging
+
+from app_config import config
+from context.memory_factory import create_memory_context
+
+
+async def migrate() -> int:
+    """Write the plan aggregates and return how many were written."""
+    async with create_memory_context(session_id="", user_id="") as memory_store:
+
+        def report_progress(total: int, processed: int) -> None:
+            if processed % 100 == 0 or processed == total:
+                logging.info(f"Built plan aggregates for {processed} of {total} sessions")
+
+        written = await memory_store.rebuild_plan_aggregates(on_progress=report_progress)
+        await memory_store.flush()
+    await config.close_cosmos_client()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    written = asyncio.run(migrate())
+    print(f"Wrote {written} plan aggregates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# merge.py
+
+from typing import Dict, Optional, TypeVar
+
+from models.messages_kernel import (
+    HumanFeedbackStatus,
+    Plan,
+    PlanStatus,
+    Step,
+    StepStatus,
+)
+
+# Position of each status in a step's lifecycle. A step only moves forward:
+# planned -> awaiting_feedback -> approved -> action_requested -> completed,
+# and rejected, completed and failed are final.
+STEP_STATUS_RANK: Dict[StepStatus, int] = {
+    StepStatus.planned: 0,
+    StepStatus.awaiting_feedback: 1,
+    StepStatus.approved: 2,
+    StepStatus.action_requested: 3,
+    StepStatus.rejected: 4,
+    StepStatus.completed: 4,
+    StepStatus.failed: 4,
+}
+
+HUMAN_APPROVAL_STATUS_RANK: Dict[Optional[HumanFeedbackStatus], int] = {
+    None: 0,
+    HumanFeedbackStatus.requested: 0,
+    HumanFeedbackStatus.accepted: 1,
+    HumanFeedbackStatus.rejected: 1,
+}
+
+PLAN_STATUS_RANK: Dict[PlanStatus, int] = {
+    PlanStatus.in_progress: 0,
+    PlanStatus.completed: 1,
+    PlanStatus.failed: 1,
+}
+
+T = TypeVar("T")
+
+
+def _forward(stored: T, incoming: T, rank: Dict[T, int]) -> T:
+    """The incoming status unless it would move the stored one backwards."""
+    return stored if rank[stored] > rank[incoming] else incoming
+
+
+def _last_writer(stored: T, incoming: T) -> T:
+    """The incoming value, unless the writer never set it."""
+    return stored if incoming is None else incoming
+
+
+def merge_step(stored: Step, incoming: Step) -> Step:
+    """Merge an update of a step into the version that is now stored.
+
+    Statuses only move forward; the agent reply, feedback and updated action
+    are last-writer-wins; every other field takes the incoming value.
+    """
+    merged = incoming.model_copy()
+    merged.status = _forward(stored.status, incoming.status, STEP_STATUS_RANK)
+    merged.human_approval_status = _forward(
+        stored.human_approval_status,
+        incoming.human_approval_status,
+        HUMAN_APPROVAL_STATUS_RANK,
+    )
+    merged.agent_reply = _last_writer(stored.agent_reply, incoming.agent_reply)
+    merged.human_feedback = _last_writer(stored.human_feedback, incoming.human_feedback)
+    merged.updated_action = _last_writer(stored.updated_action, incoming.updated_action)
+    return merged
+
+
+def merge_plan(stored: Plan, incoming: Plan) -> Plan:
+    """Merge an update of a plan into the version that is now stored.
+
+    The overall status only moves forward; the summary and clarification
+    fields are last-writer-wins; every other field takes the incoming value.
+    """
+    merged = incoming.model_copy()
+    merged.overall_status = _forward(
+        stored.overall_status, incoming.overall_status, PLAN_STATUS_RANK
+    )
+    merged.summary = _last_writer(stored.summary, incoming.summary)
+    merged.human_clarification_request = _last_writer(
+        stored.human_clarification_request, incoming.human_clarification_request
+    )
+    merged.human_clarification_response = _last_writer(
+        stored.human_clarification_response, incoming.human_clarification_response
+    )
+    return merged
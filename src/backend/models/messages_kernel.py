@@ -3,6 +3,7 @@ from datetime import datetime,timezone
 from enum import Enum
 from typing import Any, Dict, List, Literal, Optional
 
+from pydantic import PrivateAttr
 from semantic_kernel.kernel_pydantic import Field, KernelBaseModel
 
 
@@ -81,6 +82,15 @@ class HumanFeedbackStatus(str, Enum):
     rejected = "rejected"
 
 
+class JobStatus(str, Enum):
+    """Enumeration of background job statuses."""
+
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
 class MessageRole(str, Enum):
     """Message roles compatible with Semantic Kernel."""
 
@@ -95,6 +105,8 @@ class BaseDataModel(KernelBaseModel):
 
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     timestamp: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Version of the stored document this instance was read from or last written as
+    _etag: Optional[str] = PrivateAttr(default=None)
 
 
 # Basic message class for Semantic Kernel compatibility
@@ -193,6 +205,8 @@ class Step(BaseDataModel):
     human_feedback: Optional[str] = None
     human_approval_status: Optional[HumanFeedbackStatus] = HumanFeedbackStatus.requested
     updated_action: Optional[str] = None
+    # IDs of the earlier steps whose results this step needs; None if not planned
+    depends_on: Optional[List[str]] = None
 
 
 class ThreadIdAgent(BaseDataModel):
@@ -215,6 +229,34 @@ class AzureIdAgent(BaseDataModel):
     agent_id: str
 
 
+class UserSessionIndex(BaseDataModel):
+    """Per-user index of session ids, most recently active first."""
+
+    data_type: Literal["user_index"] = Field("user_index", Literal=True)
+    session_id: str  # Partition key, set to the index id so it has its own partition
+    user_id: str
+    session_ids: List[str] = Field(default_factory=list)
+    version: int = 0  # Indexes older than the store's current version are rebuilt
+
+
+class Tombstone(BaseDataModel):
+    """Records a deletion so that every process drops its copies of the documents.
+
+    The store's change feed carries no deletes, so they are written as
+    tombstones instead. A tombstone has no user_id and stays out of the
+    user's own listings.
+    """
+
+    data_type: Literal["tombstone"] = Field("tombstone", Literal=True)
+    session_id: str  # Partition key: the session deleted from, or the tombstone's own id
+    target_user_id: str
+    target_session_id: Optional[str] = None  # None if every session of the user was affected
+    data_types: Optional[List[str]] = None  # None for every data type
+    item_ids: Optional[List[str]] = None  # None for every matching item
+    collection: Optional[str] = None
+    ttl: int = 86400  # Seconds until Cosmos DB expires it, when the container has TTL enabled
+
+
 class PlanWithSteps(Plan):
     """Plan model that includes the associated steps."""
 
@@ -257,6 +299,174 @@ class PlanWithSteps(Plan):
             self.overall_status = PlanStatus.completed
 
 
+# PlanSummary count fields, named after the StepStatus values
+STEP_COUNT_FIELDS = [status.value for status in StepStatus]
+
+
+class StepSummary(KernelBaseModel):
+    """The fields of a step shown in list views, without the agent reply or feedback."""
+
+    id: str
+    plan_id: str
+    session_id: str
+    action: str
+    agent: AgentType
+    status: StepStatus = StepStatus.planned
+    human_approval_status: Optional[HumanFeedbackStatus] = HumanFeedbackStatus.requested
+    updated_action: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+    @classmethod
+    def projected_fields(cls) -> List[str]:
+        """The stored fields a projection query needs to build this model."""
+        return list(cls.model_fields)
+
+
+class PlanSummary(KernelBaseModel):
+    """A plan with the counts of its steps by status, for list views."""
+
+    id: str
+    session_id: str
+    initial_goal: str
+    overall_status: PlanStatus = PlanStatus.in_progress
+    timestamp: Optional[datetime] = None
+    total_steps: int = 0
+    planned: int = 0
+    awaiting_feedback: int = 0
+    approved: int = 0
+    rejected: int = 0
+    action_requested: int = 0
+    completed: int = 0
+    failed: int = 0
+
+    @classmethod
+    def from_plan(cls, plan: Plan, steps: List[StepSummary]) -> "PlanSummary":
+        """Summarize a plan and count its steps."""
+        summary = cls.model_validate(plan.model_dump(include=set(cls.model_fields)))
+        summary.update_step_counts(steps)
+        return summary
+
+    def update_step_counts(self, steps: List[StepSummary]):
+        """Update the counts of steps by their status, as PlanWithSteps does."""
+        for field in STEP_COUNT_FIELDS:
+            setattr(self, field, 0)
+        for step in steps:
+            field = step.status.value
+            setattr(self, field, getattr(self, field) + 1)
+        self.total_steps = len(steps)
+
+        # Mark the plan as complete if the sum of completed and failed steps equals the total number of steps
+        if self.completed + self.failed == self.total_steps:
+            self.overall_status = PlanStatus.completed
+
+
+class PlanAggregate(BaseDataModel):
+    """A session's plan with its steps and step counts in one document.
+
+    Kept next to the plan and step documents when PLAN_AGGREGATE_ENABLED is
+    set, so a plan with its steps is one point read. Steps are keyed by id
+    and the counts are kept current with patch operations, without rewriting
+    the document.
+    """
+
+    data_type: Literal["plan_aggregate"] = Field("plan_aggregate", Literal=True)
+    session_id: str
+    user_id: str
+    plan: Dict[str, Any]
+    steps: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    # total_steps and one count per STEP_COUNT_FIELDS entry
+    step_counts: Dict[str, int] = Field(default_factory=dict)
+
+    @staticmethod
+    def aggregate_id(session_id: str) -> str:
+        return f"plan_aggregate_{session_id}"
+
+    @classmethod
+    def from_plan(
+        cls, plan: Dict[str, Any], steps: Optional[List[Dict[str, Any]]] = None
+    ) -> "PlanAggregate":
+        """Build the aggregate of a plan document and its step documents."""
+        steps = steps or []
+        step_counts = {"total_steps": len(steps), **dict.fromkeys(STEP_COUNT_FIELDS, 0)}
+        for step in steps:
+            step_counts[step["status"]] += 1
+        return cls(
+            id=cls.aggregate_id(plan["session_id"]),
+            session_id=plan["session_id"],
+            user_id=plan["user_id"],
+            plan=plan,
+            steps={step["id"]: step for step in steps},
+            step_counts=step_counts,
+        )
+
+    def plan_operations(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Patch operations that replace the plan."""
+        return [{"op": "set", "path": "/plan", "value": plan}]
+
+    def step_operations(self, step: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Patch operations that add or replace a step and move its count."""
+        operations = [{"op": "set", "path": f"/steps/{step['id']}", "value": step}]
+        previous = self.steps.get(step["id"])
+        if previous is None:
+            operations.append({"op": "incr", "path": "/step_counts/total_steps", "value": 1})
+        elif previous["status"] != step["status"]:
+            operations.append(
+                {"op": "incr", "path": f"/step_counts/{previous['status']}", "value": -1}
+            )
+        if previous is None or previous["status"] != step["status"]:
+            operations.append(
+                {"op": "incr", "path": f"/step_counts/{step['status']}", "value": 1}
+            )
+        return operations
+
+    def to_plan_with_steps(self) -> PlanWithSteps:
+        """The plan with its steps in creation order and the stored counts."""
+        steps = sorted(self.steps.values(), key=lambda step: step.get("timestamp") or "")
+        plan = PlanWithSteps.model_validate(
+            {**self.plan, **self.step_counts, "steps": steps}
+        )
+        # Mark the plan as complete if the sum of completed and failed steps equals the total number of steps
+        if plan.completed + plan.failed == plan.total_steps:
+            plan.overall_status = PlanStatus.completed
+        return plan
+
+
+class SessionSnapshot(KernelBaseModel):
+    """A session's plan, steps and agent messages read in one query.
+
+    With since set, only the documents changed at or after that watermark are
+    included. watermark is the latest change time seen, to pass as the next
+    since; etag identifies the full snapshot and is None for changes only.
+    """
+
+    session_id: str
+    plan: Optional[Plan] = None
+    steps: List[Step] = Field(default_factory=list)
+    agent_messages: List[AgentMessage] = Field(default_factory=list)
+    since: Optional[int] = None
+    watermark: Optional[int] = None
+    etag: Optional[str] = None
+
+
+class Job(KernelBaseModel):
+    """A background job that an endpoint accepted and reports progress for."""
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str
+    user_id: str
+    status: JobStatus = JobStatus.queued
+    total: int = 0
+    processed: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    # Time spent waiting for a worker and running, once known
+    queue_seconds: Optional[float] = None
+    run_seconds: Optional[float] = None
+
+
 # Message classes for communication between agents
 class InputTask(KernelBaseModel):
     """Message representing the initial input task from the user."""
@@ -426,6 +636,8 @@ class SKChatHistory:
 class PlannerResponseStep(KernelBaseModel):
     action: str
     agent: AgentType
+    # Numbers of the earlier steps, counting from 0, whose results this step needs
+    depends_on: Optional[List[int]] = None
 
 
 class PlannerResponsePlan(KernelBaseModel):
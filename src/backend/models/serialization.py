@@ -0,0 +1,36 @@
+# serialization.py
+
+from typing import Any, Dict, List, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def to_document(item: BaseModel) -> Dict[str, Any]:
+    """Serialize a model into a JSON-compatible document for the memory store.
+
+    Enums become their values and datetimes ISO 8601 strings, in one pass of
+    the pydantic-core serializer.
+    """
+    return item.model_dump(mode="json")
+
+
+def from_document(model_class: Type[ModelT], document: Dict[str, Any]) -> ModelT:
+    """Build a model from a document read from the memory store.
+
+    The document is passed to model_validate unchanged. Store metadata such as
+    _ts is ignored, and _etag is kept on models that track it. For trusted
+    documents this is also the fastest path: validation runs in pydantic-core,
+    while model_construct runs in Python and still needs the enum and datetime
+    fields converted.
+    """
+    model = model_class.model_validate(document)
+    if "_etag" in document and "_etag" in model_class.__private_attributes__:
+        model._etag = document["_etag"]
+    return model
+
+
+def from_documents(model_class: Type[ModelT], documents: List[Dict[str, Any]]) -> List[ModelT]:
+    """Build models from documents read from the memory store."""
+    return [from_document(model_class, document) for document in documents]
@@ -0,0 +1,75 @@
+"""Tests for the IVF approximate similarity index."""
+import os
+import sys
+
+import numpy as np
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from context.ann_index import IVFIndex  # noqa: E402
+from context.vector_index import VectorIndex  # noqa: E402
+
+
+def _clustered(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((8, dimension))
+    return centers[rng.integers(0, 8, count)] + rng.standard_normal((count, dimension)) * 0.1
+
+
+def _ivf(embeddings, **kwargs):
+    exact = VectorIndex()
+    for i, embedding in enumerate(embeddings):
+        exact.upsert(str(i), embedding, {"n": i})
+    return exact, IVFIndex.from_index(exact, **kwargs)
+
+
+def test_untrained_index_searches_exactly():
+    exact, ivf = _ivf(_clustered(50))
+    query = _clustered(1, seed=1)[0]
+
+    assert ivf.search(query, 5) == exact.search(query, 5)
+
+
+def test_trained_index_finds_exact_neighbours_on_clustered_data():
+    exact, ivf = _ivf(_clustered(500), n_lists=8, n_probe=2)
+    ivf.train()
+
+    for query in _clustered(20, seed=1):
+        expected = {item_id for item_id, _, _ in exact.search(query, 5)}
+        found = {item_id for item_id, _, _ in ivf.search(query, 5)}
+        assert len(expected & found) >= 4
+
+
+def test_incremental_insert_and_remove_after_training():
+    _, ivf = _ivf(_clustered(100), n_lists=4, n_probe=4)
+    ivf.train()
+    new = np.ones(16)
+
+    ivf.upsert("new", new, {"n": "new"})
+    assert ivf.search(new, 1)[0][0] == "new"
+
+    assert ivf.remove("new")
+    assert ivf.remove("0")
+    assert len(ivf) == 99
+    assert "new" not in {item_id for item_id, _, _ in ivf.search(new, 99)}
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    _, ivf = _ivf(_clustered(200), n_lists=4, n_probe=4)
+    ivf.train()
+    ivf.save(str(tmp_path), metadata={"watermark": {"count": 200}})
+    query = _clustered(1, seed=2)[0]
+
+    loaded = IVFIndex.load(str(tmp_path))
+
+    assert isinstance(loaded._matrix, np.memmap)
+    assert loaded.metadata == {"watermark": {"count": 200}}
+    assert loaded.search(query, 3) == ivf.search(query, 3)
+
+    # The first write copies the mapped arrays into memory
+    loaded.upsert("extra", query, {"n": "extra"})
+    assert not isinstance(loaded._matrix, np.memmap)
+    assert loaded.search(query, 1)[0][0] == "extra"
@@ -0,0 +1,207 @@
+"""Tests for the event bus, the change-feed processors and the materialized view."""
+import asyncio
+import os
+import sys
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from context.change_feed import InMemoryChangeFeed, SQLiteChangeFeedProcessor  # noqa: E402
+from context.event_bus import DocumentChange, EventBus  # noqa: E402
+from context.materialized_view import MaterializedView  # noqa: E402
+from context.sqlite_memory_context import SQLiteMemoryContext  # noqa: E402
+from models.messages_kernel import AgentType, Plan, Step, StepStatus  # noqa: E402
+
+
+def _step_document(step_id, ts, status="planned", user_id="u1", timestamp="2024-01-01T00:00:00"):
+    return {
+        "id": step_id,
+        "data_type": "step",
+        "plan_id": "p1",
+        "session_id": "s1",
+        "user_id": user_id,
+        "action": f"Action {step_id}",
+        "agent": AgentType.HR.value,
+        "status": status,
+        "timestamp": timestamp,
+        "_ts": ts,
+    }
+
+
+@pytest.mark.asyncio
+async def test_event_bus_isolates_failing_subscribers_and_bounds_queues():
+    bus = EventBus()
+    received = []
+    bus.subscribe(lambda change: 1 / 0)
+    unsubscribe = bus.subscribe(lambda change: received.append(change.id))
+    queue, _ = bus.subscribe_queue(maxsize=2, predicate=lambda change: change.user_id == "u1")
+
+    for index in range(3):
+        await bus.publish_document(_step_document(f"step-{index}", index))
+    await bus.publish_document(_step_document("other", 9, user_id="u2"))
+    unsubscribe()
+    await bus.publish_document(_step_document("late", 10))
+
+    assert received == ["step-0", "step-1", "step-2", "other"]
+    assert [queue.get_nowait().id for _ in range(queue.qsize())] == ["step-2", "late"]
+
+
+def _store(documents, user_id="u1"):
+    store = MagicMock(user_id=user_id)
+    store.get_session_documents = AsyncMock(return_value=documents)
+    return store
+
+
+async def _following_view(bus, **kwargs):
+    view = MaterializedView(**kwargs)
+    bus.subscribe(view.apply)
+    feed = InMemoryChangeFeed(bus)
+    view.follow(feed)
+    await feed.poll_once()
+    return view, feed
+
+
+@pytest.mark.asyncio
+async def test_materialized_view_keeps_newest_version_of_loaded_sessions():
+    bus = EventBus()
+    view = MaterializedView()
+    bus.subscribe(view.apply)
+    feed = InMemoryChangeFeed(bus)
+    view.follow(feed)
+    store = _store([_step_document("b", 2, timestamp="2024-01-01T00:00:02")])
+    assert not await view.load_session(store, "s1")
+
+    await feed.poll_once()
+    assert view.ready
+    assert view.get_steps_by_plan("p1", "u1") is None
+    assert await view.load_session(store, "s1")
+
+    feed.push(_step_document("a", 3, status="completed", timestamp="2024-01-01T00:00:01"))
+    feed.push(_step_document("a", 1, timestamp="2024-01-01T00:00:01"))
+    feed.push(_step_document("c", 4, user_id="u2"))
+    assert await feed.poll_once() == 3
+
+    steps = view.get_steps_by_plan("p1", "u1")
+    assert [(step.id, step.status) for step in steps] == [
+        ("a", StepStatus.completed),
+        ("b", StepStatus.planned),
+    ]
+    assert view.get_steps_by_plan("p1", "u2") is None
+    assert await view.load_session(store, "s1")
+    store.get_session_documents.assert_awaited_once_with("s1")
+
+
+@pytest.mark.asyncio
+async def test_tombstones_drop_sessions_so_they_are_read_again():
+    bus = EventBus()
+    view, feed = await _following_view(bus)
+    store = _store([_step_document("a", 1)])
+    assert await view.load_session(store, "s1")
+    assert await view.load_session(_store([], user_id="u2"), "s1")
+
+    feed.push(
+        {
+            "id": "t1",
+            "data_type": "tombstone",
+            "session_id": "tombstone_u1",
+            "target_user_id": "u1",
+            "data_types": ["plan", "step"],
+            "_ts": 2,
+        }
+    )
+    await feed.poll_once()
+
+    assert view.get_steps_by_plan("p1", "u1") is None
+    assert view.get_agent_messages_by_session("s1", "u2") == []
+    store.get_session_documents.return_value = []
+    assert await view.load_session(store, "s1")
+    assert store.get_session_documents.await_count == 2
+    assert view.get_plan_by_session("s1", "u1") is None
+
+
+@pytest.mark.asyncio
+async def test_materialized_view_evicts_and_expires_sessions():
+    bus = EventBus()
+    view, _ = await _following_view(bus, max_sessions=2, ttl_seconds=60)
+    store = _store([])
+    for session_id in ("s1", "s2", "s3"):
+        assert await view.load_session(store, session_id)
+
+    assert view.get_agent_messages_by_session("s1", "u1") is None
+    assert view.get_agent_messages_by_session("s3", "u1") == []
+
+    view.ttl_seconds = 0
+    await asyncio.sleep(0.01)
+    assert view.get_agent_messages_by_session("s3", "u1") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_change_feed_publishes_writes_after_start(tmp_path):
+    database_path = str(tmp_path / "memory.db")
+    store = SQLiteMemoryContext(session_id="s1", user_id="u1", database_path=database_path)
+    bus = EventBus()
+    view = MaterializedView()
+    bus.subscribe(view.apply)
+    feed = SQLiteChangeFeedProcessor(database_path=database_path, bus=bus)
+    view.follow(feed)
+    try:
+        await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+        assert await feed.poll_once() == 0
+        assert await view.load_session(store, "s1")
+
+        step = Step(plan_id="p1", session_id="s1", user_id="u1", action="Do", agent=AgentType.HR)
+        await store.add_step(step)
+        assert await feed.poll_once() == 1
+        step.status = StepStatus.completed
+        await store.update_step(step)
+        assert await feed.poll_once() == 1
+        assert await feed.poll_once() == 0
+
+        assert view.get_plan_by_session("s1", "u1").id == "p1"
+        assert view.get_plan_by_session("s1", "u2") is None
+        assert view.get_steps_by_plan("p1", "u1")[0].status == StepStatus.completed
+
+        await store.bulk_delete(["plan", "step"])
+        assert await feed.poll_once() == 1
+        assert await view.load_session(store, "s1")
+        assert view.get_plan_by_session("s1", "u1") is None
+    finally:
+        await feed.stop()
+        SQLiteMemoryContext.close_all()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_change_feed_polls_off_the_event_loop_thread(tmp_path):
+    feed = SQLiteChangeFeedProcessor(database_path=str(tmp_path / "memory.db"), bus=EventBus())
+    threads = set()
+    read_rows = feed._read_rows
+
+    def record():
+        threads.add(threading.get_ident())
+        return read_rows()
+
+    feed._read_rows = record
+    try:
+        assert await feed.poll_once() == 0
+    finally:
+        await feed.stop()
+
+    assert threads and threading.get_ident() not in threads
+
+
+def test_document_change_reads_routing_fields():
+    change = DocumentChange.from_document(_step_document("a", 1))
+    assert (change.data_type, change.session_id, change.user_id) == ("step", "s1", "u1")
@@ -0,0 +1,864 @@
+"""Unit tests for CosmosMemoryContext using a mocked Cosmos container."""
+import asyncio
+import os
+import sys
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("COSMOSDB_ENDPOINT", "https://mock-endpoint")
+os.environ.setdefault("COSMOSDB_DATABASE", "mock-database")
+os.environ.setdefault("COSMOSDB_CONTAINER", "mock-container")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from app_config import config  # noqa: E402
+from azure.cosmos.exceptions import CosmosHttpResponseError  # noqa: E402
+from context.ann_index import IVFIndex  # noqa: E402
+from context.change_feed import CosmosChangeFeedProcessor  # noqa: E402
+from context.cosmos_memory_kernel import CosmosMemoryContext  # noqa: E402
+from context.event_bus import DocumentChange, EventBus  # noqa: E402
+from models.messages_kernel import (  # noqa: E402
+    AgentType,
+    Plan,
+    PlanAggregate,
+    Step,
+    StepStatus,
+)
+from semantic_kernel.contents import AuthorRole, ChatMessageContent  # noqa: E402
+from semantic_kernel.memory.memory_record import MemoryRecord  # noqa: E402
+
+
+async def async_iterable(items):
+    """Helper to create an async iterable."""
+    for item in items:
+        yield item
+
+
+@pytest.fixture
+def mock_container():
+    """Patch the shared container proxy returned by AppConfig."""
+    container = AsyncMock()
+    CosmosMemoryContext._plan_cache.clear()
+    with patch.object(
+        config, "get_cosmos_container", AsyncMock(return_value=container)
+    ):
+        yield container
+
+
+@pytest.mark.asyncio
+async def test_contexts_share_pooled_container(mock_container):
+    """Every context for the configured account reuses the pooled container."""
+    first = CosmosMemoryContext(session_id="s1", user_id="u1")
+    second = CosmosMemoryContext(session_id="s2", user_id="u1")
+
+    await first.ensure_initialized()
+    await second.ensure_initialized()
+
+    assert first._container.container is mock_container
+    assert second._container.container is mock_container
+    assert config.get_cosmos_container.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_close_leaves_pooled_client_open(mock_container):
+    """Closing a context must not close the process-wide client."""
+    async with CosmosMemoryContext(session_id="s1", user_id="u1") as context:
+        await context.ensure_initialized()
+
+    mock_container.close.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_cosmos_container_creates_container_once():
+    """The shared container proxy is created on first use only."""
+    database = MagicMock()
+    database.create_container_if_not_exists = AsyncMock(return_value="container")
+    with patch.object(config, "get_cosmos_database_client", return_value=database):
+        config._cosmos_container = None
+        assert await config.get_cosmos_container() == "container"
+        assert await config.get_cosmos_container() == "container"
+        await config.close_cosmos_client()
+
+    database.create_container_if_not_exists.assert_awaited_once()
+
+
+def _step(session_id="s1", **kwargs):
+    return Step(
+        plan_id="p1",
+        session_id=session_id,
+        user_id="u1",
+        action="Do something",
+        agent=AgentType.HR,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_write_behind_batches_per_partition(mock_container):
+    """Queued appends are written as one transactional batch per partition."""
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(_step())
+    await context.add_item(_step())
+    await context.add_item(_step(session_id="s2"))
+
+    mock_container.create_item.assert_not_called()
+    await context.flush()
+
+    assert mock_container.execute_item_batch.await_count == 2
+    first_batch = mock_container.execute_item_batch.await_args_list[0].kwargs
+    assert first_batch["partition_key"] == "s1"
+    assert [op for op, _ in first_batch["batch_operations"]] == ["create", "create"]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_coalesces_update_of_pending_create(mock_container):
+    """An update of an item that is still queued keeps a single create."""
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    step = _step()
+    await context.add_step(step)
+    step.status = StepStatus.approved
+    await context.update_step(step)
+    await context.flush()
+
+    operations = mock_container.execute_item_batch.await_args.kwargs["batch_operations"]
+    assert len(operations) == 1
+    operation, (document,) = operations[0]
+    assert operation == "create"
+    assert document["status"] == StepStatus.approved
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_on_size_threshold(mock_container):
+    """Reaching the batch size flushes without waiting for the timer."""
+    context = CosmosMemoryContext(
+        session_id="s1",
+        user_id="u1",
+        write_behind=True,
+        write_behind_batch_size=2,
+        write_behind_flush_interval=60,
+    )
+    await context.add_item(_step())
+    await context.add_item(_step())
+
+    mock_container.execute_item_batch.assert_awaited_once()
+    await context.flush()
+
+
+@pytest.mark.asyncio
+async def test_reads_see_own_queued_writes(mock_container):
+    """Queries flush the write-behind buffer before reading."""
+    mock_container.query_items = MagicMock(return_value=async_iterable([]))
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(_step())
+    await context.get_steps_by_plan("p1")
+
+    mock_container.execute_item_batch.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_requeues_items_that_fail_to_write(mock_container):
+    """A transiently failing item does not drop the rest of the batch and stays queued."""
+    mock_container.execute_item_batch.side_effect = Exception("batch failed")
+    failing = _step()
+    written = _step()
+
+    async def create_item(body, **kwargs):
+        if body["id"] == failing.id:
+            raise CosmosHttpResponseError(status_code=503, message="Unavailable")
+        return body
+
+    mock_container.create_item.side_effect = create_item
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(failing)
+    await context.add_item(written)
+
+    with pytest.raises(RuntimeError):
+        await context.flush()
+
+    assert mock_container.create_item.await_count == 2
+    assert list(context._pending_writes["s1"]) == [failing.id]
+    assert context in CosmosMemoryContext._contexts_with_pending_writes
+
+    mock_container.create_item.side_effect = None
+    await context.flush()
+    assert context._pending_writes == {}
+
+
+@pytest.mark.asyncio
+async def test_write_behind_drops_items_that_can_never_be_written(mock_container):
+    """A permanent failure is dropped, so later flushes and reads still work."""
+    mock_container.execute_item_batch.side_effect = Exception("batch failed")
+    poisoned = _step()
+    mock_container.create_item.side_effect = CosmosHttpResponseError(
+        status_code=400, message="Bad request"
+    )
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(poisoned)
+
+    with pytest.raises(RuntimeError):
+        await context.flush()
+    assert context._pending_writes == {}
+    assert context not in CosmosMemoryContext._contexts_with_pending_writes
+
+    stored = _step(id="stored")
+    mock_container.read_item.return_value = stored.model_dump(mode="json")
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable([stored.model_dump(mode="json")])
+    )
+    await context.flush()
+    assert (await context.get_item_by_id("stored", "s1", Step)).id == "stored"
+    assert [step.id for step in await context.query_items("SELECT * FROM c", [], Step)] == [
+        "stored"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_gives_up_after_max_attempts(mock_container):
+    """A transient failure is retried on the next flushes, up to the attempt limit."""
+    mock_container.execute_item_batch.side_effect = Exception("batch failed")
+    mock_container.create_item.side_effect = CosmosHttpResponseError(
+        status_code=503, message="Unavailable"
+    )
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(_step())
+
+    for _ in range(CosmosMemoryContext.WRITE_BEHIND_MAX_ATTEMPTS - 1):
+        with pytest.raises(RuntimeError):
+            await context.flush()
+        assert len(context._pending_writes["s1"]) == 1
+    with pytest.raises(RuntimeError):
+        await context.flush()
+
+    assert context._pending_writes == {}
+    assert context._write_attempts == {}
+    assert mock_container.create_item.await_count == CosmosMemoryContext.WRITE_BEHIND_MAX_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_write_behind_treats_conflict_on_create_as_written(mock_container):
+    """A create that already landed is written over instead of failing forever."""
+    mock_container.execute_item_batch.side_effect = Exception("batch failed")
+    mock_container.create_item.side_effect = CosmosHttpResponseError(
+        status_code=409, message="Conflict"
+    )
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    step = _step()
+    await context.add_item(step)
+
+    await context.flush()
+
+    assert context._pending_writes == {}
+    assert mock_container.upsert_item.await_args.kwargs["body"]["id"] == step.id
+
+
+@pytest.mark.asyncio
+async def test_read_waits_for_flush_in_progress(mock_container):
+    """A read racing another task's flush returns only after the batch landed."""
+    release = asyncio.Event()
+    landed = []
+
+    async def execute_item_batch(**kwargs):
+        await release.wait()
+        landed.append(kwargs["partition_key"])
+
+    mock_container.execute_item_batch.side_effect = execute_item_batch
+    mock_container.query_items = MagicMock(return_value=async_iterable([]))
+    context = CosmosMemoryContext(
+        session_id="s1", user_id="u1", write_behind=True, write_behind_flush_interval=60
+    )
+    await context.add_item(_step())
+
+    flushing = asyncio.create_task(context.flush())
+    await asyncio.sleep(0)
+    reading = asyncio.create_task(context.get_steps_by_plan("p1"))
+    await asyncio.sleep(0)
+    assert not reading.done()
+
+    release.set()
+    await asyncio.gather(flushing, reading)
+    assert landed == ["s1"]
+
+
+@pytest.mark.asyncio
+async def test_steps_cache_is_updated_in_place(mock_container):
+    """add_plan/add_step/update_step keep the cached steps current without queries."""
+    mock_container.query_items = MagicMock(return_value=async_iterable([]))
+    mock_container.create_item.side_effect = lambda body, **kwargs: {**body, "_etag": "1"}
+    mock_container.replace_item.side_effect = lambda item, body, **kwargs: {
+        **body,
+        "_etag": "2",
+    }
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+    plan = Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal")
+    step = _step()
+
+    await context.add_plan(plan)
+    await context.add_step(step)
+    step.status = StepStatus.completed
+    await context.update_step(step)
+
+    steps = await context.get_steps_by_plan("p1")
+    cached_plan = await context.get_plan_by_session("s1")
+
+    mock_container.query_items.assert_not_called()
+    assert [s.status for s in steps] == [StepStatus.completed]
+    assert cached_plan.id == "p1"
+    assert CosmosMemoryContext.cache_stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_get_all_plans_uses_user_index_and_partition_keys(mock_container):
+    """Listing plans point-reads the user index and queries single partitions."""
+    mock_container.read_item.return_value = {
+        "id": "user_index_u1",
+        "session_id": "user_index_u1",
+        "user_id": "u1",
+        "data_type": "user_index",
+        "version": CosmosMemoryContext.USER_INDEX_VERSION,
+        "session_ids": ["s2", "s1"],
+        "_etag": "etag",
+    }
+
+    def query_items(query, parameters, partition_key=None, **kwargs):
+        return async_iterable(
+            [
+                {
+                    "id": f"plan-{partition_key}",
+                    "session_id": partition_key,
+                    "user_id": "u1",
+                    "initial_goal": "Goal",
+                    "_ts": 1,
+                }
+            ]
+        )
+
+    mock_container.query_items = MagicMock(side_effect=query_items)
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    plans = await context.get_all_plans()
+
+    assert [plan.id for plan in plans] == ["plan-s2", "plan-s1"]
+    mock_container.read_item.assert_awaited_once_with(
+        item="user_index_u1", partition_key="user_index_u1", response_hook=ANY
+    )
+    assert all(
+        call.kwargs["partition_key"] for call in mock_container.query_items.call_args_list
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_plan_moves_session_to_front_of_user_index(mock_container):
+    """Creating a plan updates the index with an etag-conditional replace."""
+    mock_container.read_item.return_value = {
+        "id": "user_index_u1",
+        "session_id": "user_index_u1",
+        "user_id": "u1",
+        "data_type": "user_index",
+        "version": CosmosMemoryContext.USER_INDEX_VERSION,
+        "session_ids": ["s1", "s2"],
+        "_etag": "etag",
+    }
+    context = CosmosMemoryContext(session_id="s2", user_id="u1")
+
+    await context.add_plan(
+        Plan(id="p2", session_id="s2", user_id="u1", initial_goal="Goal")
+    )
+
+    replace_call = mock_container.replace_item.await_args.kwargs
+    assert replace_call["body"]["session_ids"] == ["s2", "s1"]
+    assert replace_call["etag"] == "etag"
+
+
+@pytest.mark.asyncio
+async def test_every_session_write_is_recorded_in_user_index(mock_container):
+    """Sessions with messages but no plan are listed too, touched once per context."""
+    mock_container.read_item.return_value = {
+        "id": "user_index_u1",
+        "session_id": "user_index_u1",
+        "user_id": "u1",
+        "data_type": "user_index",
+        "session_ids": ["s1"],
+        "version": CosmosMemoryContext.USER_INDEX_VERSION,
+        "_etag": "etag",
+    }
+    context = CosmosMemoryContext(session_id="s2", user_id="u1")
+
+    await context.add_message(
+        ChatMessageContent(role=AuthorRole.USER, content="Hello", metadata={})
+    )
+    await context.add_message(
+        ChatMessageContent(role=AuthorRole.USER, content="Again", metadata={})
+    )
+
+    replace_call = mock_container.replace_item.await_args.kwargs
+    assert replace_call["body"]["session_ids"] == ["s2", "s1"]
+    mock_container.read_item.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_outdated_user_index_is_rebuilt(mock_container):
+    """An index from before every session was recorded is rebuilt from a scan."""
+    mock_container.read_item.return_value = {
+        "id": "user_index_u1",
+        "session_id": "user_index_u1",
+        "user_id": "u1",
+        "data_type": "user_index",
+        "session_ids": ["s1"],
+        "_etag": "etag",
+    }
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable(
+            [{"session_id": "s1", "_ts": 1}, {"session_id": "s2", "_ts": 2}]
+        )
+    )
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    assert await context.get_user_session_ids() == ["s2", "s1"]
+    replace_call = mock_container.replace_item.await_args.kwargs
+    assert replace_call["etag"] == "etag"
+    assert replace_call["body"]["version"] == CosmosMemoryContext.USER_INDEX_VERSION
+
+
+@pytest.mark.asyncio
+async def test_delete_all_messages_scans_across_partitions(mock_container):
+    """Deletes do not depend on the session index, so nothing is left behind."""
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable([{"id": "m1", "session_id": "s9"}])
+    )
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    await context.delete_all_messages("message")
+
+    assert "partition_key" not in mock_container.query_items.call_args.kwargs
+    mock_container.delete_item.assert_awaited_once_with(
+        item="m1", partition_key="s9", response_hook=ANY
+    )
+    mock_container.read_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_batches_by_partition(mock_container):
+    """One query feeds per-partition transactional delete batches."""
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable(
+            [
+                {"id": "plan-1", "session_id": "s1"},
+                {"id": "step-1", "session_id": "s1"},
+                {"id": "step-2", "session_id": "s2"},
+                {"id": "session-1"},
+            ]
+        )
+    )
+    mock_container.execute_item_batch.side_effect = [None, Exception("conflict")]
+    progress = []
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    counts = await context.bulk_delete(
+        ["plan", "step", "session"],
+        on_progress=lambda total, processed: progress.append((total, processed)),
+        concurrency=1,
+    )
+
+    mock_container.query_items.assert_called_once()
+    assert mock_container.query_items.call_args.kwargs.get("partition_key") is None
+    first_batch = mock_container.execute_item_batch.await_args_list[0].kwargs
+    assert first_batch["partition_key"] == "s1"
+    assert first_batch["batch_operations"] == [
+        ("delete", ("plan-1",)),
+        ("delete", ("step-1",)),
+    ]
+    # The failed batch and the item without a partition key are deleted one by one
+    deleted = [call.kwargs["item"] for call in mock_container.delete_item.await_args_list]
+    assert sorted(deleted) == ["session-1", "step-2"]
+    assert counts == {"total": 4, "deleted": 4, "failed": 0}
+    assert progress[0] == (4, 0) and progress[-1] == (4, 4)
+
+
+@pytest.mark.asyncio
+async def test_nearest_matches_use_incrementally_updated_index(mock_container):
+    """The collection is loaded once; later upserts and removals update the index."""
+    CosmosMemoryContext._vector_indexes.clear()
+    stored = [
+        {"id": "m1", "key": "k1", "collection": "c", "text": "one", "embedding": [1.0, 0.0]},
+        {"id": "m2", "key": "k2", "collection": "c", "text": "two", "embedding": [0.0, 1.0]},
+    ]
+    mock_container.query_items = MagicMock(return_value=async_iterable(stored))
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+
+    matches = await context.get_nearest_matches("c", np.array([1.0, 0.1]), limit=1)
+    assert [(record.id, record.embedding) for record, _ in matches] == [("m1", None)]
+
+    await context.upsert_memory_record(
+        "c",
+        MemoryRecord(
+            is_reference=False,
+            external_source_name=None,
+            id="m3",
+            description=None,
+            text="three",
+            additional_metadata=None,
+            embedding=np.array([2.0, 0.0]),
+            key="k3",
+        ),
+    )
+    mock_container.query_items = MagicMock(return_value=async_iterable([{"id": "m1"}]))
+    await context.remove_memory_record("c", "k1")
+
+    matches = await context.get_nearest_matches(
+        "c", np.array([1.0, 0.0]), limit=5, min_relevance_score=0.5, with_embeddings=True
+    )
+    assert [record.id for record, _ in matches] == ["m3"]
+    np.testing.assert_allclose(matches[0][0].embedding, [2.0, 0.0], rtol=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_vector_indexes_evict_least_recently_used_session(mock_container):
+    """Only MEMORY_INDEX_MAX_ENTRIES session indexes stay loaded in the process."""
+    CosmosMemoryContext._vector_indexes.clear()
+    stored = [{"id": "m1", "key": "k1", "collection": "c", "embedding": [1.0, 0.0]}]
+    mock_container.query_items = MagicMock(
+        side_effect=lambda *args, **kwargs: async_iterable(stored)
+    )
+
+    with patch.object(CosmosMemoryContext._vector_indexes, "max_entries", 2):
+        for session_id in ("s1", "s2", "s3"):
+            context = CosmosMemoryContext(session_id=session_id, user_id="u1")
+            await context.get_nearest_match("c", np.array([1.0, 0.0]))
+
+    assert CosmosMemoryContext._vector_indexes.peek(("s1", "c")) is None
+    assert CosmosMemoryContext._vector_indexes.peek(("s3", "c")) is not None
+    assert CosmosMemoryContext._vector_indexes.stats()["size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_large_collections_use_approximate_index(mock_container):
+    """Collections past MEMORY_ANN_MIN_RECORDS are served by a trained IVF index."""
+    CosmosMemoryContext._vector_indexes.clear()
+    stored = [
+        {"id": f"m{i}", "key": f"k{i}", "collection": "c", "embedding": [1.0, float(i)]}
+        for i in range(4)
+    ]
+    mock_container.query_items = MagicMock(return_value=async_iterable(stored))
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+
+    with patch.object(config, "MEMORY_ANN_MIN_RECORDS", 4):
+        record, score = await context.get_nearest_match("c", np.array([1.0, 0.0]))
+
+    index = CosmosMemoryContext._vector_indexes.peek(("s1", "c"))
+    assert isinstance(index, IVFIndex) and index.is_trained
+    assert record.id == "m0" and score == pytest.approx(1.0)
+
+
+def _memory_record(key, embedding=None):
+    return MemoryRecord(
+        is_reference=False,
+        external_source_name=None,
+        id=f"id-{key}",
+        description=None,
+        text=key,
+        additional_metadata=None,
+        embedding=embedding,
+        key=key,
+    )
+
+
+@pytest.mark.asyncio
+async def test_upsert_batch_uses_transactional_batches(mock_container):
+    """Upserts are chunked into session-partition batches and ids keep input order."""
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+    records = [_memory_record(f"k{i}") for i in range(150)]
+
+    ids = await context.upsert_batch("c", records)
+
+    assert ids == [f"id-k{i}" for i in range(150)]
+    batches = mock_container.execute_item_batch.await_args_list
+    assert [len(call.kwargs["batch_operations"]) for call in batches] == [100, 50]
+    assert all(call.kwargs["partition_key"] == "s1" for call in batches)
+    mock_container.upsert_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_batch_queries_keys_with_array_contains(mock_container):
+    """One ARRAY_CONTAINS query fetches the batch, returned in the order of the keys."""
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable(
+            [
+                {"id": "id-b", "key": "b", "text": "b", "embedding": [0.0, 1.0]},
+                {"id": "id-a", "key": "a", "text": "a", "embedding": [1.0, 0.0]},
+            ]
+        )
+    )
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+
+    records = await context.get_batch("c", ["a", "missing", "b"], with_embeddings=True)
+
+    mock_container.query_items.assert_called_once()
+    call = mock_container.query_items.call_args.kwargs
+    assert "ARRAY_CONTAINS(@keys, c.key)" in call["query"]
+    assert call["partition_key"] == "s1"
+    assert [record.id for record in records] == ["id-a", "id-b"]
+    assert records[0].embedding.tolist() == [1.0, 0.0]
+
+
+@pytest.mark.asyncio
+async def test_remove_batch_deletes_in_one_transactional_batch(mock_container):
+    """Keys are resolved with one query and deleted as one batch."""
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable([{"id": "id-a", "key": "a"}, {"id": "id-b", "key": "b"}])
+    )
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+
+    await context.remove_batch("c", ["a", "b"])
+
+    mock_container.query_items.assert_called_once()
+    batch = mock_container.execute_item_batch.await_args.kwargs
+    assert batch["batch_operations"] == [("delete", ("id-a",)), ("delete", ("id-b",))]
+    assert batch["partition_key"] == "s1"
+
+
+class _FakePages:
+    """Mimics the page iterator returned by AsyncItemPaged.by_page()."""
+
+    def __init__(self, pages, continuation_token):
+        self._pages = pages
+        self._position = int(continuation_token or 0)
+        self.continuation_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position >= len(self._pages):
+            raise StopAsyncIteration
+        page = self._pages[self._position]
+        self._position += 1
+        self.continuation_token = (
+            str(self._position) if self._position < len(self._pages) else None
+        )
+        return async_iterable(page)
+
+
+@pytest.mark.asyncio
+async def test_iter_all_messages_resumes_mid_page(mock_container):
+    """The continuation token resumes inside a Cosmos page and across sessions."""
+    mock_container.read_item.return_value = {
+        "id": "user_index_u1",
+        "session_id": "user_index_u1",
+        "user_id": "u1",
+        "data_type": "user_index",
+        "version": CosmosMemoryContext.USER_INDEX_VERSION,
+        "session_ids": ["s2", "s1"],
+        "_etag": "etag",
+    }
+    pages = {
+        "s2": [[{"id": "a"}, {"id": "b"}], [{"id": "c"}]],
+        "s1": [[{"id": "d"}]],
+    }
+
+    def query_items(query, parameters, partition_key=None, max_item_count=None, **kwargs):
+        paged = MagicMock()
+        paged.by_page = lambda token=None: _FakePages(pages[partition_key], token)
+        return paged
+
+    mock_container.query_items = MagicMock(side_effect=query_items)
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    pairs = [(item["id"], token) async for item, token in context.iter_all_messages(page_size=2)]
+    assert [item_id for item_id, _ in pairs] == ["a", "b", "c", "d"]
+    assert pairs[-1][1] is None
+
+    for position, (_, token) in enumerate(pairs[:-1]):
+        resumed = [item["id"] async for item, _ in context.iter_all_messages(token)]
+        assert resumed == [item_id for item_id, _ in pairs[position + 1 :]]
+
+    with pytest.raises(ValueError):
+        async for _ in context.iter_all_messages("not a token"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_step_summaries_project_fields(mock_container):
+    """Step summaries select only the summary fields instead of SELECT *."""
+    mock_container.query_items = MagicMock(
+        return_value=async_iterable(
+            [
+                {
+                    "id": "step-1",
+                    "plan_id": "p1",
+                    "session_id": "s1",
+                    "action": "Do something",
+                    "agent": AgentType.HR.value,
+                    "status": "completed",
+                }
+            ]
+        )
+    )
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+    plan = Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal")
+
+    summary = await context.get_plan_summary(plan)
+
+    query = mock_container.query_items.call_args.kwargs["query"]
+    assert query.startswith("SELECT c.id, c.plan_id, c.session_id, c.action")
+    assert "agent_reply" not in query
+    assert mock_container.query_items.call_args.kwargs["partition_key"] == "s1"
+    assert summary.total_steps == 1 and summary.completed == 1
+    assert summary.overall_status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_update_step_retries_with_merge_on_etag_conflict(mock_container):
+    """A 412 on the conditional replace re-reads the step and merges the update."""
+    stored = _step(status=StepStatus.completed, agent_reply="Done")
+    stored_document = {**stored.model_dump(mode="json"), "_etag": "stored"}
+    mock_container.read_item.return_value = stored_document
+    mock_container.replace_item.side_effect = [
+        CosmosHttpResponseError(status_code=412, message="Precondition failed"),
+        {**stored_document, "_etag": "merged"},
+    ]
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+    step = stored.model_copy()
+    step._etag = "stale"
+    step.status = StepStatus.approved
+    step.agent_reply = None
+    step.human_feedback = "Approved"
+
+    await context.update_step(step)
+
+    first, second = mock_container.replace_item.await_args_list
+    assert first.kwargs["etag"] == "stale" and second.kwargs["etag"] == "stored"
+    assert second.kwargs["body"]["status"] == "completed"
+    assert second.kwargs["body"]["agent_reply"] == "Done"
+    assert second.kwargs["body"]["human_feedback"] == "Approved"
+    assert step.status == StepStatus.completed and step._etag == "merged"
+    mock_container.upsert_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_step_patches_the_plan_aggregate(mock_container):
+    """With aggregates enabled the step and its status count are patched on the server."""
+    stored = _step()
+    step_document = {**stored.model_dump(mode="json"), "_etag": "step"}
+    aggregate_document = {
+        **PlanAggregate.from_plan(
+            Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal").model_dump(
+                mode="json"
+            ),
+            [stored.model_dump(mode="json")],
+        ).model_dump(mode="json"),
+        "_etag": "aggregate",
+    }
+    mock_container.read_item.side_effect = lambda item, **kwargs: (
+        aggregate_document if item == "plan_aggregate_s1" else step_document
+    )
+    mock_container.replace_item.side_effect = lambda item, body, **kwargs: {
+        **body,
+        "_etag": "step-2",
+    }
+    mock_container.patch_item.return_value = {**aggregate_document, "_etag": "aggregate-2"}
+    context = CosmosMemoryContext(session_id="s1", user_id="u1")
+    step = stored.model_copy()
+    step._etag = "step"
+    step.status = StepStatus.completed
+
+    with patch.object(config, "PLAN_AGGREGATE_ENABLED", True):
+        await context.update_step(step)
+
+    call = mock_container.patch_item.await_args
+    assert (call.kwargs["item"], call.kwargs["etag"]) == ("plan_aggregate_s1", "aggregate")
+    operations = call.kwargs["patch_operations"]
+    assert operations[0]["path"] == f"/steps/{step.id}"
+    assert operations[1:] == [
+        {"op": "incr", "path": "/step_counts/planned", "value": -1},
+        {"op": "incr", "path": "/step_counts/completed", "value": 1},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_change_feed_resumes_from_continuation(mock_container):
+    """The processor starts from the beginning, then continues from the last page."""
+    bus = EventBus()
+    published = []
+    bus.subscribe(lambda change: published.append(change.id))
+    feed_calls = []
+
+    def query_items_change_feed(**kwargs):
+        feed_calls.append(kwargs)
+        pages = [[{"id": "a"}, {"id": "b"}]] if "start_time" in kwargs else []
+        feed = MagicMock()
+        feed.by_page = lambda: _FakePages(pages, None)
+        return feed
+
+    mock_container.query_items_change_feed = MagicMock(side_effect=query_items_change_feed)
+    processor = CosmosChangeFeedProcessor(bus=bus)
+
+    assert await processor.poll_once() == 2
+    processor._continuation = "etag-1"
+    assert await processor.poll_once() == 0
+
+    assert published == ["a", "b"]
+    assert feed_calls == [{"start_time": "Now"}, {"continuation": "etag-1"}]
+    assert processor.caught_up.is_set()
+
+
+def test_apply_change_drops_cache_entries_changed_elsewhere():
+    """Changes carrying the cached _etag are this process's own writes and are kept."""
+    CosmosMemoryContext._plan_cache.clear()
+    step = _step()
+    step._etag = "mine"
+    key = CosmosMemoryContext._steps_cache_key("u1", "p1")
+    CosmosMemoryContext._plan_cache.set(key, [step])
+    document = {**step.model_dump(mode="json"), "_etag": "mine"}
+
+    CosmosMemoryContext.apply_change(DocumentChange.from_document(document))
+    assert CosmosMemoryContext._plan_cache.peek(key) is not None
+
+    CosmosMemoryContext.apply_change(
+        DocumentChange.from_document({**document, "_etag": "theirs"})
+    )
+    assert CosmosMemoryContext._plan_cache.peek(key) is None
+
+
+@pytest.mark.asyncio
+async def test_deletes_write_tombstones_that_clear_other_processes_caches(mock_container):
+    """The change feed has no deletes, so bulk_delete records one as a tombstone."""
+    mock_container.query_items = MagicMock(return_value=async_iterable([]))
+    mock_container.create_item.side_effect = lambda body, **kwargs: {**body, "_ts": 5}
+    context = CosmosMemoryContext(session_id="", user_id="u1")
+
+    await context.bulk_delete(["plan", "step"])
+
+    tombstone = mock_container.create_item.await_args.kwargs["body"]
+    assert tombstone["data_type"] == "tombstone"
+    assert tombstone["target_user_id"] == "u1" and "user_id" not in tombstone
+    assert tombstone["data_types"] == ["plan", "step"]
+
+    key = CosmosMemoryContext._plan_cache_key("u1", "s1")
+    CosmosMemoryContext._plan_cache.set(key, Plan(session_id="s1", user_id="u1", initial_goal="Goal"))
+    CosmosMemoryContext.apply_change(DocumentChange.from_document(tombstone))
+    assert CosmosMemoryContext._plan_cache.peek(key) is None
@@ -0,0 +1,172 @@
+"""Tests for the retry policy, circuit breaker and metrics of the Cosmos DB container."""
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from azure.cosmos.exceptions import CosmosHttpResponseError  # noqa: E402
+from context.cosmos_resilience import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    OperationMetrics,
+    ResilientContainer,
+    RetryPolicy,
+)
+
+
+def _error(status_code, headers=None):
+    error = CosmosHttpResponseError(status_code=status_code, message="error")
+    error.headers = headers or {}
+    return error
+
+
+def _container(policy=None, breaker=None):
+    inner = AsyncMock()
+    return inner, ResilientContainer(
+        inner,
+        policy=policy or RetryPolicy(max_retries=3),
+        breaker=breaker or CircuitBreaker(failure_threshold=10),
+        metrics=OperationMetrics(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_throttled_request_waits_for_retry_after_and_records_metrics():
+    inner, container = _container()
+
+    async def create_item(body, response_hook, **kwargs):
+        if inner.create_item.await_count == 1:
+            raise _error(429, {"x-ms-retry-after-ms": "250", "x-ms-request-charge": "0"})
+        response_hook({"x-ms-request-charge": "6.5"}, body)
+        return body
+
+    inner.create_item.side_effect = create_item
+    with patch("context.cosmos_resilience.asyncio.sleep", AsyncMock()) as sleep:
+        await container.create_item(body={"id": "1", "data_type": "step"})
+
+    sleep.assert_awaited_once_with(0.25)
+    [entry] = container.metrics.snapshot()
+    assert entry["method"] == "create_item"
+    assert entry["data_type"] == "step"
+    assert (entry["count"], entry["errors"], entry["retries"]) == (1, 0, 1)
+    assert entry["request_charge"] == 6.5
+
+
+@pytest.mark.asyncio
+async def test_retries_are_capped_and_other_errors_are_not_retried():
+    inner, container = _container(policy=RetryPolicy(max_retries=2))
+    inner.upsert_item.side_effect = _error(503)
+    inner.read_item.side_effect = _error(404)
+
+    with patch("context.cosmos_resilience.asyncio.sleep", AsyncMock()):
+        with pytest.raises(CosmosHttpResponseError):
+            await container.upsert_item(body={"id": "1", "data_type": "plan"})
+        with pytest.raises(CosmosHttpResponseError):
+            await container.read_item(item="1", partition_key="s1")
+
+    assert inner.upsert_item.await_count == 3
+    assert inner.read_item.await_count == 1
+    entries = {entry["method"]: entry for entry in container.metrics.snapshot()}
+    assert entries["upsert_item"]["retries"] == 2
+    assert entries["upsert_item"]["errors"] == 1
+    assert entries["read_item"]["data_type"] == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_repeated_failures_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    inner, container = _container(policy=RetryPolicy(max_retries=0), breaker=breaker)
+    inner.read_item.side_effect = _error(429)
+
+    for _ in range(2):
+        with pytest.raises(CosmosHttpResponseError):
+            await container.read_item(item="1", partition_key="s1")
+    with pytest.raises(CircuitOpenError):
+        await container.read_item(item="1", partition_key="s1")
+    assert inner.read_item.await_count == 2
+    assert breaker.state == "open"
+
+    # After the reset period one trial goes through and closes the circuit
+    breaker._opened_at -= 30
+    inner.read_item.side_effect = None
+    inner.read_item.return_value = {"id": "1", "data_type": "plan"}
+    assert await container.read_item(item="1", partition_key="s1") == {
+        "id": "1",
+        "data_type": "plan",
+    }
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_query_is_retried_until_the_first_item_arrives():
+    inner, container = _container()
+    attempts = []
+
+    def query_items(query, parameters, response_hook, **kwargs):
+        attempts.append(kwargs)
+
+        async def items():
+            if len(attempts) == 1:
+                raise _error(429, {"x-ms-retry-after-ms": "10"})
+            response_hook({"x-ms-request-charge": "2.5"}, [{"id": "1"}])
+            yield {"id": "1"}
+
+        return items()
+
+    inner.query_items = MagicMock(side_effect=query_items)
+    parameters = [{"name": "@data_type", "value": "memory"}]
+    with patch("context.cosmos_resilience.asyncio.sleep", AsyncMock()):
+        items = [
+            item
+            async for item in container.query_items(
+                query="SELECT * FROM c", parameters=parameters, partition_key="s1"
+            )
+        ]
+
+    assert items == [{"id": "1"}]
+    assert attempts == [{"partition_key": "s1"}, {"partition_key": "s1"}]
+    [entry] = container.metrics.snapshot()
+    assert (entry["method"], entry["data_type"]) == ("query_items", "memory")
+    assert (entry["retries"], entry["request_charge"]) == (1, 2.5)
+    assert (
+        'cosmos_request_charge_total{method="query_items",data_type="memory"} 2.5'
+        in container.metrics.to_prometheus()
+    )
+
+
+@pytest.mark.asyncio
+async def test_creates_are_only_retried_when_they_were_not_applied():
+    inner, container = _container()
+    inner.create_item.side_effect = _error(503)
+    inner.execute_item_batch.side_effect = _error(408)
+
+    with patch("context.cosmos_resilience.asyncio.sleep", AsyncMock()):
+        with pytest.raises(CosmosHttpResponseError):
+            await container.create_item(body={"id": "1", "data_type": "step"})
+        with pytest.raises(CosmosHttpResponseError):
+            await container.execute_item_batch(
+                batch_operations=[("create", ({"id": "1"},)), ("upsert", ({"id": "2"},))],
+                partition_key="s1",
+            )
+        inner.create_item.side_effect = [_error(449), {"id": "1"}]
+        assert await container.create_item(body={"id": "1"}) == {"id": "1"}
+        inner.execute_item_batch.side_effect = [_error(503), []]
+        await container.execute_item_batch(
+            batch_operations=[("upsert", ({"id": "2"},))], partition_key="s1"
+        )
+
+    assert inner.create_item.await_count == 3
+    assert inner.execute_item_batch.await_count == 3
@@ -0,0 +1,60 @@
+"""Tests for the stored embedding encodings."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from context.embedding_codec import (  # noqa: E402
+    decode_embedding,
+    embedding_dimension,
+    encode_embedding,
+)
+
+
+@pytest.mark.parametrize(
+    "encoding, tolerance", [("json", 1e-7), ("float32", 0), ("float16", 1e-3), ("int8", 1e-2)]
+)
+def test_round_trip(encoding, tolerance):
+    embedding = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+
+    stored = encode_embedding(embedding, encoding)
+    decoded = decode_embedding(stored)
+
+    assert decoded.dtype == np.float32
+    assert embedding_dimension(stored) == 64
+    np.testing.assert_allclose(decoded, embedding, atol=tolerance * np.abs(embedding).max())
+
+
+def test_binary_encodings_are_smaller_than_json():
+    embedding = np.random.default_rng(0).standard_normal(1536)
+    sizes = {
+        encoding: len(str(encode_embedding(embedding, encoding)))
+        for encoding in ("json", "float32", "float16", "int8")
+    }
+
+    assert sizes["float32"] < sizes["json"] / 2
+    assert sizes["int8"] < sizes["float16"] < sizes["float32"]
+
+
+def test_decode_reads_legacy_lists_and_fills_buffers():
+    matrix = np.zeros((2, 3), dtype=np.float32)
+
+    decode_embedding([1.0, 2.0, 3.0], out=matrix[0])
+    decode_embedding(encode_embedding(np.array([4.0, 5.0, 6.0]), "int8"), out=matrix[1])
+
+    np.testing.assert_allclose(matrix, [[1, 2, 3], [4, 5, 6]], atol=0.05)
+    assert decode_embedding(None) is None and decode_embedding([]) is None
+
+
+def test_decode_rejects_unknown_versions():
+    stored = encode_embedding(np.ones(4), "float32")
+    stored["v"] = 99
+
+    with pytest.raises(ValueError):
+        decode_embedding(stored)
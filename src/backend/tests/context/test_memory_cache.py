@@ -0,0 +1,55 @@
+"""Unit tests for the TTL/LRU cache used by CosmosMemoryContext."""
+import os
+import sys
+from unittest.mock import patch
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from context.memory_cache import TTLCache  # noqa: E402
+
+
+def test_hit_and_miss_counters():
+    cache = TTLCache(max_entries=10, ttl_seconds=30)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl_seconds=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.peek("b") is None
+    assert cache.peek("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_entries=10, ttl_seconds=5)
+    with patch("context.memory_cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("context.memory_cache.time.monotonic", return_value=106.0):
+        assert cache.get("a") is None
+
+    assert cache.stats()["expirations"] == 1
+
+
+def test_update_only_touches_live_entries():
+    cache = TTLCache(max_entries=10, ttl_seconds=30)
+    cache.update("missing", lambda value: value + [1])
+    cache.set("steps", [])
+    cache.update("steps", lambda value: value + [1])
+
+    assert cache.peek("missing") is None
+    assert cache.peek("steps") == [1]
@@ -0,0 +1,111 @@
+"""Tests for the per-session event log behind the session event streams."""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from context.event_bus import DocumentChange, EventBus  # noqa: E402
+from context.session_events import AgentReplyStream, SessionEventLog  # noqa: E402
+
+
+def _change(item_id, data_type="step", session_id="s1", user_id="u1", **fields):
+    return DocumentChange.from_document(
+        {
+            "id": item_id,
+            "data_type": data_type,
+            "session_id": session_id,
+            "user_id": user_id,
+            **fields,
+        }
+    )
+
+
+def _parse(message):
+    fields = dict(
+        line.split(": ", 1) for line in message.strip().splitlines() if ": " in line
+    )
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+async def _next(stream):
+    return _parse(await asyncio.wait_for(stream.__anext__(), 1))
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_new_changes_of_the_users_session():
+    log = SessionEventLog()
+    bus = EventBus()
+    bus.subscribe(log.apply)
+    await bus.publish(_change("old"))
+
+    stream = log.stream("s1", "u1", keepalive_seconds=0.01)
+    assert (await stream.__anext__()).startswith("retry:")
+    # Only changes from now on, and only the user's
+    assert (await stream.__anext__()) == ": keepalive\n\n"
+    await bus.publish(_change("other-user", user_id="u2"))
+    await bus.publish(_change("other-session", session_id="s2"))
+    await bus.publish(_change("m1", data_type="agent_message", content="hi", _etag="e1"))
+    await bus.publish(_change("m1", data_type="agent_message", content="hi", _etag="e1"))
+    await bus.publish(_change("ignored", data_type="memory"))
+    await bus.publish(_change("step1", status="completed"))
+
+    message = await _next(stream)
+    assert message["event"] == "agent_message"
+    assert message["data"]["content"] == "hi"
+    assert "_etag" not in message["data"]
+    message = await _next(stream)
+    assert (message["event"], message["data"]["status"]) == ("step", "completed")
+    assert log.parse_event_id(message["id"]) == 5
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_only_missed_events_or_resets():
+    log = SessionEventLog(max_events_per_session=2)
+    for index in range(3):
+        log.apply(_change(f"step{index}"))
+
+    stream = log.stream("s1", "u1", last_event_id=log.event_id(2))
+    await stream.__anext__()
+    assert (await _next(stream))["data"]["id"] == "step2"
+    await stream.aclose()
+
+    # The event after 0 was dropped, and ids of another process are unknown
+    for last_event_id in (log.event_id(0), "elsewhere:3"):
+        stream = log.stream("s1", "u1", last_event_id=last_event_id)
+        await stream.__anext__()
+        message = await _next(stream)
+        assert message["event"] == "reset"
+        assert log.parse_event_id(message["id"]) == 3
+        await stream.aclose()
+
+
+def test_reply_stream_forwards_deltas_and_returns_the_whole_reply():
+    log = SessionEventLog()
+    reply = AgentReplyStream("s1", "u1", "Hr_Agent", step_id="step1", log=log)
+
+    reply.append("Hel")
+    reply.min_interval = 60
+    reply.append("lo, ")
+    reply.append("world")
+    assert reply.close() == "Hello, world"
+    assert reply.first_chunk_seconds is not None
+
+    events, _ = log.since("s1", 0)
+    deltas = [event.change.document for event in events]
+    assert [(d["offset"], d["delta"], d["done"]) for d in deltas] == [
+        (0, "Hel", False),
+        (3, "lo, world", True),
+    ]
+    assert {(d["id"], d["source"], d["step_id"]) for d in deltas} == {
+        (reply.id, "Hr_Agent", "step1")
+    }
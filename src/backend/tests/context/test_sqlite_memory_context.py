@@ -0,0 +1,327 @@
+"""Tests for the SQLite memory store backend."""
+import os
+import sys
+import threading
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from app_config import config  # noqa: E402
+from context.sqlite_memory_context import SQLiteMemoryContext  # noqa: E402
+from models.messages_kernel import (  # noqa: E402
+    AgentMessage,
+    AgentType,
+    Plan,
+    Session,
+    Step,
+    StepStatus,
+)
+from semantic_kernel.memory.memory_record import MemoryRecord  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    SQLiteMemoryContext._vector_indexes.clear()
+    yield SQLiteMemoryContext(
+        session_id="s1", user_id="u1", database_path=str(tmp_path / "memory.db")
+    )
+    SQLiteMemoryContext.close_all()
+
+
+def _step(plan_id="p1", action="Do something"):
+    return Step(
+        plan_id=plan_id, session_id="s1", user_id="u1", action=action, agent=AgentType.HR
+    )
+
+
+@pytest.mark.asyncio
+async def test_plans_and_steps_round_trip_in_insertion_order(store):
+    plan = Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal")
+    await store.add_plan(plan)
+    steps = [_step(action=f"Step {i}") for i in range(3)]
+    for step in steps:
+        await store.add_step(step)
+
+    steps[0].status = StepStatus.completed
+    await store.update_step(steps[0])
+
+    loaded = await store.get_steps_by_plan("p1")
+    assert [step.action for step in loaded] == ["Step 0", "Step 1", "Step 2"]
+    assert loaded[0].status == StepStatus.completed
+    assert (await store.get_plan_by_session("s1")).id == "p1"
+    assert (await store.get_step(steps[1].id, "s1")).action == "Step 1"
+    assert [plan.id for plan in await store.get_all_plans()] == ["p1"]
+
+
+@pytest.mark.asyncio
+async def test_add_item_rejects_duplicate_ids(store):
+    session = Session(id="s1", user_id="u1", current_status="active")
+    await store.add_session(session)
+
+    with pytest.raises(Exception):
+        await store.add_session(session)
+    assert (await store.get_session("s1")).current_status == "active"
+
+
+@pytest.mark.asyncio
+async def test_query_items_translates_cosmos_queries(store):
+    for data_type, content in (("agent_message", "first"), ("agent_message", "second")):
+        await store.add_agent_message(
+            AgentMessage(session_id="s1", user_id="u1", plan_id="p1", content=content, source="HR")
+        )
+    await store.add_step(_step())
+
+    messages = await store.query_items(
+        "SELECT * FROM c WHERE c.user_id=@user_id AND ARRAY_CONTAINS(@types, c.data_type) "
+        "AND c.source=@source ORDER BY c._ts ASC OFFSET 0 LIMIT @limit",
+        [
+            {"name": "@user_id", "value": "u1"},
+            {"name": "@types", "value": ["agent_message"]},
+            {"name": "@source", "value": "HR"},
+            {"name": "@limit", "value": 10},
+        ],
+        AgentMessage,
+        partition_key="s1",
+    )
+
+    assert [message.content for message in messages] == ["first", "second"]
+    assert await store.get_agent_messages_by_session("s1") == messages
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_removes_only_requested_types(store):
+    await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+    await store.add_step(_step())
+    await store.add_session(Session(id="s1", user_id="u1", current_status="active"))
+    progress = []
+
+    counts = await store.bulk_delete(
+        ["plan", "step"], on_progress=lambda total, done: progress.append((total, done))
+    )
+
+    assert counts == {"total": 2, "deleted": 2, "failed": 0}
+    assert progress == [(2, 2)]
+    assert await store.get_plan_by_session("s1") is None
+    assert await store.get_session("s1") is not None
+
+
+def _record(key, embedding):
+    return MemoryRecord(
+        is_reference=False,
+        external_source_name=None,
+        id=f"id-{key}",
+        description=None,
+        text=key,
+        additional_metadata=None,
+        embedding=np.array(embedding),
+        key=key,
+    )
+
+
+@pytest.mark.asyncio
+async def test_memory_records_and_nearest_matches(store):
+    await store.upsert_batch("c", [_record("a", [1.0, 0.0]), _record("b", [0.0, 1.0])])
+
+    assert [record.id for record in await store.get_batch("c", ["b", "x", "a"])] == [
+        "id-b",
+        "id-a",
+    ]
+    record, score = await store.get_nearest_match("c", np.array([0.9, 0.1]))
+    assert record.id == "id-a" and score > 0.9
+
+    await store.remove("c", "a")
+    await store.upsert("c", _record("d", [1.0, 0.1]))
+    matches = await store.get_nearest_matches("c", np.array([1.0, 0.0]), limit=5)
+    assert [record.id for record, _ in matches] == ["id-d", "id-b"]
+    assert await store.get_collections() == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_lookups_use_indexes(store):
+    await store.ensure_initialized()
+    for where in (
+        "session_id = 's1' AND data_type = 'plan'",
+        "user_id = 'u1' AND data_type = 'plan' ORDER BY _ts DESC",
+        "plan_id = 'p1'",
+    ):
+        plan = store._connection.execute(
+            f"EXPLAIN QUERY PLAN SELECT body FROM items WHERE {where}"
+        ).fetchall()
+        assert any("USING INDEX" in row[-1] for row in plan), plan
+
+
+@pytest.mark.asyncio
+async def test_statements_run_off_the_event_loop_thread(store):
+    threads = set()
+    fetch_rows = store._fetch_rows
+    execute_in_transaction = store._execute_in_transaction
+
+    def record(function):
+        def wrapper(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    with patch.object(store, "_fetch_rows", record(fetch_rows)), patch.object(
+        store, "_execute_in_transaction", record(execute_in_transaction)
+    ):
+        await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+        assert (await store.get_plan_by_session("s1")).id == "p1"
+
+    assert threads and threading.get_ident() not in threads
+
+
+@pytest.mark.asyncio
+async def test_iter_all_messages_resumes_from_continuation(store):
+    for i in range(5):
+        await store.add_step(_step(action=f"Step {i}"))
+
+    first_page, token = [], None
+    async for item, token in store.iter_all_messages(page_size=2):
+        first_page.append(item["action"])
+        if len(first_page) == 3:
+            break
+    rest = [item["action"] async for item, _ in store.iter_all_messages(token)]
+
+    assert first_page == ["Step 4", "Step 3", "Step 2"]
+    assert rest == ["Step 1", "Step 0"]
+
+
+@pytest.mark.asyncio
+async def test_iter_all_plans_ends_with_empty_continuation(store):
+    for i in range(3):
+        await store.add_plan(
+            Plan(id=f"p{i}", session_id=f"s{i}", user_id="u1", initial_goal="Goal")
+        )
+
+    pairs = [(plan.id, token) async for plan, token in store.iter_all_plans(page_size=2)]
+
+    assert len(pairs) == 3 and pairs[-1][1] is None
+    assert all(token for _, token in pairs[:-1])
+    resumed = [plan.id async for plan, _ in store.iter_all_plans(pairs[0][1])]
+    assert resumed == [plan_id for plan_id, _ in pairs[1:]]
+
+
+@pytest.mark.asyncio
+async def test_plan_summaries_count_steps_without_agent_replies(store):
+    await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+    steps = [_step(action=f"Step {i}") for i in range(3)]
+    steps[0].status = StepStatus.completed
+    steps[0].agent_reply = "A long markdown reply"
+    for step in steps:
+        await store.add_step(step)
+
+    summaries = await store.get_step_summaries_by_plan("p1", session_id="s1")
+    (plan_summary,) = await store.get_all_plan_summaries()
+
+    assert [summary.action for summary in summaries] == ["Step 0", "Step 1", "Step 2"]
+    assert not hasattr(summaries[0], "agent_reply")
+    assert (plan_summary.total_steps, plan_summary.completed, plan_summary.planned) == (3, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_step_updates_are_merged(store):
+    step = _step()
+    await store.add_step(step)
+    first, second = await store.get_steps_by_plan("p1"), await store.get_steps_by_plan("p1")
+
+    first[0].status = StepStatus.completed
+    first[0].agent_reply = "Done"
+    await store.update_step(first[0])
+    second[0].status = StepStatus.approved
+    second[0].human_feedback = "Looks good"
+    await store.update_step(second[0])
+
+    (stored,) = await store.get_steps_by_plan("p1")
+    assert stored.status == StepStatus.completed
+    assert (stored.agent_reply, stored.human_feedback) == ("Done", "Looks good")
+    assert second[0].status == StepStatus.completed and second[0]._etag == stored._etag
+
+
+@pytest.mark.asyncio
+async def test_plan_aggregate_is_patched_with_steps_and_counts(store):
+    with patch.object(config, "PLAN_AGGREGATE_ENABLED", True):
+        await store.add_plan(
+            Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal")
+        )
+        steps = [_step(action=f"Step {i}") for i in range(3)]
+        for step in steps:
+            await store.add_step(step)
+        steps[1].status = StepStatus.completed
+        await store.update_step(steps[1])
+
+        plan = await store.get_plan_with_steps("s1")
+        aggregate = await store._read_document("plan_aggregate_s1", "s1")
+
+    assert [step.action for step in plan.steps] == ["Step 0", "Step 1", "Step 2"]
+    assert (plan.total_steps, plan.planned, plan.completed) == (3, 2, 1)
+    assert aggregate["step_counts"]["completed"] == 1
+    assert aggregate["steps"][steps[1].id]["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_plan_aggregates_are_built_for_existing_sessions(store):
+    await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+    steps = [_step(action=f"Step {i}") for i in range(2)]
+    steps[0].status = StepStatus.failed
+    for step in steps:
+        await store.add_step(step)
+    assert await store._read_document("plan_aggregate_s1", "s1") is None
+
+    with patch.object(config, "PLAN_AGGREGATE_ENABLED", True):
+        assert await store.rebuild_plan_aggregates() == 1
+        steps[1].status = StepStatus.completed
+        await store.update_step(steps[1])
+        plan = await store.get_plan_with_steps("s1")
+
+    assert (plan.total_steps, plan.failed, plan.completed, plan.planned) == (2, 1, 1, 0)
+    assert plan.overall_status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_session_snapshot_and_changes_since_watermark(store):
+    with patch("context.sqlite_memory_context.time.time", return_value=1000.0):
+        await store.add_plan(
+            Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal")
+        )
+        steps = [_step(action=f"Step {i}") for i in range(2)]
+        for step in steps:
+            await store.add_step(step)
+        await store.add_item(
+            AgentMessage(
+                session_id="s1", user_id="u1", plan_id="p1", content="Hi", source="Planner"
+            )
+        )
+
+    snapshot = await store.get_session_snapshot("s1")
+    assert snapshot.plan.id == "p1"
+    assert [step.action for step in snapshot.steps] == ["Step 0", "Step 1"]
+    assert [message.content for message in snapshot.agent_messages] == ["Hi"]
+    assert snapshot.watermark == 1000
+    assert (await store.get_session_snapshot("s1")).etag == snapshot.etag
+
+    with patch("context.sqlite_memory_context.time.time", return_value=1005.0):
+        steps[1].status = StepStatus.completed
+        await store.update_step(steps[1])
+
+    changes = await store.get_session_snapshot("s1", since=1001)
+    assert changes.plan is None and changes.agent_messages == []
+    assert [step.status for step in changes.steps] == [StepStatus.completed]
+    assert (changes.watermark, changes.etag) == (1005, None)
+    assert (await store.get_session_snapshot("s1", since=1006)).steps == []
+    assert (await store.get_session_snapshot("s1")).etag != snapshot.etag
@@ -0,0 +1,75 @@
+"""Tests for the exact in-memory similarity index."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from context.vector_index import VectorIndex  # noqa: E402
+
+
+def test_search_returns_top_k_by_cosine_similarity():
+    index = VectorIndex(initial_capacity=2)
+    index.upsert("a", np.array([1.0, 0.0]), "A")
+    index.upsert("b", np.array([0.0, 2.0]), "B")
+    index.upsert("c", np.array([1.0, 1.0]), "C")
+
+    results = index.search(np.array([3.0, 0.1]), limit=2)
+
+    assert [item_id for item_id, _, _ in results] == ["a", "c"]
+    assert results[0][1] == "A"
+    assert results[0][2] == pytest.approx(0.99944, abs=1e-4)
+
+
+def test_search_respects_min_relevance_score():
+    index = VectorIndex()
+    index.upsert("a", np.array([1.0, 0.0]))
+    index.upsert("b", np.array([-1.0, 0.0]))
+
+    results = index.search(np.array([1.0, 0.0]), limit=10, min_relevance_score=0.5)
+
+    assert [item_id for item_id, _, _ in results] == ["a"]
+
+
+def test_upsert_replaces_and_remove_compacts_rows():
+    index = VectorIndex()
+    index.upsert("a", np.array([1.0, 0.0]))
+    index.upsert("b", np.array([0.0, 1.0]))
+    index.upsert("c", np.array([1.0, 1.0]))
+    index.upsert("a", np.array([0.0, 1.0]), "moved")
+
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert len(index) == 2
+    assert [item_id for item_id, _, _ in index.search(np.array([0.0, 1.0]), 5)] == [
+        "b",
+        "c",
+    ]
+
+
+def test_dimension_mismatch_is_rejected():
+    index = VectorIndex()
+    index.upsert("a", np.array([1.0, 0.0]))
+
+    with pytest.raises(ValueError):
+        index.upsert("b", np.array([1.0, 0.0, 0.0]))
+    with pytest.raises(ValueError):
+        index.search(np.array([1.0, 0.0, 0.0]))
+
+
+def test_upsert_many_matches_row_by_row_upserts():
+    embeddings = np.array([[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]])
+    bulk = VectorIndex(initial_capacity=1)
+    bulk.upsert_many(["a", "b", "c"], embeddings, ["A", "B", "C"])
+    bulk.upsert_many(["a"], np.array([[0.0, 1.0]]), ["A2"])
+
+    assert len(bulk) == 3
+    payload, vector = bulk.get("a")
+    assert payload == "A2"
+    np.testing.assert_allclose(vector, [0.0, 1.0])
+    assert [item_id for item_id, _, _ in bulk.search(np.array([1.0, 0.9]), limit=1)] == ["c"]
@@ -0,0 +1,47 @@
+"""Tests for the memory store serialization of the data models."""
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from models.messages_kernel import AgentType, Step, StepStatus  # noqa: E402
+from models.serialization import from_document, from_documents, to_document  # noqa: E402
+
+
+def _step():
+    return Step(
+        plan_id="p1",
+        session_id="s1",
+        user_id="u1",
+        action="Do something",
+        agent=AgentType.HR,
+        status=StepStatus.completed,
+    )
+
+
+def test_to_document_is_json_compatible():
+    document = to_document(_step())
+
+    assert document["status"] == "completed" and type(document["status"]) is str
+    assert isinstance(document["timestamp"], str)
+    assert json.loads(json.dumps(document)) == document
+
+
+def test_from_document_restores_types_and_keeps_etag():
+    step = _step()
+    document = to_document(step)
+    document.update({"_ts": 1700000000, "_etag": "etag", "_rid": "rid"})
+
+    (loaded,) = from_documents(Step, [document])
+
+    assert loaded.model_dump() == step.model_dump()
+    assert loaded._etag == "etag"
+    assert loaded.status is StepStatus.completed
+    assert isinstance(loaded.timestamp, datetime)
+    assert from_document(Step, document) == loaded
+    assert "_etag" not in to_document(loaded)
@@ -0,0 +1,69 @@
+"""Tests for the admission control of expensive endpoints."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from admission import AdmissionController, AdmissionRejected  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_user_at_its_limit_waits_without_blocking_others():
+    controller = AdmissionController(max_concurrent=3, max_per_user=1, max_queue=10)
+    await controller.acquire("u1")
+    waiting = asyncio.ensure_future(controller.acquire("u1"))
+    await asyncio.sleep(0)
+
+    # u2 is admitted although u1's request is queued ahead of it
+    await asyncio.wait_for(controller.acquire("u2"), 1)
+    assert not waiting.done()
+    assert controller.stats()["queue_depth"] == 1
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await controller.acquire("u1")
+    assert excinfo.value.reason == "user_queue_full"
+
+    controller.release("u1", 0.5)
+    await asyncio.wait_for(waiting, 1)
+    stats = controller.stats()
+    assert (stats["active"], stats["queue_depth"], stats["admitted"]) == (2, 0, 3)
+    assert stats["wait_seconds_max"] > 0
+    assert 'admission_rejected_total{reason="user_queue_full"} 1' in (
+        controller.to_prometheus()
+    )
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_deadline_reject_with_retry_after():
+    controller = AdmissionController(
+        max_concurrent=1, max_per_user=0, max_queue=1, max_wait_seconds=0.01
+    )
+    async with controller.admit("u1"):
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire("u2")
+        assert excinfo.value.reason == "timeout"
+        assert excinfo.value.retry_after >= 1
+
+        controller.max_wait_seconds = 1
+        waiting = asyncio.ensure_future(controller.acquire("u2"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire("u3")
+        assert excinfo.value.reason == "queue_full"
+
+        # A client that gives up leaves the queue
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert controller.stats()["queue_depth"] == 0
+    assert controller.stats()["active"] == 0
+    assert controller.stats()["rejected"] == {"timeout": 1, "queue_full": 1}
@@ -0,0 +1,226 @@
+"""Tests for how agents invoke the model, with and without streaming."""
+import importlib
+import json
+import os
+import sys
+import types
+from unittest.mock import patch
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(BACKEND_DIR)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from app_config import config  # noqa: E402
+from context.session_events import session_events  # noqa: E402
+from models.messages_kernel import (  # noqa: E402
+    ActionRequest,
+    AgentMessage,
+    AgentType,
+    InputTask,
+    Step,
+    StepStatus,
+)
+
+
+def _import_agent_module(name):
+    """Import a kernel_agents module without running the package __init__.
+
+    kernel_agents/__init__.py imports every agent, so a bare package stands
+    in for it while the module is imported.
+    """
+    package = types.ModuleType("kernel_agents")
+    package.__path__ = [os.path.join(BACKEND_DIR, "kernel_agents")]
+    sys.modules["kernel_agents"] = package
+    try:
+        return importlib.import_module(f"kernel_agents.{name}")
+    finally:
+        del sys.modules["kernel_agents"]
+
+
+BaseAgent = _import_agent_module("agent_base").BaseAgent
+
+
+class StubAzureAgent:
+    """Answers invoke and invoke_stream with the same chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    async def invoke(self, **kwargs):
+        self.calls.append("invoke")
+        for chunk in self.chunks:
+            yield chunk
+
+    async def invoke_stream(self, **kwargs):
+        self.calls.append("invoke_stream")
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeMemoryStore:
+    def __init__(self, step=None):
+        self.step = step
+        self.items = []
+        self.plans = []
+        self.steps = []
+
+    async def get_step(self, step_id, session_id):
+        return self.step
+
+    async def add_item(self, item):
+        self.items.append(item)
+
+    async def update_step(self, step):
+        self.step = step
+
+    async def add_plan(self, plan):
+        self.plans.append(plan)
+
+    async def add_step(self, step):
+        self.steps.append(step)
+
+
+def _agent(agent_class, chunks, memory_store, agent_name):
+    agent = agent_class.__new__(agent_class)
+    agent._agent = StubAzureAgent(chunks)
+    agent._agent_name = agent_name
+    agent._user_id = "u1"
+    agent._memory_store = memory_store
+    agent._chat_history = []
+    return agent
+
+
+def _deltas(session_id):
+    events, _ = session_events.since(session_id, 0)
+    return [
+        event.change.document
+        for event in events
+        if event.change.data_type == "agent_message_delta"
+    ]
+
+
+@pytest.fixture(autouse=True)
+def clear_session_events():
+    session_events.clear()
+    yield
+    session_events.clear()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_invoke_agent_returns_the_joined_chunks(streaming):
+    agent = _agent(BaseAgent, ["Hel", None, "lo, ", "world"], FakeMemoryStore(), "Hr_Agent")
+
+    with patch.object(config, "AGENT_STREAMING_ENABLED", streaming):
+        reply = await agent._invoke_agent("s1", step_id="step1", messages="Do it")
+
+    assert reply == "Hello, world"
+    assert agent._agent.calls == ["invoke_stream" if streaming else "invoke"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_reply_is_forwarded_as_deltas_ending_with_done():
+    agent = _agent(BaseAgent, ["Hel", "lo, ", "world"], FakeMemoryStore(), "Hr_Agent")
+
+    with patch.object(config, "AGENT_STREAMING_ENABLED", True):
+        await agent._invoke_agent("s1", step_id="step1", messages="Do it")
+
+    deltas = _deltas("s1")
+    assert "".join(delta["delta"] for delta in deltas) == "Hello, world"
+    assert [delta["done"] for delta in deltas] == [False] * (len(deltas) - 1) + [True]
+    offset = 0
+    for delta in deltas:
+        assert delta["offset"] == offset
+        offset += len(delta["delta"])
+    assert {(d["source"], d["step_id"], d["user_id"]) for d in deltas} == {
+        ("Hr_Agent", "step1", "u1")
+    }
+
+
+@pytest.mark.asyncio
+async def test_reply_is_not_forwarded_without_streaming():
+    agent = _agent(BaseAgent, ["Hello"], FakeMemoryStore(), "Hr_Agent")
+
+    with patch.object(config, "AGENT_STREAMING_ENABLED", False):
+        await agent._invoke_agent("s1", step_id="step1", messages="Do it")
+
+    assert _deltas("s1") == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_action_request_stores_the_same_reply_in_both_modes(streaming):
+    step = Step(
+        id="step1",
+        plan_id="p1",
+        session_id="s1",
+        user_id="u1",
+        action="Onboard",
+        agent=AgentType.HR,
+    )
+    memory_store = FakeMemoryStore(step)
+    agent = _agent(BaseAgent, ["Employee ", "onboarded"], memory_store, "Hr_Agent")
+    action_request = ActionRequest(
+        step_id="step1", plan_id="p1", session_id="s1", action="Onboard", agent=AgentType.HR
+    )
+
+    with patch.object(config, "AGENT_STREAMING_ENABLED", streaming):
+        response = json.loads(await agent.handle_action_request(action_request))
+
+    assert response["result"] == "Employee onboarded"
+    [message] = memory_store.items
+    assert isinstance(message, AgentMessage)
+    assert message.content == "Employee onboarded"
+    assert memory_store.step.agent_reply == "Employee onboarded"
+    assert memory_store.step.status == StepStatus.completed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_planner_stores_the_same_plan_in_both_modes(streaming):
+    plan_json = json.dumps(
+        {
+            "initial_goal": "Onboard Jessica",
+            "steps": [
+                {"action": "Create an account", "agent": AgentType.HR.value},
+                {"action": "Order a laptop", "agent": AgentType.PROCUREMENT.value, "depends_on": [0]},
+            ],
+            "summary_plan_and_steps": "Two steps",
+        }
+    )
+    try:
+        PlannerAgent = _import_agent_module("planner_agent").PlannerAgent
+    except ImportError as e:
+        pytest.skip(f"planner_agent does not import with the installed azure-ai-projects: {e}")
+    chunks = [plan_json[i : i + 16] for i in range(0, len(plan_json), 16)]
+    memory_store = FakeMemoryStore()
+    planner = _agent(PlannerAgent, chunks, memory_store, AgentType.PLANNER.value)
+    planner._available_agents = [AgentType.HR.value, AgentType.PROCUREMENT.value]
+
+    with patch.object(config, "AGENT_STREAMING_ENABLED", streaming), patch.object(
+        PlannerAgent, "_generate_args", return_value={}
+    ):
+        plan, steps = await planner._create_structured_plan(
+            InputTask(session_id="s1", description="Onboard Jessica")
+        )
+
+    assert memory_store.plans == [plan]
+    assert plan.initial_goal == "Onboard Jessica"
+    assert plan.summary == "Two steps"
+    assert [(step.action, step.agent) for step in steps] == [
+        ("Create an account", AgentType.HR),
+        ("Order a laptop", AgentType.PROCUREMENT),
+    ]
+    assert steps[1].depends_on == [steps[0].id]
+    assert bool(_deltas("s1")) == streaming
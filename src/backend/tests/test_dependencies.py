@@ -0,0 +1,59 @@
+"""Tests for the per-request dependencies of the API."""
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from fastapi import HTTPException  # noqa: E402
+from dependencies import RequestScope, get_request_scope, get_user_id  # noqa: E402
+
+
+def _resources():
+    resources = MagicMock()
+    resources.memory_store.side_effect = lambda session_id, user_id: MagicMock(
+        flush=AsyncMock(), session_id=session_id, user_id=user_id
+    )
+    return resources
+
+
+@pytest.mark.asyncio
+async def test_scope_reuses_one_memory_context_per_session_and_flushes_them():
+    resources = _resources()
+    scope_iter = get_request_scope(user_id="u1", resources=resources)
+    scope = await scope_iter.__anext__()
+    assert isinstance(scope, RequestScope)
+
+    first = scope.memory_store("s1")
+    assert scope.memory_store("s1") is first
+    other = scope.memory_store()
+    assert (other.session_id, other.user_id) == ("", "u1")
+    assert resources.memory_store.call_count == 2
+
+    with pytest.raises(StopAsyncIteration):
+        await scope_iter.__anext__()
+    first.flush.assert_awaited_once()
+    other.flush.assert_awaited_once()
+
+
+def test_missing_user_is_rejected():
+    request = MagicMock(headers={})
+    with patch(
+        "dependencies.get_authenticated_user_details",
+        return_value={"user_principal_id": None},
+    ), patch("dependencies.track_event_if_configured") as track_event:
+        with pytest.raises(HTTPException) as excinfo:
+            get_user_id(request)
+
+    assert excinfo.value.status_code == 400
+    track_event.assert_called_once()
@@ -0,0 +1,249 @@
+"""Tests for the concurrent step scheduler of the group chat manager."""
+import asyncio
+import importlib
+import os
+import sys
+import types
+from unittest.mock import patch
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(BACKEND_DIR)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from app_config import config  # noqa: E402
+from models.messages_kernel import AgentType, Plan, Step, StepStatus  # noqa: E402
+
+
+def _import_agent_module(name):
+    """Import a kernel_agents module without running the package __init__.
+
+    kernel_agents/__init__.py imports every agent, so a bare package stands
+    in for it while the module is imported.
+    """
+    package = types.ModuleType("kernel_agents")
+    package.__path__ = [os.path.join(BACKEND_DIR, "kernel_agents")]
+    sys.modules["kernel_agents"] = package
+    try:
+        return importlib.import_module(f"kernel_agents.{name}")
+    finally:
+        del sys.modules["kernel_agents"]
+
+
+GroupChatManager = _import_agent_module("group_chat_manager").GroupChatManager
+
+
+class FakeMemoryStore:
+    """Records the status of every step update."""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.updates = []
+
+    async def update_step(self, step):
+        self.updates.append((step.id, step.status))
+
+    async def get_plan_by_session(self, session_id):
+        return Plan(id="p1", session_id=session_id, user_id="u1", initial_goal="Goal")
+
+    async def get_steps_by_plan(self, plan_id, session_id=None):
+        return self.steps
+
+    async def add_item(self, item):
+        pass
+
+    def last_status(self, step_id):
+        return [status for updated, status in self.updates if updated == step_id][-1]
+
+
+class Tracker:
+    """Records when the steps start and finish, and how many run at once."""
+
+    def __init__(self):
+        self.started = []
+        self.finished = []
+        self.running = set()
+        self.max_running = 0
+        self.running_by_agent = {}
+        self.max_running_by_agent = {}
+
+
+class FakeAgent:
+    def __init__(self, name, tracker, steps, failing=(), delay=0.02):
+        self.name = name
+        self.tracker = tracker
+        self.steps = {step.id: step for step in steps}
+        self.failing = failing
+        self.delay = delay
+
+    async def handle_action_request(self, action_request):
+        tracker = self.tracker
+        step_id = action_request.step_id
+        tracker.started.append(step_id)
+        tracker.running.add(step_id)
+        tracker.max_running = max(tracker.max_running, len(tracker.running))
+        running = tracker.running_by_agent.get(self.name, 0) + 1
+        tracker.running_by_agent[self.name] = running
+        tracker.max_running_by_agent[self.name] = max(
+            tracker.max_running_by_agent.get(self.name, 0), running
+        )
+        try:
+            await asyncio.sleep(self.delay)
+            if step_id in self.failing:
+                raise RuntimeError(f"{step_id} failed")
+            self.steps[step_id].status = StepStatus.completed
+            tracker.finished.append(step_id)
+        finally:
+            tracker.running.discard(step_id)
+            tracker.running_by_agent[self.name] -= 1
+
+
+def _step(step_id, agent, depends_on=None):
+    return Step(
+        id=step_id,
+        plan_id="p1",
+        session_id="s1",
+        user_id="u1",
+        action=f"Do {step_id}",
+        agent=agent,
+        depends_on=depends_on,
+    )
+
+
+def _manager(steps, failing=()):
+    tracker = Tracker()
+    memory_store = FakeMemoryStore(steps)
+    manager = GroupChatManager.__new__(GroupChatManager)
+    manager._memory_store = memory_store
+    manager._user_id = "u1"
+    manager._agent_instances = {
+        agent.value: FakeAgent(agent.value, tracker, steps, failing)
+        for agent in {step.agent for step in steps}
+    }
+    return manager, memory_store, tracker
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    steps = [
+        _step("a", AgentType.HR, []),
+        _step("b", AgentType.MARKETING, []),
+        _step("c", AgentType.PRODUCT, []),
+    ]
+    manager, memory_store, tracker = _manager(steps)
+
+    with patch.object(config, "STEP_CONCURRENCY", 3):
+        await manager._execute_steps("s1", steps, "")
+
+    assert tracker.max_running == 3
+    assert sorted(tracker.finished) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_dependents_wait_for_their_dependencies():
+    steps = [
+        _step("a", AgentType.HR, []),
+        _step("b", AgentType.MARKETING, ["a"]),
+        _step("c", AgentType.PRODUCT, ["a"]),
+        _step("d", AgentType.PROCUREMENT, ["b", "c"]),
+    ]
+    manager, memory_store, tracker = _manager(steps)
+
+    with patch.object(config, "STEP_CONCURRENCY", 3):
+        await manager._execute_steps("s1", steps, "")
+
+    assert tracker.started[0] == "a"
+    assert set(tracker.started[1:3]) == {"b", "c"}
+    assert tracker.started[3] == "d"
+    assert tracker.finished.index("a") < tracker.started.index("b")
+    assert tracker.finished[-1] == "d"
+    # b and c only depend on a, so they ran at the same time
+    assert tracker.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_steps_without_dependencies_run_in_order():
+    steps = [
+        _step("a", AgentType.HR),
+        _step("b", AgentType.MARKETING),
+        _step("c", AgentType.PRODUCT),
+    ]
+    manager, memory_store, tracker = _manager(steps)
+
+    with patch.object(config, "STEP_CONCURRENCY", 3):
+        await manager._execute_steps("s1", steps, "")
+
+    assert tracker.started == tracker.finished == ["a", "b", "c"]
+    assert tracker.max_running == 1
+
+
+@pytest.mark.asyncio
+async def test_step_concurrency_caps_steps_running_at_once():
+    steps = [
+        _step("a", AgentType.HR, []),
+        _step("b", AgentType.MARKETING, []),
+        _step("c", AgentType.PRODUCT, []),
+        _step("d", AgentType.PROCUREMENT, []),
+    ]
+    manager, memory_store, tracker = _manager(steps)
+
+    with patch.object(config, "STEP_CONCURRENCY", 2):
+        await manager._execute_steps("s1", steps, "")
+
+    assert tracker.max_running == 2
+    assert sorted(tracker.finished) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_steps_of_one_agent_never_overlap():
+    steps = [
+        _step("a", AgentType.HR, []),
+        _step("b", AgentType.HR, []),
+        _step("c", AgentType.MARKETING, []),
+    ]
+    manager, memory_store, tracker = _manager(steps)
+
+    with patch.object(config, "STEP_CONCURRENCY", 3):
+        await manager._execute_steps("s1", steps, "")
+
+    assert tracker.max_running_by_agent == {
+        AgentType.HR.value: 1,
+        AgentType.MARKETING.value: 1,
+    }
+    assert tracker.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_step_and_its_dependents_are_marked_failed():
+    steps = [
+        _step("a", AgentType.HR, []),
+        _step("b", AgentType.MARKETING, ["a"]),
+        _step("c", AgentType.PRODUCT, ["b"]),
+        _step("d", AgentType.PROCUREMENT, []),
+        _step("e", AgentType.TECH_SUPPORT, ["d"]),
+    ]
+    manager, memory_store, tracker = _manager(steps, failing=("a", "e"))
+
+    with patch.object(config, "STEP_CONCURRENCY", 3):
+        with pytest.raises(RuntimeError, match="a failed"):
+            await manager._execute_steps("s1", steps, "")
+
+    for step_id in ("a", "b", "c", "e"):
+        assert memory_store.last_status(step_id) == StepStatus.failed
+    assert steps[0].agent_reply == "Step failed: a failed"
+    assert steps[1].agent_reply == "Not executed because step(s) a failed"
+    assert steps[2].agent_reply == "Not executed because step(s) b failed"
+    # Dependents of the failed step were never sent to their agents
+    assert "b" not in tracker.started and "c" not in tracker.started
+    # The independent branch still ran to its own failure
+    assert tracker.finished == ["d"]
+    assert steps[3].status == StepStatus.completed
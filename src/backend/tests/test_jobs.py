@@ -0,0 +1,139 @@
+"""Tests for the in-process background job registry."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionRejected  # noqa: E402
+from jobs import JobRegistry  # noqa: E402
+from models.messages_kernel import JobStatus  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background_and_reports_result():
+    registry = JobRegistry()
+    release = asyncio.Event()
+
+    async def work(job):
+        job.total = 2
+        await release.wait()
+        job.processed = 2
+        return {"deleted": 2}
+
+    job = registry.submit("delete_messages", "u1", work)
+    await asyncio.sleep(0)
+    assert registry.get(job.id, "u1").status == JobStatus.running
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert job.status == JobStatus.completed
+    assert job.result == {"deleted": 2}
+    assert job.completed_at is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error_and_is_scoped_to_user():
+    registry = JobRegistry()
+
+    async def work(job):
+        raise RuntimeError("boom")
+
+    job = registry.submit("delete_messages", "u1", work)
+    await asyncio.sleep(0.01)
+
+    assert job.status == JobStatus.failed
+    assert job.error == "boom"
+    assert registry.get(job.id, "u2") is None
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_evicted_beyond_retention():
+    registry = JobRegistry(max_jobs=1)
+
+    async def work(job):
+        return None
+
+    first = registry.submit("noop", "u1", work)
+    await asyncio.sleep(0.01)
+    second = registry.submit("noop", "u1", work)
+    await asyncio.sleep(0.01)
+
+    assert registry.get(first.id, "u1") is None
+    assert registry.get(second.id, "u1") is second
+
+
+@pytest.mark.asyncio
+async def test_jobs_wait_for_a_free_worker_of_their_kind():
+    registry = JobRegistry()
+    registry.set_concurrency("input_task", 1)
+    release = asyncio.Event()
+
+    async def work(job):
+        await release.wait()
+        return {"done": True}
+
+    first = registry.submit("input_task", "u1", work)
+    second = registry.submit("input_task", "u1", work)
+    other = registry.submit("delete_messages", "u1", work)
+    await asyncio.sleep(0.01)
+
+    assert first.status == JobStatus.running
+    assert second.status == JobStatus.queued
+    assert other.status == JobStatus.running
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert second.status == JobStatus.completed
+    assert second.queue_seconds >= first.run_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_submit_is_rejected_beyond_queue_and_user_limits():
+    registry = JobRegistry()
+    registry.set_concurrency("input_task", 1, max_queue=1, max_per_user=1)
+    release = asyncio.Event()
+
+    async def work(job):
+        await release.wait()
+
+    registry.submit("input_task", "u1", work)
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as user_limit:
+        registry.submit("input_task", "u1", work)
+    assert user_limit.value.reason == "user_queue_full"
+    queued = registry.submit("input_task", "u2", work)
+    assert queued.status == JobStatus.queued
+    with pytest.raises(AdmissionRejected) as queue_limit:
+        registry.submit("input_task", "u3", work)
+    assert queue_limit.value.reason == "queue_full"
+    assert queue_limit.value.retry_after >= 1
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert registry.submit("input_task", "u3", work).user_id == "u3"
+
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_count_toward_retention():
+    registry = JobRegistry(max_jobs=2)
+    release = asyncio.Event()
+
+    async def work(job):
+        await release.wait()
+
+    first = registry.submit("noop", "u1", work)
+    registry.submit("noop", "u2", work)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        registry.submit("noop", "u3", work)
+    assert rejected.value.reason == "registry_full"
+
+    release.set()
+    await asyncio.sleep(0.01)
+    registry.submit("noop", "u3", work)
+    assert registry.get(first.id, "u1") is None
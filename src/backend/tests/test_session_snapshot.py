@@ -0,0 +1,153 @@
+"""Tests for the session snapshot endpoint, backed by the SQLite memory store."""
+import asyncio
+import importlib
+import os
+import sys
+import types
+from unittest.mock import patch
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(BACKEND_DIR)
+
+# Mock environment variables before importing the app config
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://mock-openai-endpoint")
+os.environ.setdefault("AZURE_AI_SUBSCRIPTION_ID", "mock-subscription")
+os.environ.setdefault("AZURE_AI_RESOURCE_GROUP", "mock-resource-group")
+os.environ.setdefault("AZURE_AI_PROJECT_NAME", "mock-project")
+os.environ.setdefault("AZURE_AI_AGENT_PROJECT_CONNECTION_STRING", "mock-connection")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app_config import config  # noqa: E402
+from context.sqlite_memory_context import SQLiteMemoryContext  # noqa: E402
+from dependencies import AppResources  # noqa: E402
+from models.messages_kernel import (  # noqa: E402
+    AgentMessage,
+    AgentType,
+    Plan,
+    Step,
+    StepStatus,
+)
+
+# kernel_agents/__init__.py imports every agent, so a bare package stands in
+# for it while the app and its agents are imported
+_package = types.ModuleType("kernel_agents")
+_package.__path__ = [os.path.join(BACKEND_DIR, "kernel_agents")]
+sys.modules["kernel_agents"] = _package
+try:
+    app = importlib.import_module("app_kernel").app
+except ImportError as e:
+    pytest.skip(
+        f"app_kernel does not import with the installed packages: {e}",
+        allow_module_level=True,
+    )
+finally:
+    del sys.modules["kernel_agents"]
+
+
+def _headers(user_id):
+    return {"x-ms-client-principal-id": user_id}
+
+
+async def _seed():
+    store = SQLiteMemoryContext("s1", "u1")
+    await store.add_plan(Plan(id="p1", session_id="s1", user_id="u1", initial_goal="Goal"))
+    step = Step(
+        id="step1", plan_id="p1", session_id="s1", user_id="u1", action="Do", agent=AgentType.HR
+    )
+    await store.add_step(step)
+    await store.add_item(
+        AgentMessage(
+            session_id="s1", user_id="u1", plan_id="p1", content="Hi", source="Hr_Agent"
+        )
+    )
+    return step
+
+
+async def _complete(step):
+    step.status = StepStatus.completed
+    await SQLiteMemoryContext("s1", "u1").update_step(step)
+
+
+@pytest.fixture
+def client(tmp_path):
+    SQLiteMemoryContext._vector_indexes.clear()
+    with patch.object(config, "MEMORY_BACKEND", "sqlite"), patch.object(
+        config, "SQLITE_DATABASE_PATH", str(tmp_path / "memory.db")
+    ):
+        app.state.resources = AppResources()
+        yield TestClient(app)
+    SQLiteMemoryContext.close_all()
+
+
+@pytest.fixture
+def step(client):
+    with patch("context.sqlite_memory_context.time.time", return_value=1000.0):
+        return asyncio.run(_seed())
+
+
+def test_snapshot_carries_an_etag_and_answers_304_while_unchanged(client, step):
+    response = client.get("/api/sessions/s1/snapshot", headers=_headers("u1"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["plan"]["id"] == "p1"
+    assert [s["id"] for s in body["steps"]] == ["step1"]
+    assert [m["content"] for m in body["agent_messages"]] == ["Hi"]
+    assert body["watermark"] == 1000
+    etag = response.headers["ETag"]
+    assert etag == f'"{body["etag"]}"'
+
+    unchanged = client.get(
+        "/api/sessions/s1/snapshot", headers={**_headers("u1"), "If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+
+    with patch("context.sqlite_memory_context.time.time", return_value=1005.0):
+        asyncio.run(_complete(step))
+    changed = client.get(
+        "/api/sessions/s1/snapshot", headers={**_headers("u1"), "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_since_returns_only_changes_after_the_watermark(client, step):
+    assert (
+        client.get("/api/sessions/s1/snapshot?since=1001", headers=_headers("u1")).status_code
+        == 304
+    )
+
+    with patch("context.sqlite_memory_context.time.time", return_value=1005.0):
+        asyncio.run(_complete(step))
+
+    response = client.get("/api/sessions/s1/snapshot?since=1001", headers=_headers("u1"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["plan"] is None and body["agent_messages"] == []
+    assert [(s["id"], s["status"]) for s in body["steps"]] == [("step1", "completed")]
+    assert (body["since"], body["watermark"], body["etag"]) == (1001, 1005, None)
+    assert "ETag" not in response.headers
+
+    assert (
+        client.get("/api/sessions/s1/snapshot?since=1006", headers=_headers("u1")).status_code
+        == 304
+    )
+
+
+def test_another_users_session_is_empty(client, step):
+    response = client.get("/api/sessions/s1/snapshot", headers=_headers("u2"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["plan"] is None
+    assert body["steps"] == [] and body["agent_messages"] == []
+    assert (
+        client.get("/api/sessions/s1/snapshot?since=0", headers=_headers("u2")).status_code
+        == 304
+    )
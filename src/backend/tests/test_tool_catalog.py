@@ -0,0 +1,45 @@
+"""Tests for the catalog of agent tools."""
+import json
+import os
+import sys
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kernel_tools.hr_tools import HrTools  # noqa: E402
+from kernel_tools.tool_catalog import TOOL_CLASSES, ToolCatalog  # noqa: E402
+from models.messages_kernel import AgentType  # noqa: E402
+
+
+def test_catalog_keeps_the_planner_documents_and_structures_the_tools():
+    catalog = ToolCatalog()
+
+    assert catalog.tools_json_doc(AgentType.HR) == HrTools.generate_tools_json_doc()
+    assert catalog.tools_json_doc(AgentType.HUMAN) == "[]"
+    assert {tool["agent"] for tool in catalog.tools} == {
+        tool_class.agent_name for tool_class in TOOL_CLASSES.values()
+    }
+
+    [tool] = [
+        tool for tool in catalog.tools if tool["function"] == "add_emergency_contact"
+    ]
+    assert tool["description"]
+    assert tool["parameters"] == {
+        "type": "object",
+        "properties": {
+            "employee_name": {"title": "Employee Name", "type": "string"},
+            "contact_name": {"title": "Contact Name", "type": "string"},
+            "contact_phone": {"title": "Contact Phone", "type": "string"},
+        },
+        "required": ["employee_name", "contact_name", "contact_phone"],
+    }
+    json.dumps(catalog.tools)
+
+
+def test_version_changes_with_the_tools():
+    everything = ToolCatalog()
+    hr_only = ToolCatalog({AgentType.HR: HrTools})
+
+    assert everything.version == ToolCatalog().version
+    assert hr_only.version != everything.version
+    assert len(hr_only.version) == 32
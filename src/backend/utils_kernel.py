@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import uuid
@@ -12,7 +11,8 @@ import semantic_kernel as sk
 # Import AppConfig from app_config
 from app_config import config
 from azure.identity import DefaultAzureCredential
-from context.cosmos_memory_kernel import CosmosMemoryContext
+from context.memory_context_base import MemoryContextBase
+from context.memory_factory import create_memory_context
 
 # Import agent factory and the new AppConfig
 from kernel_agents.agent_factory import AgentFactory
@@ -25,6 +25,7 @@ from kernel_agents.planner_agent import PlannerAgent
 from kernel_agents.procurement_agent import ProcurementAgent
 from kernel_agents.product_agent import ProductAgent
 from kernel_agents.tech_support_agent import TechSupportAgent
+from kernel_tools.tool_catalog import tool_catalog
 from models.messages_kernel import AgentType
 from semantic_kernel.agents.azure_ai.azure_ai_agent import AzureAIAgent
 from semantic_kernel.functions import KernelFunction
@@ -38,7 +39,7 @@ azure_agent_instances: Dict[str, Dict[str, AzureAIAgent]] = {}
 
 async def initialize_runtime_and_context(
     session_id: Optional[str] = None, user_id: str = None
-) -> Tuple[sk.Kernel, CosmosMemoryContext]:
+) -> Tuple[sk.Kernel, MemoryContextBase]:
     """
     Initializes the Semantic Kernel runtime and context for a given session.
 
@@ -59,7 +60,7 @@ async def initialize_runtime_and_context(
 
     # Create a kernel and memory store using the AppConfig instance
     kernel = config.create_kernel()
-    memory_store = CosmosMemoryContext(session_id, user_id)
+    memory_store = create_memory_context(session_id, user_id)
 
     return kernel, memory_store
 
@@ -117,47 +118,15 @@ async def get_agents(session_id: str, user_id: str) -> Dict[str, Any]:
 
 def load_tools_from_json_files() -> List[Dict[str, Any]]:
     """
-    Load tool definitions from JSON files in the tools directory.
+    Load the tool definitions of all agents.
+
+    The definitions come from the tool catalog, which introspects the tool
+    classes once per process.
 
     Returns:
         List of dictionaries containing tool information
     """
-    tools_dir = os.path.join(os.path.dirname(__file__), "tools")
-    functions = []
-
-    try:
-        if os.path.exists(tools_dir):
-            for file in os.listdir(tools_dir):
-                if file.endswith(".json"):
-                    tool_path = os.path.join(tools_dir, file)
-                    try:
-                        with open(tool_path, "r") as f:
-                            tool_data = json.load(f)
-
-                        # Extract agent name from filename (e.g., hr_tools.json -> HR)
-                        agent_name = file.split("_")[0].capitalize()
-
-                        # Process each tool in the file
-                        for tool in tool_data.get("tools", []):
-                            try:
-                                functions.append(
-                                    {
-                                        "agent": agent_name,
-                                        "function": tool.get("name", ""),
-                                        "description": tool.get("description", ""),
-                                        "parameters": str(tool.get("parameters", {})),
-                                    }
-                                )
-                            except Exception as e:
-                                logging.warning(
-                                    f"Error processing tool in {file}: {str(e)}"
-                                )
-                    except Exception as e:
-                        logging.error(f"Error loading tool file {file}: {str(e)}")
-    except Exception as e:
-        logging.error(f"Error reading tools directory: {str(e)}")
-
-    return functions
+    return tool_catalog.tools
 
 
 async def rai_success(description: str) -> bool: